@@ -0,0 +1,92 @@
+# benchmarks/checkout_load.py
+"""
+Throughput of subscription checkout under concurrent load.
+
+Worker threads run ``subscriptions.checkout.checkout`` back to back.
+Most checkouts use a voucher of their own; a share of them race for one
+shared code, of which exactly one may succeed. Everything created is
+removed afterwards.
+"""
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection
+from django.utils import timezone
+
+from outbox.models import OutboxJob
+from rewards.models import Voucher
+from subscriptions import billing
+from subscriptions.checkout import CheckoutError, checkout
+from subscriptions.models import UserSubscription
+
+
+def run_checkout_load(users, plan, checkouts, concurrency=8, contended_share=0.1, latency=0.0):
+    """Returns a report dict; ``contended_winners`` must be 1."""
+    tag = f"bench-{uuid.uuid4().hex[:8]}"
+    shared = f"{tag}-shared"
+    contended = int(checkouts * contended_share)
+    codes = [shared] * contended + [f"{tag}-{i}" for i in range(checkouts - contended)]
+    # Interleave the racers with the rest.
+    codes = [codes[i] for i in np.random.default_rng(0).permutation(len(codes))]
+    Voucher.objects.bulk_create(
+        [Voucher(code=code, name=code, discount_amount=Decimal("10.00")) for code in set(codes)]
+    )
+    started_at = timezone.now()
+    gateway = billing.FakeGateway(latency=latency)
+    jobs = iter(enumerate(codes))
+    jobs_lock = threading.Lock()
+    latencies, outcomes, errors, created = [], [], [], []
+
+    def worker():
+        try:
+            while True:
+                with jobs_lock:
+                    job = next(jobs, None)
+                if job is None:
+                    return
+                index, code = job
+                began = time.perf_counter()
+                try:
+                    subscription, _, _ = checkout(users[index % len(users)], plan, "card", code, gateway=gateway)
+                    created.append(subscription.pk)
+                    outcome = "ok"
+                except CheckoutError:
+                    outcome = "rejected"
+                except Exception as e:
+                    outcome = "error"
+                    errors.append(f"{type(e).__name__}: {e}")
+                latencies.append(time.perf_counter() - began)
+                outcomes.append((code == shared, outcome))
+        finally:
+            connection.close()
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - began
+
+    latencies_ms = np.array(latencies) * 1000
+    report = {
+        "checkouts": checkouts,
+        "seconds": seconds,
+        "per_second": checkouts / seconds if seconds else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "succeeded": sum(1 for _, outcome in outcomes if outcome == "ok"),
+        "contended": contended,
+        "contended_winners": sum(1 for racer, outcome in outcomes if racer and outcome == "ok"),
+        "errors": errors,
+    }
+
+    # Payments go with their subscriptions (CASCADE).
+    for first in range(0, len(created), 5000):
+        UserSubscription.objects.filter(pk__in=created[first:first + 5000]).delete()
+    OutboxJob.objects.filter(kind="subscriptions.refund", created_at__gte=started_at).delete()
+    Voucher.objects.filter(code__startswith=tag).delete()
+    return report
@@ -0,0 +1,258 @@
+# benchmarks/endpoints.py
+"""
+Replay the API's GET routes under concurrent load.
+
+Routes are read from the live URL configuration, so a new endpoint is
+benchmarked without touching this file. Each route is called as each
+persona by ``concurrency`` threads, either in-process through Django's
+test client (which also counts SQL queries per request) or over HTTP
+against a running server. Results are plain dicts keyed by
+``"<persona> <route>"`` so a run can be saved as JSON and diffed later.
+"""
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+import numpy as np
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework_simplejwt.tokens import AccessToken
+
+_REGEX_GROUP = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+_CONVERTER = re.compile(r"<(?:\w+:)?(\w+)>")
+_PARAM = re.compile(r"<(\w+)>")
+
+
+def _pattern_text(pattern):
+    text = _REGEX_GROUP.sub(r"<\1>", str(pattern))
+    return _CONVERTER.sub(r"<\1>", text.lstrip("^").rstrip("$"))
+
+
+def _walk(patterns, prefix=""):
+    for pattern in patterns:
+        text = prefix + _pattern_text(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern.url_patterns, text)
+        else:
+            yield text, pattern
+
+
+def _answers_get(callback):
+    actions = getattr(callback, "actions", None)
+    if actions is not None:
+        return "get" in actions
+    view_class = getattr(callback, "view_class", None) or getattr(callback, "cls", None)
+    return view_class is not None and hasattr(view_class, "get")
+
+
+def api_routes(prefix="api/"):
+    """
+    Sorted ``/path/`` templates of every API route that answers GET.
+    Format-suffix variants and DRF's browsable API roots are left out.
+    """
+    routes = set()
+    for template, pattern in _walk(get_resolver().url_patterns):
+        if not template.startswith(prefix) or pattern.name == "api-root":
+            continue
+        if "format" in _PARAM.findall(template) or "\\." in template:
+            continue
+        if _answers_get(pattern.callback):
+            routes.add("/" + template)
+    return sorted(routes)
+
+
+class ClientTransport:
+    """In-process requests through the test client; counts SQL queries."""
+
+    counts_queries = True
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, path, token):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = Client()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(path, HTTP_AUTHORIZATION=f"Bearer {token}")
+        return response.status_code, len(ctx.captured_queries), response.content
+
+    def close_thread(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    """Real HTTP requests against ``base_url`` (e.g. a local runserver)."""
+
+    counts_queries = False
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, path, token):
+        request = urllib.request.Request(
+            self.base_url + path, headers={"Authorization": f"Bearer {token}"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, None, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, None, e.read()
+
+    def close_thread(self):
+        pass
+
+
+def token_for(user):
+    return str(AccessToken.for_user(user))
+
+
+def resolve_path(transport, token, template):
+    """
+    Fill ``<pk>`` in a detail route with the first id the persona sees in
+    the matching list route. Returns None if that is not possible.
+    """
+    params = _PARAM.findall(template)
+    if not params:
+        return template
+    if params != ["pk"]:
+        return None
+
+    list_path = template[: template.index("<pk>")]
+    status, _, body = transport.get(list_path, token)
+    if status != 200:
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("results", [])
+    if not data or not isinstance(data[0], dict) or "id" not in data[0]:
+        return None
+    return template.replace("<pk>", str(data[0]["id"]))
+
+
+def measure(transport, token, path, requests, concurrency, max_seconds=None):
+    """
+    Send ``requests`` GETs to ``path`` from ``concurrency`` threads. With
+    ``max_seconds`` the threads stop early once the budget is used up, so
+    one very slow route cannot stall the whole suite.
+    """
+    latencies = []
+    queries = []
+    statuses = Counter()
+    lock = threading.Lock()
+    counts = [requests // concurrency + (1 if i < requests % concurrency else 0)
+              for i in range(concurrency)]
+
+    def worker(n):
+        own_latencies, own_queries, own_statuses = [], [], Counter()
+        try:
+            start.wait()
+            deadline = time.perf_counter() + max_seconds if max_seconds else None
+            for _ in range(n):
+                if deadline is not None and own_latencies and time.perf_counter() > deadline:
+                    break
+                started = time.perf_counter()
+                status, query_count, _ = transport.get(path, token)
+                own_latencies.append(time.perf_counter() - started)
+                own_statuses[status] += 1
+                if query_count is not None:
+                    own_queries.append(query_count)
+        finally:
+            transport.close_thread()
+        with lock:
+            latencies.extend(own_latencies)
+            queries.extend(own_queries)
+            statuses.update(own_statuses)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in counts if n]
+    start = threading.Barrier(len(threads) + 1)
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+
+    return summarize(latencies, wall, queries, statuses)
+
+
+def summarize(latencies, wall, queries, statuses):
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "queries": int(np.median(queries)) if queries else None,
+        "max_queries": max(queries) if queries else None,
+        "status": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def run_suite(transport, personas, routes, requests, concurrency, warmup=1,
+              max_seconds=None, progress=None):
+    """
+    Benchmark every route as every persona. ``personas`` maps a persona
+    name to its user. Returns ``{"<persona> <route>": stats}`` plus a
+    ``skipped`` list of routes that could not be resolved for a persona.
+    """
+    results = {}
+    skipped = []
+    for persona, user in personas.items():
+        for template in routes:
+            token = token_for(user)
+            path = resolve_path(transport, token, template)
+            key = f"{persona} {template}"
+            if path is None:
+                skipped.append(key)
+                continue
+            for _ in range(warmup):
+                transport.get(path, token)
+            results[key] = {"path": path, **measure(
+                transport, token, path, requests, concurrency, max_seconds
+            )}
+            if progress:
+                progress(key, results[key])
+    return results, skipped
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Compare two result dicts route by route. A route regresses when its
+    p95 grew by more than ``threshold`` (a fraction) or it now runs more
+    queries per request. Returns a list of row dicts.
+    """
+    rows = []
+    for key, now in current.items():
+        before = baseline.get(key)
+        if before is None:
+            rows.append({"route": key, "new": True, "regressed": False})
+            continue
+        ratio = now["p95_ms"] / before["p95_ms"] if before["p95_ms"] else 1.0
+        query_delta = None
+        if now.get("queries") is not None and before.get("queries") is not None:
+            query_delta = now["queries"] - before["queries"]
+        rows.append({
+            "route": key,
+            "new": False,
+            "p95_before": before["p95_ms"],
+            "p95_after": now["p95_ms"],
+            "p95_ratio": round(ratio, 3),
+            "queries_before": before.get("queries"),
+            "queries_after": now.get("queries"),
+            "regressed": ratio > 1 + threshold or (query_delta or 0) > 0,
+        })
+    return rows
@@ -0,0 +1,49 @@
+# benchmarks/management/commands/bench_checkout.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.checkout_load import run_checkout_load
+from subscriptions.models import SubscriptionPlan
+
+
+class Command(BaseCommand):
+    help = (
+        "Run subscription checkouts from concurrent threads, a share of them "
+        "racing for one voucher code, and report throughput and latency. "
+        "Everything created is removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checkouts", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--contended-share", type=float, default=0.1,
+                            help="Share of checkouts using the one shared voucher code.")
+        parser.add_argument("--latency", type=float, default=0.0,
+                            help="Simulated gateway round trip in seconds.")
+        parser.add_argument("--prefix", default="load",
+                            help="Username prefix used by seed_load_data.")
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(username__startswith=f"{options['prefix']}-owner-")[:1000])
+        if not users:
+            raise CommandError(f"No {options['prefix']!r} owners; run seed_load_data or pass --prefix.")
+        plan = SubscriptionPlan.objects.filter(is_active=True).order_by("price").first()
+        if plan is None:
+            raise CommandError("No active subscription plan.")
+
+        report = run_checkout_load(
+            users, plan, options["checkouts"], concurrency=options["concurrency"],
+            contended_share=options["contended_share"], latency=options["latency"],
+        )
+        self.stdout.write(
+            f"{report['checkouts']} checkouts in {report['seconds']:.1f}s: "
+            f"{report['per_second']:.0f}/s, p50 {report['p50_ms']:.1f} ms, p95 {report['p95_ms']:.1f} ms"
+        )
+        self.stdout.write(
+            f"{report['succeeded']} succeeded; {report['contended_winners']} of "
+            f"{report['contended']} racing for the shared code won"
+        )
+        for error in report["errors"][:5]:
+            self.stderr.write(error)
+        if report["errors"]:
+            raise CommandError(f"{len(report['errors'])} checkouts failed unexpectedly.")
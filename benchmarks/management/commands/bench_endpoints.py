@@ -0,0 +1,155 @@
+# benchmarks/management/commands/bench_endpoints.py
+import json
+import logging
+import platform
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from benchmarks.endpoints import ClientTransport, HttpTransport, api_routes, compare, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay every GET API route concurrently as an owner, a driver and a "
+        "staff user, and report latency percentiles, throughput and queries "
+        "per request. Run it against a database filled by seed_load_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200,
+                            help="Measured requests per route and persona.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--prefix", default="load",
+                            help="Username prefix used by seed_load_data.")
+        parser.add_argument("--owner", help="Owner username (default: <prefix>-owner-0).")
+        parser.add_argument("--driver", help="Driver username (default: <prefix>-driver-0).")
+        parser.add_argument("--staff", help="Staff username (default: <prefix>-staff, created if missing).")
+        parser.add_argument("--route", action="append", default=[],
+                            help="Only routes containing this text (repeatable).")
+        parser.add_argument("--exclude", action="append", default=[],
+                            help="Skip routes containing this text (repeatable).")
+        parser.add_argument("--max-seconds", type=float, default=30.0,
+                            help="Time budget per route and persona; 0 for none.")
+        parser.add_argument("--server",
+                            help="Base URL of a running server; default is the in-process test client.")
+        parser.add_argument("--output", help="Write results to this JSON file.")
+        parser.add_argument("--compare", help="Baseline JSON file to diff against.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Allowed p95 growth before a route counts as regressed (0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+
+        personas = self._personas(options)
+        routes = api_routes()
+        if options["route"]:
+            routes = [r for r in routes if any(text in r for text in options["route"])]
+        routes = [r for r in routes if not any(text in r for text in options["exclude"])]
+        if not routes:
+            raise CommandError("No routes to benchmark.")
+
+        transport = HttpTransport(options["server"]) if options["server"] else ClientTransport()
+        self.stdout.write(
+            f"{len(routes)} routes x {len(personas)} personas, {options['requests']} requests "
+            f"each at concurrency {options['concurrency']} "
+            f"({options['server'] or 'in-process client'})"
+        )
+        self.stdout.write(
+            f"{'route':<58} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'queries':>8}  status"
+        )
+
+        def progress(key, stats):
+            queries = "-" if stats["queries"] is None else str(stats["queries"])
+            status = ",".join(f"{code}x{n}" for code, n in stats["status"].items())
+            self.stdout.write(
+                f"{key:<58} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                f"{stats['p99_ms']:>8.2f} {stats['rps']:>8.1f} {queries:>8}  {status}"
+            )
+
+        # 4xx answers are expected for some persona/route pairs; keep them
+        # out of the report.
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            results, skipped = run_suite(
+                transport, personas, routes,
+                requests=options["requests"],
+                concurrency=options["concurrency"],
+                warmup=options["warmup"],
+                max_seconds=options["max_seconds"] or None,
+                progress=progress,
+            )
+        finally:
+            request_logger.setLevel(level)
+        for key in skipped:
+            self.stdout.write(f"{key:<58} skipped (no object to fill in the URL)")
+
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "transport": options["server"] or "client",
+                "database": connection.vendor,
+                "python": platform.python_version(),
+            },
+            "routes": results,
+            "skipped": skipped,
+        }
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2, sort_keys=True))
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if options["compare"]:
+            self._compare(options["compare"], results, options["threshold"])
+
+    def _personas(self, options):
+        prefix = options["prefix"]
+        owner = self._user(options["owner"] or f"{prefix}-owner-0")
+        driver = self._user(options["driver"] or f"{prefix}-driver-0")
+        if not hasattr(driver, "driver_profile"):
+            raise CommandError(f"{driver.username} has no driver profile.")
+
+        if options["staff"]:
+            staff = self._user(options["staff"])
+        else:
+            staff, _ = User.objects.get_or_create(
+                username=f"{prefix}-staff", defaults={"is_staff": True}
+            )
+        return {"owner": owner, "driver": driver, "staff": staff}
+
+    def _user(self, username):
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f"User {username!r} not found; run seed_load_data first.")
+        return user
+
+    def _compare(self, path, results, threshold):
+        try:
+            baseline = json.loads(Path(path).read_text())["routes"]
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+
+        rows = compare(baseline, results, threshold)
+        self.stdout.write(f"\nCompared with {path}:")
+        for row in rows:
+            if row["new"]:
+                self.stdout.write(f"{row['route']:<58} new route")
+                continue
+            line = (
+                f"{row['route']:<58} p95 {row['p95_before']:>8.2f} -> {row['p95_after']:>8.2f} ms "
+                f"(x{row['p95_ratio']:.2f})  queries {row['queries_before']} -> {row['queries_after']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row["regressed"] else line)
+
+        regressed = [row["route"] for row in rows if row["regressed"]]
+        if regressed:
+            raise CommandError(f"{len(regressed)} route(s) regressed: {', '.join(regressed)}")
+        self.stdout.write(self.style.SUCCESS("No regressions."))
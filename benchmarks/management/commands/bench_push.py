@@ -0,0 +1,91 @@
+# benchmarks/management/commands/bench_push.py
+import asyncio
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.push_load import (
+    InProcessConnection,
+    SocketConnection,
+    raise_open_file_limit,
+    run_push_load,
+    stream_query,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold thousands of idle server-sent event connections on one worker, "
+        "fan events out to all of them, and report connect time, memory per "
+        "connection and delivery latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=2000)
+        parser.add_argument("--events", type=int, default=10,
+                            help="Events published to every connection (in-process only).")
+        parser.add_argument("--interval", type=float, default=0.1,
+                            help="Seconds between published events.")
+        parser.add_argument("--hold", type=float, default=0.0,
+                            help="Seconds to keep the connections idle before publishing.")
+        parser.add_argument("--batch", type=int, default=500,
+                            help="Connections opened at a time.")
+        parser.add_argument("--timeout", type=float, default=60.0)
+        parser.add_argument("--username", default="load-owner-0",
+                            help="Owner whose stream every connection opens.")
+        parser.add_argument("--server",
+                            help="Base URL of a running ASGI server; default drives the application in-process.")
+
+    def handle(self, *args, **options):
+        if options["connections"] < 1:
+            raise CommandError("--connections must be at least 1.")
+        user = User.objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f"No user {options['username']!r}; run seed_load_data or pass --username.")
+        query = stream_query(str(AccessToken.for_user(user)))
+
+        if options["server"]:
+            limit = raise_open_file_limit()
+            if options["connections"] > limit - 50:
+                raise CommandError(f"Open file limit is {limit}; lower --connections.")
+
+            def make_connection():
+                return SocketConnection(options["server"], query)
+        else:
+            application = get_asgi_application()
+
+            def make_connection():
+                return InProcessConnection(application, query)
+
+        report = asyncio.run(run_push_load(
+            make_connection, user.pk, options["connections"],
+            events=options["events"], interval=options["interval"], hold=options["hold"],
+            batch=options["batch"], timeout=options["timeout"], in_process=not options["server"],
+        ))
+
+        n = report["connections"]
+        self.stdout.write(
+            f"{n} connections opened in {report['connect_seconds']:.2f}s "
+            f"({n / report['connect_seconds']:.0f}/s), {report['failed']} failed, "
+            f"{report['alive']} still open after the hold"
+        )
+        if "bytes_per_connection" in report:
+            self.stdout.write(f"memory: {report['bytes_per_connection'] / 1024:.1f} KiB per idle connection")
+        if "delivered" in report:
+            self.stdout.write(
+                f"fan-out: {report['delivered']}/{report['expected']} events delivered, "
+                f"publish call {report['publish_ms']:.2f} ms"
+            )
+        if "latency_ms" in report:
+            latency = report["latency_ms"]
+            self.stdout.write(
+                f"delivery latency: p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+                f"max {latency['max']:.1f} ms"
+            )
+        if "subscriptions_left" in report:
+            self.stdout.write(f"subscriptions left after disconnect: {report['subscriptions_left']}")
+
+        ok = not report["failed"] and report.get("delivered", 0) == report.get("expected", 0)
+        self.stdout.write(self.style.SUCCESS("Done.") if ok else self.style.WARNING("Done, with failures."))
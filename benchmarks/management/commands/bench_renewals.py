@@ -0,0 +1,50 @@
+# benchmarks/management/commands/bench_renewals.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from subscriptions import billing
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a full auto-renewal run against a simulated payment gateway. "
+        "Every active subscription ending within --ahead-days is renewed; "
+        "the changes are rolled back unless --commit is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead-days", type=float, default=400,
+                            help="Renew subscriptions ending within this many days.")
+        parser.add_argument("--latency", type=float, default=0.2,
+                            help="Simulated gateway round trip in seconds.")
+        parser.add_argument("--jitter", type=float, default=0.1)
+        parser.add_argument("--failure-rate", type=float, default=0.05)
+        parser.add_argument("--concurrency", type=int, default=billing.config()["CONCURRENCY"])
+        parser.add_argument("--batch-size", type=int, default=billing.config()["BATCH_SIZE"])
+        parser.add_argument("--commit", action="store_true")
+
+    def handle(self, *args, **options):
+        gateway = billing.FakeGateway(
+            latency=options["latency"], jitter=options["jitter"],
+            failure_rate=options["failure_rate"], seed=0,
+        )
+        with transaction.atomic():
+            report = billing.renew_subscriptions(
+                ahead=timedelta(days=options["ahead_days"]),
+                batch_size=options["batch_size"],
+                concurrency=options["concurrency"],
+                gateway=gateway,
+            )
+            if not options["commit"]:
+                transaction.set_rollback(True)
+
+        attempts = report["renewed"] + report["failed"] + report["refunded"]
+        rate = attempts / report["seconds"] if report["seconds"] else 0
+        self.stdout.write(
+            f"{attempts} renewals ({report['failed']} declined) in {report['seconds']:.1f}s: "
+            f"{rate:.0f}/s with {options['concurrency']} charges in flight"
+        )
+        serial = attempts * (options["latency"] + options["jitter"] / 2)
+        self.stdout.write(f"one charge at a time would take about {serial:.0f}s")
@@ -0,0 +1,73 @@
+# benchmarks/management/commands/seed_load_data.py
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.seed import DEFAULT_PASSWORD, LoadSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a large synthetic dataset (owners, employees, "
+        "drivers, pickups, GPS history, rewards, subscriptions) for benchmarking. "
+        "Never run this against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owners", type=int, default=2000)
+        parser.add_argument("--employees-per-owner", type=int, default=3)
+        parser.add_argument("--drivers", type=int, default=300)
+        parser.add_argument("--pickups", type=int, default=300_000)
+        parser.add_argument("--locations", type=int, default=1_000_000,
+                            help="Total DriverLocation rows, split over the drivers.")
+        parser.add_argument("--transactions-per-owner", type=int, default=100,
+                            help="Average reward credits per owner.")
+        parser.add_argument("--redemptions-per-owner", type=int, default=5)
+        parser.add_argument("--subscriptions-per-owner", type=int, default=6)
+        parser.add_argument("--days", type=int, default=365,
+                            help="History window the timestamps are spread over.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument("--prefix", default="load",
+                            help="Username prefix of generated accounts.")
+        parser.add_argument("--password", default=DEFAULT_PASSWORD,
+                            help="Password of every generated account.")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(
+                f"Users with prefix {prefix!r} already exist; use another --prefix."
+            )
+        if options["owners"] < 1 or options["drivers"] < 1:
+            raise CommandError("Need at least one owner and one driver.")
+
+        def progress(label, count, seconds):
+            rate = count / seconds if seconds else 0
+            self.stdout.write(f"  {label:<22} {count:>10,} rows  {seconds:7.1f}s  ({rate:,.0f}/s)")
+
+        seeder = LoadSeeder(
+            prefix=prefix,
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            days=options["days"],
+            password=options["password"],
+            progress=progress,
+        )
+
+        started = time.perf_counter()
+        seeder.run(
+            owners=options["owners"],
+            employees_per_owner=options["employees_per_owner"],
+            drivers=options["drivers"],
+            pickups=options["pickups"],
+            locations=options["locations"],
+            transactions_per_owner=options["transactions_per_owner"],
+            redemptions_per_owner=options["redemptions_per_owner"],
+            subscriptions_per_owner=options["subscriptions_per_owner"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded in {time.perf_counter() - started:.1f}s. "
+            f"Log in as {prefix}-owner-0 / {prefix}-driver-0 with password {options['password']!r}."
+        ))
@@ -0,0 +1,194 @@
+# benchmarks/push_load.py
+"""
+Load test for the server-sent event stream: many idle connections on
+one worker, then fan-out of events to all of them.
+
+``InProcessConnection`` drives the ASGI application directly on this
+event loop (no sockets), so the numbers are the cost of Django's ASGI
+handler, the broker and the stream coroutines of a single worker.
+``SocketConnection`` opens real HTTP connections to an ASGI server
+started separately; only connection capacity is measured then, since
+events cannot be published into another process's broker.
+"""
+import asyncio
+import json
+import os
+import resource
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from restaurant_waste_backend import push
+
+STREAM_PATH = "/api/trash_pickups/events/"
+
+
+def stream_query(token):
+    return urlencode({"token": token})
+
+
+def rss_bytes():
+    """Resident memory of this process, or ``None`` where unknown."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def raise_open_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return max(soft, hard)
+
+
+class _Connection:
+    def __init__(self):
+        self.status = None
+        self.opened = asyncio.Event()
+        self.latencies = []
+
+    def _received(self, chunk):
+        if not self.opened.is_set():
+            self.opened.set()
+            return
+        # Bench events carry their publish time.
+        for line in chunk.split(b"\n"):
+            if line.startswith(b"data: ") and b'"sent"' in line:
+                self.latencies.append(time.perf_counter() - json.loads(line[6:])["sent"])
+
+
+class InProcessConnection(_Connection):
+    def __init__(self, application, query):
+        super().__init__()
+        self.application = application
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": STREAM_PATH,
+            "raw_path": STREAM_PATH.encode(),
+            "query_string": query.encode(),
+            "headers": [(b"host", b"localhost"), (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        self._requested = False
+        self._gone = asyncio.Event()
+        self.task = None
+
+    async def open(self):
+        self.task = asyncio.create_task(self.application(self.scope, self._receive, self._send))
+        await self.opened.wait()
+
+    async def close(self):
+        self._gone.set()
+        await self.task
+
+    async def _receive(self):
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            self._received(message["body"])
+
+
+class SocketConnection(_Connection):
+    def __init__(self, base_url, query):
+        super().__init__()
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.request = (
+            f"GET {STREAM_PATH}?{query} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+            f"Accept: text/event-stream\r\n\r\n"
+        ).encode()
+        self.writer = None
+        self.task = None
+
+    async def open(self):
+        reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(self.request)
+        status_line = await reader.readline()
+        self.status = int(status_line.split()[1])
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        self.task = asyncio.create_task(self._read(reader))
+        await self.opened.wait()
+
+    async def _read(self, reader):
+        while chunk := await reader.read(65536):
+            self._received(chunk)
+
+    async def close(self):
+        self.writer.close()
+        self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+
+
+async def run_push_load(make_connection, user_id, connections, events=10, interval=0.1,
+                        hold=0.0, batch=500, timeout=30.0, in_process=True):
+    """
+    Open ``connections`` streams (``batch`` at a time), keep them idle
+    for ``hold`` seconds, publish ``events`` to all of them and close.
+    Memory, fan-out and leak figures are only taken ``in_process``: they
+    describe this process. Returns a report dict.
+    """
+    report = {"connections": connections}
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    opened = []
+    for first in range(0, connections, batch):
+        group = [make_connection() for _ in range(min(batch, connections - first))]
+        await asyncio.wait_for(asyncio.gather(*(c.open() for c in group)), timeout)
+        opened.extend(group)
+    report["connect_seconds"] = time.perf_counter() - started
+    report["failed"] = sum(1 for c in opened if c.status != 200)
+    rss_after = rss_bytes()
+    if in_process and rss_before is not None and rss_after is not None:
+        report["bytes_per_connection"] = (rss_after - rss_before) / connections
+
+    if hold:
+        await asyncio.sleep(hold)
+    report["alive"] = sum(1 for c in opened if not c.task.done())
+
+    if in_process and events:
+        publish_seconds = []
+        for seq in range(events):
+            data = {"id": -1, "status": "bench", "driver": None, "seq": seq, "sent": time.perf_counter()}
+            # Published from a worker thread, like a sync view would.
+            began = time.perf_counter()
+            await asyncio.to_thread(push.publish, f"owner:{user_id}", "pickup.status", data)
+            publish_seconds.append(time.perf_counter() - began)
+            await asyncio.sleep(interval)
+        deadline = time.perf_counter() + timeout
+        while sum(len(c.latencies) for c in opened) < events * connections and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        latencies = np.array([lat for c in opened for lat in c.latencies]) * 1000
+        report["delivered"] = int(latencies.size)
+        report["expected"] = events * connections
+        if latencies.size:
+            report["latency_ms"] = {
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "max": float(latencies.max()),
+            }
+        report["publish_ms"] = float(np.mean(publish_seconds) * 1000)
+
+    await asyncio.wait_for(asyncio.gather(*(c.close() for c in opened)), timeout)
+    broker = push.get_broker()
+    if in_process and hasattr(broker, "stats"):
+        report["subscriptions_left"] = broker.stats()["subscriptions"]
+    return report
@@ -0,0 +1,367 @@
+# benchmarks/seed.py
+"""
+Synthetic load data for benchmarking.
+
+Everything is generated around a handful of city hubs: restaurants sit in
+neighbourhood clusters around their hub, pickups are at the restaurant,
+and each driver works (and leaves a GPS trace) around one hub. Rows are
+written with ``bulk_create`` in batches, one transaction per table, and
+``auto_now_add`` timestamps are filled in explicitly so the data covers
+``days`` days of history instead of "now".
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import OwnerProfile
+from drivers.models import Driver, DriverLocation
+from employees.models import Employee
+from rewards.models import RewardPoint, RewardRedemption, RewardTransaction, Voucher
+from subscriptions.models import SubscriptionPayment, SubscriptionPlan, UserSubscription
+from trash_pickups.geo import encode_geohash
+from trash_pickups.models import TrashPickup
+
+# (name, lat, lng, weight): share of restaurants and drivers per hub.
+HUBS = [
+    ("Metro Manila", 14.5995, 120.9842, 0.40),
+    ("Cebu", 10.3157, 123.8854, 0.20),
+    ("Davao", 7.0731, 125.6128, 0.20),
+    ("Iloilo", 10.7202, 122.5621, 0.10),
+    ("Cagayan de Oro", 8.4542, 124.6319, 0.10),
+]
+# Restaurants cluster into neighbourhoods around a hub.
+NEIGHBOURHOODS_PER_HUB = 25
+HUB_SPREAD_DEG = 0.08
+NEIGHBOURHOOD_SPREAD_DEG = 0.01
+# One GPS step of a driver trace (about 50 m).
+TRACE_STEP_DEG = 0.0005
+
+PICKUP_STATUSES = ["pending", "accepted", "in_progress", "completed", "cancelled"]
+PICKUP_STATUS_WEIGHTS = [0.15, 0.05, 0.03, 0.70, 0.07]
+WASTE_TYPES = ["Food", "Plastic", "Oil", "Recyclables"]
+
+DEFAULT_PASSWORD = "loadtest"
+
+PLANS = [
+    ("basic", Decimal("499.00"), 30),
+    ("premium", Decimal("999.00"), 30),
+    ("enterprise", Decimal("2499.00"), 90),
+]
+VOUCHERS = [
+    ("50 PHP off", Decimal("50.00"), 50),
+    ("100 PHP off", Decimal("100.00"), 90),
+    ("Free pickup", Decimal("150.00"), 120),
+]
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let ``bulk_create`` keep the given ``auto_now_add`` values."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+class LoadSeeder:
+    """
+    Generates one consistent dataset. Every username starts with
+    ``prefix`` so a seeded run can be told apart from real accounts.
+    """
+
+    def __init__(self, prefix="load", seed=0, batch_size=5000, days=365,
+                 password=DEFAULT_PASSWORD, progress=None):
+        self.prefix = prefix
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.now = timezone.now()
+        self.password_hash = make_password(password)
+        self.progress = progress or (lambda label, count, seconds: None)
+
+        weights = np.array([hub[3] for hub in HUBS])
+        self.hub_weights = weights / weights.sum()
+        self.hub_centers = np.array([(hub[1], hub[2]) for hub in HUBS])
+        self.neighbourhoods = self.hub_centers[:, None, :] + self.rng.normal(
+            0, HUB_SPREAD_DEG, (len(HUBS), NEIGHBOURHOODS_PER_HUB, 2)
+        )
+
+        # Filled in as tables are seeded: arrays of ids, hubs and positions.
+        self.owner_ids = self.owner_hubs = self.owner_positions = self.profile_ids = None
+        self.driver_ids = self.driver_hubs = self.driver_positions = None
+
+    # -- helpers ----------------------------------------------------------
+
+    def _bulk_create(self, model, rows, label):
+        """Insert ``rows`` (any iterable) in batches inside one transaction."""
+        started = time.perf_counter()
+        created = []
+        batch = []
+        with transaction.atomic():
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    created.extend(obj.pk for obj in model.objects.bulk_create(batch))
+                    batch = []
+            if batch:
+                created.extend(obj.pk for obj in model.objects.bulk_create(batch))
+        self.progress(label, len(created), time.perf_counter() - started)
+        return np.array(created, dtype=np.int64)
+
+    def _random_times(self, n, days=None):
+        """``n`` datetimes spread uniformly over the last ``days`` days."""
+        seconds = self.rng.uniform(0, (days or self.days) * 86400, n)
+        return [self.now - timedelta(seconds=float(s)) for s in seconds]
+
+    def _place(self, hubs, spread):
+        """A position near a random neighbourhood of each given hub."""
+        picks = self.rng.integers(0, NEIGHBOURHOODS_PER_HUB, len(hubs))
+        centers = self.neighbourhoods[hubs, picks]
+        return centers + self.rng.normal(0, spread, centers.shape)
+
+    def _users(self, role, count):
+        users = (
+            User(username=f"{self.prefix}-{role}-{i}", password=self.password_hash)
+            for i in range(count)
+        )
+        return self._bulk_create(User, users, f"{role} users")
+
+    # -- tables -----------------------------------------------------------
+
+    def seed_owners(self, count):
+        user_ids = self._users("owner", count)
+        self.owner_ids = user_ids
+        self.owner_hubs = self.rng.choice(len(HUBS), count, p=self.hub_weights)
+        self.owner_positions = self._place(self.owner_hubs, NEIGHBOURHOOD_SPREAD_DEG)
+
+        profiles = (
+            OwnerProfile(
+                user_id=int(user_id),
+                restaurant_name=f"Restaurant {i}",
+                address=f"{i} {HUBS[self.owner_hubs[i]][0]} Street",
+                latitude=float(self.owner_positions[i, 0]),
+                longitude=float(self.owner_positions[i, 1]),
+            )
+            for i, user_id in enumerate(user_ids)
+        )
+        self.profile_ids = self._bulk_create(OwnerProfile, profiles, "owner profiles")
+
+    def seed_employees(self, per_owner):
+        positions = ["Cook", "Server", "Cashier", "Manager", "Dishwasher"]
+
+        def rows():
+            for i, profile_id in enumerate(self.profile_ids):
+                lat, lng = self.owner_positions[i]
+                for k in range(per_owner):
+                    yield Employee(
+                        owner_id=int(profile_id),
+                        name=f"Employee {i}-{k}",
+                        email=f"{self.prefix}-employee-{i}-{k}@example.com",
+                        position=positions[k % len(positions)],
+                        restaurant_name=f"Restaurant {i}",
+                        latitude=float(lat),
+                        longitude=float(lng),
+                    )
+
+        self._bulk_create(Employee, rows(), "employees")
+
+    def seed_drivers(self, count):
+        user_ids = self._users("driver", count)
+        self.driver_hubs = self.rng.choice(len(HUBS), count, p=self.hub_weights)
+        self.driver_positions = self._place(self.driver_hubs, HUB_SPREAD_DEG / 4).round(6)
+        statuses = self.rng.choice(["available", "on_pickup", "inactive"], count, p=[0.6, 0.3, 0.1])
+
+        drivers = (
+            Driver(
+                user_id=int(user_id),
+                full_name=f"Driver {i}",
+                phone_number="09170000000",
+                license_number=f"{self.prefix.upper()}-{i:06d}",
+                plate_number=f"LD {i:04d}",
+                status=statuses[i],
+                latitude=float(self.driver_positions[i, 0]),
+                longitude=float(self.driver_positions[i, 1]),
+                geohash=encode_geohash(*self.driver_positions[i]),
+            )
+            for i, user_id in enumerate(user_ids)
+        )
+        self.driver_ids = self._bulk_create(Driver, drivers, "drivers")
+
+    def seed_pickups(self, count):
+        owners = self.rng.integers(0, len(self.owner_ids), count)
+        statuses = self.rng.choice(PICKUP_STATUSES, count, p=PICKUP_STATUS_WEIGHTS)
+        positions = self.owner_positions[owners] + self.rng.normal(0, 0.0005, (count, 2))
+        created = self._random_times(count)
+        weights = self.rng.gamma(2.0, 6.0, count).clip(0.5, 999)
+
+        drivers_by_hub = [self.driver_ids[self.driver_hubs == h] for h in range(len(HUBS))]
+
+        def rows():
+            for i in range(count):
+                hub = self.owner_hubs[owners[i]]
+                driver_id = None
+                candidates = drivers_by_hub[hub]
+                if statuses[i] != "pending" and len(candidates):
+                    driver_id = int(candidates[self.rng.integers(len(candidates))])
+                lat = round(float(positions[i, 0]), 6)
+                lng = round(float(positions[i, 1]), 6)
+                yield TrashPickup(
+                    user_id=int(self.owner_ids[owners[i]]),
+                    driver_id=driver_id,
+                    restaurant_name=f"Restaurant {owners[i]}",
+                    pickup_address=f"{owners[i]} {HUBS[hub][0]} Street",
+                    waste_type=WASTE_TYPES[i % len(WASTE_TYPES)],
+                    weight_kg=Decimal(f"{weights[i]:.2f}"),
+                    status=statuses[i],
+                    created_at=created[i],
+                    scheduled_date=created[i] + timedelta(hours=int(self.rng.integers(1, 48))),
+                    latitude=lat,
+                    longitude=lng,
+                    geohash=encode_geohash(lat, lng),
+                )
+
+        with explicit_timestamps(TrashPickup._meta.get_field("created_at")):
+            self._bulk_create(TrashPickup, rows(), "pickups")
+
+    def seed_locations(self, count):
+        """
+        ``count`` GPS fixes split over the drivers. Each driver's trace is a
+        random walk that ends at the driver's current position; the last
+        fix is the current one.
+        """
+        if not len(self.driver_ids):
+            return
+        per_driver = np.full(len(self.driver_ids), count // len(self.driver_ids))
+        per_driver[: count % len(self.driver_ids)] += 1
+        # Fixes are evenly spaced over the history window.
+        interval = max(self.days * 86400 / max(per_driver.max(), 1), 10.0)
+
+        def rows():
+            for d, driver_id in enumerate(self.driver_ids):
+                n = int(per_driver[d])
+                if not n:
+                    continue
+                walk = np.cumsum(self.rng.normal(0, TRACE_STEP_DEG, (n, 2)), axis=0)
+                trace = self.driver_positions[d] + walk - walk[-1]
+                for k in range(n):
+                    yield DriverLocation(
+                        driver_id=int(driver_id),
+                        latitude=round(float(trace[k, 0]), 6),
+                        longitude=round(float(trace[k, 1]), 6),
+                        timestamp=self.now - timedelta(seconds=interval * (n - 1 - k)),
+                        is_current=k == n - 1,
+                    )
+
+        self._bulk_create(DriverLocation, rows(), "driver locations")
+
+    def seed_rewards(self, transactions_per_owner, redemptions_per_owner):
+        vouchers = [
+            Voucher.objects.get_or_create(
+                code=f"{self.prefix.upper()}-{k}",
+                defaults={"name": name, "discount_amount": amount, "points_required": cost},
+            )[0]
+            for k, (name, amount, cost) in enumerate(VOUCHERS)
+        ]
+
+        credits = self.rng.poisson(transactions_per_owner, len(self.owner_ids))
+        balances = np.zeros(len(self.owner_ids), dtype=np.int64)
+        redemptions = []
+
+        def transactions():
+            for i, user_id in enumerate(self.owner_ids):
+                times = sorted(self._random_times(int(credits[i])))
+                for when in times:
+                    points = 20 if self.rng.random() < 0.1 else 10
+                    balances[i] += points
+                    yield RewardTransaction(
+                        user_id=int(user_id), points=points,
+                        description="Completed pickup" if points == 10 else "Donation completed",
+                        created_at=when,
+                    )
+                # Spend some of it; a redemption never overdraws.
+                for when in sorted(self._random_times(redemptions_per_owner, days=30)):
+                    voucher = vouchers[int(self.rng.integers(len(vouchers)))]
+                    if balances[i] < voucher.points_required:
+                        break
+                    balances[i] -= voucher.points_required
+                    redemptions.append(RewardRedemption(
+                        user_id=int(user_id), voucher=voucher, item_name=voucher.name,
+                        points_spent=voucher.points_required, status="approved",
+                        created_at=when,
+                    ))
+                    yield RewardTransaction(
+                        user_id=int(user_id), points=-voucher.points_required,
+                        description=f"Redeemed {voucher.name}", created_at=when,
+                    )
+
+        with explicit_timestamps(
+            RewardTransaction._meta.get_field("created_at"),
+            RewardRedemption._meta.get_field("created_at"),
+        ):
+            self._bulk_create(RewardTransaction, transactions(), "reward transactions")
+            self._bulk_create(RewardRedemption, redemptions, "redemptions")
+
+        points = (
+            RewardPoint(user_id=int(user_id), points=int(balances[i]))
+            for i, user_id in enumerate(self.owner_ids)
+        )
+        self._bulk_create(RewardPoint, points, "reward balances")
+
+    def seed_subscriptions(self, per_owner):
+        """
+        ``per_owner`` back-to-back subscriptions per owner, each with its
+        payment; the newest one is still running.
+        """
+        plans = []
+        for name, price, days in PLANS:
+            plan = SubscriptionPlan.objects.filter(name=name, is_active=True).first()
+            if plan is None:
+                plan = SubscriptionPlan.objects.create(name=name, price=price, duration_days=days)
+            plans.append(plan)
+
+        subscriptions = []
+        for user_id in self.owner_ids:
+            plan = plans[int(self.rng.choice(len(plans), p=[0.6, 0.3, 0.1]))]
+            period = timedelta(days=plan.duration_days)
+            # The current period started somewhere in the last plan period.
+            start = self.now - period * float(self.rng.uniform(0.05, 0.95))
+            for k in range(per_owner):
+                period_start = start - period * (per_owner - 1 - k)
+                subscriptions.append(UserSubscription(
+                    user_id=int(user_id), plan=plan,
+                    start_date=period_start, end_date=period_start + period,
+                    status="active" if k == per_owner - 1 else "expired",
+                ))
+        ids = self._bulk_create(UserSubscription, subscriptions, "subscriptions")
+
+        methods = [choice for choice, _ in SubscriptionPayment.PAYMENT_METHODS]
+        payments = (
+            SubscriptionPayment(
+                user_id=sub.user_id, subscription_id=int(sub_id),
+                plan_name_snapshot=sub.plan.get_name_display(), amount=sub.plan.price,
+                method=methods[int(self.rng.integers(len(methods)))], paid_at=sub.start_date,
+            )
+            for sub, sub_id in zip(subscriptions, ids)
+        )
+        self._bulk_create(SubscriptionPayment, payments, "payments")
+
+    def run(self, owners, employees_per_owner, drivers, pickups, locations,
+            transactions_per_owner, redemptions_per_owner, subscriptions_per_owner):
+        self.seed_owners(owners)
+        self.seed_employees(employees_per_owner)
+        self.seed_drivers(drivers)
+        self.seed_pickups(pickups)
+        self.seed_locations(locations)
+        self.seed_rewards(transactions_per_owner, redemptions_per_owner)
+        self.seed_subscriptions(subscriptions_per_owner)
@@ -0,0 +1,204 @@
+from decimal import Decimal
+from io import StringIO
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, Max, Min, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from drivers.models import Driver, DriverLocation
+from employees.models import Employee
+from rewards.models import RewardPoint, RewardTransaction, Voucher
+from subscriptions.models import SubscriptionPayment, SubscriptionPlan, UserSubscription
+from trash_pickups.dispatch import UNREACHABLE_COST, match, solve_assignment
+from trash_pickups.geo import encode_geohash, haversine_km, haversine_matrix
+from trash_pickups.models import TrashPickup
+from .endpoints import ClientTransport, api_routes, compare, run_suite
+from .seed import HUB_SPREAD_DEG, HUBS, NEIGHBOURHOOD_SPREAD_DEG, NEIGHBOURHOODS_PER_HUB
+
+
+class SeedLoadDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            "seed_load_data", owners=20, drivers=5, pickups=400, locations=1000,
+            transactions_per_owner=10, subscriptions_per_owner=3, batch_size=150,
+            stdout=StringIO(),
+        )
+
+    def test_row_counts(self):
+        self.assertEqual(User.objects.filter(username__startswith="load-owner-").count(), 20)
+        self.assertEqual(Employee.objects.count(), 60)
+        self.assertEqual(Driver.objects.count(), 5)
+        self.assertEqual(TrashPickup.objects.count(), 400)
+        self.assertEqual(DriverLocation.objects.count(), 1000)
+        self.assertEqual(UserSubscription.objects.count(), 60)
+        self.assertEqual(SubscriptionPayment.objects.count(), 60)
+
+    def test_bench_renewals_rolls_back(self):
+        before = list(UserSubscription.objects.order_by("pk").values_list("end_date", flat=True))
+        out = StringIO()
+        call_command("bench_renewals", latency=0, jitter=0, failure_rate=0, stdout=out)
+        self.assertIn("20 renewals (0 declined)", out.getvalue())
+        self.assertEqual(
+            list(UserSubscription.objects.order_by("pk").values_list("end_date", flat=True)), before
+        )
+        self.assertEqual(SubscriptionPayment.objects.count(), 60)
+
+    def test_pickups_cluster_around_hubs(self):
+        for lat, lng, geohash in TrashPickup.objects.values_list("latitude", "longitude", "geohash"):
+            nearest = min(haversine_km(lat, lng, hub[1], hub[2]) for hub in HUBS)
+            self.assertLess(nearest, 60)
+            self.assertEqual(geohash, encode_geohash(lat, lng))
+        self.assertEqual(
+            TrashPickup.objects.filter(status="pending", driver__isnull=False).count(), 0
+        )
+
+    def test_history_is_spread_out(self):
+        span = TrashPickup.objects.aggregate(first=Min("created_at"), last=Max("created_at"))
+        self.assertGreater((span["last"] - span["first"]).days, 100)
+
+    def test_one_current_location_per_driver(self):
+        per_driver = DriverLocation.objects.filter(is_current=True).values("driver").annotate(n=Count("id"))
+        self.assertEqual(sorted(row["n"] for row in per_driver), [1] * 5)
+
+    def test_reward_balances_match_ledger(self):
+        sums = dict(
+            RewardTransaction.objects.values("user").annotate(total=Sum("points"))
+            .values_list("user", "total")
+        )
+        for user_id, points in RewardPoint.objects.values_list("user", "points"):
+            self.assertEqual(points, sums.get(user_id, 0))
+            self.assertGreaterEqual(points, 0)
+
+    def test_one_active_subscription_per_owner(self):
+        self.assertEqual(UserSubscription.objects.filter(status="active").count(), 20)
+
+    def test_refuses_to_seed_twice_with_same_prefix(self):
+        with self.assertRaises(CommandError):
+            call_command("seed_load_data", owners=1, drivers=1, stdout=StringIO())
+
+
+class DispatchSolveTests(SimpleTestCase):
+    # What a dispatch run may take, whatever the backlog.
+    LIMIT_SECONDS = 1.0
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        centers = np.array([(hub[1], hub[2]) for hub in HUBS])
+        self.neighbourhoods = centers[:, None, :] + self.rng.normal(
+            0, HUB_SPREAD_DEG, (len(HUBS), NEIGHBOURHOODS_PER_HUB, 2)
+        )
+
+    def points(self, n):
+        # Clustered around the seeded hubs' neighbourhoods, the way
+        # seed_load_data places restaurants and drivers.
+        weights = np.array([hub[3] for hub in HUBS])
+        hubs = self.rng.choice(len(HUBS), n, p=weights / weights.sum())
+        places = self.neighbourhoods[hubs, self.rng.integers(0, NEIGHBOURHOODS_PER_HUB, n)]
+        places += self.rng.normal(0, NEIGHBOURHOOD_SPREAD_DEG, places.shape)
+        return np.arange(1, n + 1), places[:, 0], places[:, 1]
+
+    def test_large_backlogs_solve_within_the_limit(self):
+        for n_pickups, n_drivers in [(20000, 300), (10000, 1000), (2000, 2000), (1000, 3000)]:
+            with self.subTest(pickups=n_pickups, drivers=n_drivers):
+                pairs, stats = match(self.points(n_pickups), self.points(n_drivers), max_km=15)
+                self.assertLess(stats["solve_seconds"], self.LIMIT_SECONDS)
+                # Every pickup or driver, whichever is scarcer, is matched.
+                self.assertEqual(len(pairs), stats["assigned"])
+                self.assertGreater(stats["assigned"], 0.95 * min(n_pickups, n_drivers))
+
+    def test_components_give_the_same_total_as_one_matrix(self):
+        pickups, drivers = self.points(300), self.points(250)
+
+        pairs, stats = match(pickups, drivers, max_km=15)
+
+        distances = haversine_matrix(drivers[1], drivers[2], pickups[1], pickups[2])
+        cost = np.where(distances > 15, UNREACHABLE_COST, distances)
+        km = cost[np.arange(len(cost)), solve_assignment(cost)]
+        self.assertEqual(len(pairs), (km < UNREACHABLE_COST).sum())
+        self.assertAlmostEqual(stats["total_km"], km[km < UNREACHABLE_COST].sum(), places=6)
+        self.assertGreater(stats["components"], 1)
+
+
+class EndpointRoutesTests(SimpleTestCase):
+    def test_api_routes_lists_get_endpoints_only(self):
+        routes = api_routes()
+        self.assertIn("/api/trash_pickups/", routes)
+        self.assertIn("/api/trash_pickups/<pk>/", routes)
+        self.assertIn("/api/subscriptions/payments/", routes)
+        # POST-only, admin and format-suffix routes are left out.
+        self.assertNotIn("/api/rewards/redeem/", routes)
+        self.assertNotIn("/api/token/", routes)
+        # Never-ending event streams cannot be replayed like requests.
+        self.assertNotIn("/api/trash_pickups/events/", routes)
+        self.assertFalse([r for r in routes if "format" in r or not r.startswith("/api/")])
+
+    def test_compare_flags_slower_routes_and_extra_queries(self):
+        baseline = {
+            "owner /a/": {"p95_ms": 10.0, "queries": 2},
+            "owner /b/": {"p95_ms": 10.0, "queries": 2},
+        }
+        current = {
+            "owner /a/": {"p95_ms": 11.0, "queries": 3},
+            "owner /b/": {"p95_ms": 15.0, "queries": 2},
+            "owner /c/": {"p95_ms": 1.0, "queries": 1},
+        }
+        rows = {row["route"]: row for row in compare(baseline, current, threshold=0.2)}
+        self.assertTrue(rows["owner /a/"]["regressed"])
+        self.assertTrue(rows["owner /b/"]["regressed"])
+        self.assertTrue(rows["owner /c/"]["new"])
+        self.assertFalse(compare(baseline, baseline)[0]["regressed"])
+
+
+class EndpointSuiteTests(TransactionTestCase):
+    def test_run_suite_measures_routes_concurrently(self):
+        call_command(
+            "seed_load_data", owners=3, drivers=2, pickups=30, locations=20,
+            transactions_per_owner=3, subscriptions_per_owner=1, stdout=StringIO(),
+        )
+        owner = User.objects.get(username="load-owner-0")
+        results, skipped = run_suite(
+            ClientTransport(), {"owner": owner},
+            ["/api/rewards/transactions/", "/api/trash_pickups/<pk>/", "/api/donations/drives/<pk>/"],
+            requests=6, concurrency=3, warmup=0,
+        )
+        stats = results["owner /api/rewards/transactions/"]
+        self.assertEqual(stats["requests"], 6)
+        self.assertEqual(stats["status"], {"200": 6})
+        self.assertGreater(stats["queries"], 0)
+        self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+        self.assertRegex(results["owner /api/trash_pickups/<pk>/"]["path"], r"^/api/trash_pickups/\d+/$")
+        self.assertEqual(skipped, ["owner /api/donations/drives/<pk>/"])
+
+
+class PushLoadTests(TransactionTestCase):
+    def test_bench_push_fans_out_to_every_connection(self):
+        User.objects.create_user(username="streamer")
+        out = StringIO()
+
+        call_command("bench_push", connections=30, events=3, interval=0.01, batch=10,
+                     username="streamer", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("30 connections opened", output)
+        self.assertIn("0 failed", output)
+        self.assertIn("90/90 events delivered", output)
+        self.assertIn("subscriptions left after disconnect: 0", output)
+
+
+class CheckoutLoadTests(TransactionTestCase):
+    def test_bench_checkout_lets_one_racer_win_and_cleans_up(self):
+        for i in range(4):
+            User.objects.create_user(username=f"load-owner-{i}")
+        SubscriptionPlan.objects.create(name="basic", price=Decimal("199.00"), duration_days=30)
+        out = StringIO()
+
+        call_command("bench_checkout", checkouts=40, concurrency=4, contended_share=0.25, stdout=out)
+
+        self.assertIn("31 succeeded; 1 of 10 racing for the shared code won", out.getvalue())
+        self.assertFalse(UserSubscription.objects.exists())
+        self.assertFalse(SubscriptionPayment.objects.exists())
+        self.assertFalse(Voucher.objects.exists())
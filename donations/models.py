@@ -53,12 +53,11 @@ class DonationParticipation(models.Model):
         self.save()
 
         try:
-            from rewards.models import RewardPoint
-            reward, _ = RewardPoint.objects.get_or_create(user=self.user)
-            reward.add_points(
-                amount=20,
+            from rewards import ledger
+            ledger.record(
+                self.user,
+                20,
                 description=f"Donation completed for {self.drive.title}",
-                transaction_type="earn",
             )
         except Exception as e:
             print(" Error awarding reward points:", e)
\ No newline at end of file
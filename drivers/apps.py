@@ -6,3 +6,6 @@ class DriversConfig(AppConfig):
 
     def ready(self):
         import drivers.signals
+        from django.core.signals import request_finished
+        from .live import flush_if_due
+        request_finished.connect(flush_if_due, dispatch_uid="drivers.live.flush_if_due")
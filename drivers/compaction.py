@@ -0,0 +1,206 @@
+# drivers/compaction.py
+"""
+Compaction of ``DriverLocation`` history.
+
+Recent fixes are kept exactly as uploaded. Older history is walked per
+driver in time order, page by page, and simplified with Douglas-Peucker:
+only the fixes needed to keep the track within a distance tolerance of
+the original survive. History past the retention horizon is deleted.
+
+Deletes run in small chunks, each in its own short transaction, so GPS
+uploads keep getting the write lock while a compaction runs. A driver's
+current row is never touched.
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Driver, DriverLocation
+
+RETENTION = timedelta(days=90)
+SIMPLIFY_AFTER = timedelta(days=7)
+TOLERANCE_M = 10.0
+PAGE_SIZE = 5000
+CHUNK_SIZE = 1000
+
+# Metres per degree of latitude (and of longitude at the equator).
+M_PER_DEGREE = 111_320.0
+
+
+def simplify(lats, lngs, tolerance_m):
+    """
+    Indices of the fixes Douglas-Peucker keeps for a track, in order.
+    The first and last fix are always kept; distances are measured to
+    the segment (not the infinite line) so back-and-forth runs survive.
+    """
+    n = len(lats)
+    if n <= 2:
+        return np.arange(n)
+    lats, lngs = np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64)
+    # Equirectangular projection is accurate enough at track scale.
+    x = (lngs - lngs[0]) * np.cos(np.radians(lats.mean())) * M_PER_DEGREE
+    y = (lats - lats[0]) * M_PER_DEGREE
+
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length_sq = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / length_sq, 0, 1) if length_sq else 0.0
+        distances = np.hypot(px - t * dx, py - t * dy)
+        worst = int(np.argmax(distances))
+        if distances[worst] > tolerance_m:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.extend([(first, split), (split, last)])
+    return np.flatnonzero(keep)
+
+
+def storage_bytes():
+    """
+    ``(file_bytes, free_bytes)`` of the database, or ``None`` when the
+    backend does not expose it. Deleted rows show up as free pages that
+    new rows reuse; ``VACUUM`` gives them back to the filesystem.
+    """
+    if connection.vendor != "sqlite":
+        return None
+    values = []
+    with connection.cursor() as cursor:
+        for pragma in ("page_size", "page_count", "freelist_count"):
+            cursor.execute(f"PRAGMA {pragma}")
+            values.append(cursor.fetchone()[0])
+    page_size, pages, free = values
+    return pages * page_size, free * page_size
+
+
+def vacuum():
+    """Rebuild the database file (SQLite only; locks the database while it runs)."""
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM")
+
+
+class _Deleter:
+    """Deletes primary keys in chunks of ``chunk_size`` as they are collected."""
+
+    def __init__(self, chunk_size, pause, dry_run):
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.dry_run = dry_run
+        self.pending = []
+        self.deleted = 0
+
+    def add(self, pks):
+        self.pending.extend(pks)
+        while len(self.pending) >= self.chunk_size:
+            self.delete(self.pending[:self.chunk_size])
+            self.pending = self.pending[self.chunk_size:]
+
+    def finish(self):
+        if self.pending:
+            self.delete(self.pending)
+            self.pending = []
+        return self.deleted
+
+    def delete(self, pks):
+        if self.dry_run:
+            self.deleted += len(pks)
+            return
+        self.deleted += DriverLocation.objects.filter(pk__in=pks).delete()[0]
+        if self.pause:
+            time.sleep(self.pause)
+
+
+def expired(before):
+    """Non-current fixes taken before ``before``."""
+    return DriverLocation.objects.filter(timestamp__lt=before, is_current=False)
+
+
+def history_page(driver_id, after, before, cursor=None):
+    """
+    One driver's non-current fixes in ``[after, before)``, oldest first,
+    after the ``(timestamp, pk)`` keyset ``cursor``.
+    """
+    page = DriverLocation.objects.filter(
+        driver_id=driver_id, timestamp__gte=after, timestamp__lt=before, is_current=False
+    )
+    if cursor is not None:
+        page = page.filter(Q(timestamp__gt=cursor[0]) | Q(timestamp=cursor[0], pk__gt=cursor[1]))
+    return page.order_by("timestamp", "pk")
+
+
+def expire_history(before, chunk_size=CHUNK_SIZE, pause=0, dry_run=False):
+    """Delete non-current fixes taken before ``before``; returns the row count."""
+    old = expired(before)
+    if dry_run:
+        return old.count()
+    deleter = _Deleter(chunk_size, pause, dry_run)
+    while True:
+        pks = list(old.values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return deleter.deleted
+        deleter.delete(pks)
+
+
+def simplify_history(after, before, tolerance_m=TOLERANCE_M, page_size=PAGE_SIZE,
+                     chunk_size=CHUNK_SIZE, pause=0, dry_run=False):
+    """
+    Simplify every driver's non-current fixes taken in ``[after, before)``.
+    Returns ``(removed, kept)`` row counts.
+    """
+    deleter = _Deleter(chunk_size, pause, dry_run)
+    kept = 0
+
+    for driver_id in Driver.objects.order_by("pk").values_list("pk", flat=True):
+        cursor = None
+        while True:
+            page = history_page(driver_id, after, before, cursor)
+            rows = list(page.values_list("pk", "latitude", "longitude", "timestamp")[:page_size])
+            if not rows:
+                break
+            pks = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            survivors = simplify(
+                [float(row[1]) for row in rows], [float(row[2]) for row in rows], tolerance_m
+            )
+            dropped = np.ones(len(rows), dtype=bool)
+            dropped[survivors] = False
+            deleter.add(pks[dropped].tolist())
+            kept += len(survivors)
+            if len(rows) < page_size:
+                break
+            # Every page keeps its first and last fix, so the track stays
+            # connected across pages at the cost of two extra points.
+            cursor = (rows[-1][3], rows[-1][0])
+
+    return deleter.finish(), kept
+
+
+def compact(now=None, retention=RETENTION, simplify_after=SIMPLIFY_AFTER, tolerance_m=TOLERANCE_M,
+            page_size=PAGE_SIZE, chunk_size=CHUNK_SIZE, pause=0, dry_run=False):
+    """
+    Expire history past ``retention`` and simplify history older than
+    ``simplify_after``. Returns a report of rows removed and, where the
+    backend can tell, the bytes freed inside the database file.
+    """
+    now = now or timezone.now()
+    storage_before = storage_bytes()
+
+    expired = expire_history(now - retention, chunk_size, pause, dry_run)
+    simplified, kept = simplify_history(
+        now - retention, now - simplify_after, tolerance_m, page_size, chunk_size, pause, dry_run
+    )
+
+    report = {"expired": expired, "simplified": simplified, "kept": kept, "bytes_freed": None}
+    storage_after = storage_bytes()
+    if storage_before and storage_after and not dry_run:
+        report["bytes_freed"] = max(storage_after[1] - storage_before[1], 0)
+    return report
@@ -0,0 +1,345 @@
+# drivers/live.py
+"""
+Live driver positions with write-behind history.
+
+The latest fix of every driver lives in a cache (``LIVE_LOCATIONS["CACHE"]``;
+process-local LocMem by default, a shared backend in multi-process
+deployments) and current-location reads are answered from there. Uploaded
+fixes are buffered in this process and written to ``DriverLocation`` in
+one bulk flush when the write-behind window has passed or the buffer
+reaches its size limit, whichever comes first. Those two settings bound
+what a crash can lose. Flushes ride on uploads and finished requests; a
+timer thread covers a process that has gone quiet. Fixes that keep
+failing to flush are dropped after ``MAX_FLUSH_ATTEMPTS`` tries, and the
+buffer never holds more than ``MAX_PENDING_FIXES``.
+"""
+import atexit
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+
+from restaurant_waste_backend import push
+from trash_pickups import geofence
+from trash_pickups.geo import encode_geohash
+from .locations import record_fixes, validate_fixes
+from .models import Driver, DriverLocation
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "CACHE": "default",
+    "TTL_SECONDS": 15 * 60,
+    "FLUSH_INTERVAL_SECONDS": 5,
+    "MAX_PENDING_FIXES": 2000,
+    "MAX_FLUSH_ATTEMPTS": 5,
+}
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "LIVE_LOCATIONS", {})}
+
+
+def _cache():
+    return caches[config()["CACHE"]]
+
+
+def _key(driver_id):
+    return f"driver-live:{driver_id}"
+
+
+def _position(lat, lng, timestamp):
+    return {"lat": float(lat), "lng": float(lng), "timestamp": timestamp}
+
+
+def remember(driver_id, lat, lng, timestamp):
+    """Make this the live position unless a newer one is already known."""
+    cache = _cache()
+    known = cache.get(_key(driver_id))
+    if known is not None and known["timestamp"] > timestamp:
+        return known
+    position = _position(lat, lng, timestamp)
+    cache.set(_key(driver_id), position, config()["TTL_SECONDS"])
+    return position
+
+
+def current_locations(driver_ids):
+    """
+    ``{driver_id: {"lat", "lng", "timestamp"}}`` for the given drivers.
+    Cache misses are read from ``DriverLocation`` in one query and put
+    back into the cache; drivers without any fix are left out.
+    """
+    driver_ids = list(driver_ids)
+    if not driver_ids:
+        return {}
+    cache = _cache()
+    cached = cache.get_many([_key(pk) for pk in driver_ids])
+    found = {pk: cached[_key(pk)] for pk in driver_ids if _key(pk) in cached}
+
+    missing = [pk for pk in driver_ids if pk not in found]
+    if missing:
+        loaded = {}
+        rows = (
+            DriverLocation.objects.filter(driver_id__in=missing, is_current=True)
+            .order_by("driver_id", "timestamp")
+            .values_list("driver_id", "latitude", "longitude", "timestamp")
+        )
+        for driver_id, lat, lng, timestamp in rows:
+            # Ordered by timestamp, so the newest current row wins.
+            loaded[driver_id] = _position(lat, lng, timestamp)
+        if loaded:
+            cache.set_many({_key(pk): pos for pk, pos in loaded.items()}, config()["TTL_SECONDS"])
+        found.update(loaded)
+    return found
+
+
+def _announce(driver_id, position, newest):
+    # Pushed to stream subscribers (see trash_pickups.streams) and checked
+    # against the driver's pickup geofences only when the driver actually
+    # moved; late uploads stay silent.
+    if position is not None and position["timestamp"] == newest:
+        push.publish(f"driver:{driver_id}", "driver.position", {"driver": driver_id, **position})
+        geofence.check_arrival(driver_id, position["lat"], position["lng"])
+
+
+def current_location(driver_id):
+    return current_locations([driver_id]).get(driver_id)
+
+
+def forget(driver_ids):
+    _cache().delete_many([_key(pk) for pk in driver_ids])
+
+
+def reset():
+    """Drop all live positions and unflushed fixes (used by tests)."""
+    _cache().clear()
+    buffer.clear()
+
+
+class WriteBehindBuffer:
+    """Fixes accepted by this process but not yet written to the database."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._oldest = None
+        self._failures = 0
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, rows):
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.extend(rows)
+            self._schedule()
+
+    def is_due(self):
+        cfg = config()
+        if not self._pending:
+            return False
+        return (
+            len(self._pending) >= cfg["MAX_PENDING_FIXES"]
+            or time.monotonic() - self._oldest >= cfg["FLUSH_INTERVAL_SECONDS"]
+        )
+
+    def for_driver(self, driver_id):
+        with self._lock:
+            return [row for row in self._pending if row[0] == driver_id]
+
+    def take(self):
+        with self._lock:
+            rows, self._pending, self._oldest = self._pending, [], None
+        return rows
+
+    def flushed(self):
+        with self._lock:
+            self._failures = 0
+
+    def put_back(self, rows):
+        """
+        Return rows whose flush failed, ahead of anything buffered since.
+        After ``MAX_FLUSH_ATTEMPTS`` failures in a row they are dropped,
+        and the oldest rows go once the buffer would exceed
+        ``MAX_PENDING_FIXES``. Returns the number of rows dropped.
+        """
+        cfg = config()
+        dropped = 0
+        with self._lock:
+            self._failures += 1
+            if self._failures >= cfg["MAX_FLUSH_ATTEMPTS"]:
+                dropped, rows, self._failures = len(rows), [], 0
+            pending = list(rows) + self._pending
+            overflow = len(pending) - cfg["MAX_PENDING_FIXES"]
+            if overflow > 0:
+                dropped += overflow
+                pending = pending[overflow:]
+            self._pending = pending
+            self._oldest = time.monotonic() if pending else None
+            self._schedule()
+        if dropped:
+            logger.error("Dropped %d buffered driver locations that could not be written", dropped)
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._pending, self._oldest, self._failures = [], None, 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _schedule(self):
+        # Called with the lock held: one timer per buffer, due when the
+        # oldest pending fix reaches the end of the window.
+        interval = config()["FLUSH_INTERVAL_SECONDS"]
+        if self._timer is not None or not self._pending or not interval:
+            return
+        delay = max(self._oldest + interval - time.monotonic(), 0)
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            flush_if_due()
+        finally:
+            connections.close_all()
+            with self._lock:
+                self._schedule()
+
+
+buffer = WriteBehindBuffer()
+
+
+def ingest(driver, fixes):
+    """
+    Accept a batch of fixes for ``driver``.
+
+    The live position is updated right away, and pickups the driver has
+    arrived at are started (``trash_pickups.geofence``). With a
+    write-behind window the fixes are buffered (and flushed if that makes
+    the buffer due); with ``FLUSH_INTERVAL_SECONDS = 0`` they are written
+    through with ``record_fixes``. Database errors never fail the upload:
+    they are logged and the fixes stay buffered for the capped retries.
+    Returns ``(accepted, rejected, current)``.
+    """
+    if not config()["FLUSH_INTERVAL_SECONDS"]:
+        try:
+            locations, rejected = record_fixes(driver, fixes)
+        except Exception:
+            logger.exception("Writing driver locations through failed; buffering them")
+        else:
+            current = None
+            if locations:
+                newest = locations[-1]
+                current = remember(driver.pk, newest.latitude, newest.longitude, newest.timestamp)
+                _announce(driver.pk, current, newest.timestamp)
+            return len(locations), rejected, current
+
+    lats, lngs, timestamps, rejected = validate_fixes(fixes)
+    if not timestamps:
+        return 0, rejected, None
+
+    lats, lngs = lats.tolist(), lngs.tolist()
+    current = remember(driver.pk, lats[-1], lngs[-1], timestamps[-1])
+    _announce(driver.pk, current, timestamps[-1])
+    buffer.add([(driver.pk, lat, lng, ts) for lat, lng, ts in zip(lats, lngs, timestamps)])
+    flush_if_due()
+    return len(timestamps), rejected, current
+
+
+def flush():
+    """
+    Write every buffered fix in one transaction: two lookups, one UPDATE
+    clearing old ``is_current`` flags, one bulk INSERT and one bulk UPDATE
+    of the ``Driver`` rows, however many drivers are in the buffer.
+    Returns the number of fixes taken from the buffer.
+    """
+    rows = buffer.take()
+    if not rows:
+        return 0
+    try:
+        _write(rows)
+    except Exception:
+        buffer.put_back(rows)
+        raise
+    buffer.flushed()
+    return len(rows)
+
+
+def _write(rows):
+    # Fixes of drivers deleted since they were buffered are dropped.
+    existing = set(
+        Driver.objects.filter(pk__in={row[0] for row in rows}).values_list("pk", flat=True)
+    )
+    rows = sorted((row for row in rows if row[0] in existing), key=lambda row: (row[0], row[3]))
+    if not rows:
+        return
+    newest = {}
+    for index, (driver_id, _, _, timestamp) in enumerate(rows):
+        newest[driver_id] = index
+
+    with transaction.atomic():
+        # Drivers whose database position is newer than anything buffered
+        # (written through another path meanwhile) keep it.
+        db_current = dict(
+            DriverLocation.objects.filter(driver_id__in=newest, is_current=True)
+            .values_list("driver_id", "timestamp")
+        )
+        movers = [
+            driver_id for driver_id, index in newest.items()
+            if driver_id not in db_current or rows[index][3] >= db_current[driver_id]
+        ]
+        moving_rows = {newest[driver_id] for driver_id in movers}
+
+        DriverLocation.objects.filter(driver_id__in=movers, is_current=True).update(is_current=False)
+        DriverLocation.objects.bulk_create([
+            DriverLocation(
+                driver_id=driver_id,
+                latitude=Decimal(str(lat)),
+                longitude=Decimal(str(lng)),
+                timestamp=timestamp,
+                is_current=index in moving_rows,
+            )
+            for index, (driver_id, lat, lng, timestamp) in enumerate(rows)
+        ])
+        Driver.objects.bulk_update(
+            [
+                Driver(
+                    pk=driver_id,
+                    latitude=Decimal(str(rows[newest[driver_id]][1])),
+                    longitude=Decimal(str(rows[newest[driver_id]][2])),
+                    geohash=encode_geohash(rows[newest[driver_id]][1], rows[newest[driver_id]][2]),
+                )
+                for driver_id in movers
+            ],
+            ["latitude", "longitude", "geohash"],
+        )
+
+
+def flush_if_due(**kwargs):
+    """``request_finished`` and timer hook: flush once the window has passed."""
+    if buffer.is_due():
+        try:
+            flush()
+        except Exception:
+            logger.exception("Flushing live driver locations failed; will retry")
+
+
+def _flush_at_exit():
+    if len(buffer):
+        try:
+            flush()
+        except Exception:
+            logger.exception("Could not flush %d live driver locations at exit", len(buffer))
+
+
+atexit.register(_flush_at_exit)
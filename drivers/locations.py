@@ -0,0 +1,161 @@
+# drivers/locations.py
+"""
+GPS fix ingestion.
+
+Phones buffer fixes and upload them in batches. A batch is validated as
+whole arrays, inserted with one ``bulk_create``, and only the newest fix
+moves the driver's current position, so a batch costs the same handful
+of statements whether it holds one fix or hundreds.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from trash_pickups.geo import encode_geohash
+from .models import Driver, DriverLocation
+
+MAX_BATCH_SIZE = 500
+# Device clocks drift; fixes slightly in the future are accepted.
+MAX_CLOCK_SKEW = timedelta(minutes=2)
+# Fixes older than this are not worth storing.
+MAX_FIX_AGE = timedelta(hours=24)
+
+
+def _parse_timestamp(value):
+    """ISO 8601 string or epoch seconds/milliseconds to an aware datetime."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        seconds = value / 1000 if value > 1e11 else value
+        try:
+            return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if isinstance(value, str):
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            return None
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+    return None
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def validate_fixes(fixes, now=None):
+    """
+    Check a list of ``{"latitude", "longitude", "timestamp"}`` dicts.
+
+    Returns ``(lats, lngs, timestamps, rejected)``: the accepted fixes as
+    arrays sorted oldest first (a repeated timestamp keeps the last fix
+    sent), and ``{"index", "reason"}`` for every rejected one. Range and
+    age checks run on whole arrays.
+    """
+    now = now or timezone.now()
+    n = len(fixes)
+    if not n:
+        return np.empty(0), np.empty(0), [], []
+
+    def field(fix, name):
+        return fix.get(name) if isinstance(fix, dict) else None
+
+    lats = np.fromiter((_to_float(field(f, "latitude")) for f in fixes), dtype=np.float64, count=n)
+    lngs = np.fromiter((_to_float(field(f, "longitude")) for f in fixes), dtype=np.float64, count=n)
+    parsed = [_parse_timestamp(field(f, "timestamp")) for f in fixes]
+    # Seconds relative to now; NaN where the timestamp did not parse.
+    offsets = np.fromiter(
+        ((ts - now).total_seconds() if ts is not None else np.nan for ts in parsed),
+        dtype=np.float64, count=n,
+    )
+
+    reasons = np.full(n, "", dtype=object)
+    checks = [
+        (~np.isfinite(offsets), "invalid timestamp"),
+        (offsets > MAX_CLOCK_SKEW.total_seconds(), "timestamp in the future"),
+        (offsets < -MAX_FIX_AGE.total_seconds(), "timestamp too old"),
+        (~(np.abs(lngs) <= 180), "invalid longitude"),
+        (~(np.abs(lats) <= 90), "invalid latitude"),
+    ]
+    # Later checks overwrite earlier ones, so the first listed reason wins.
+    for failed, reason in reversed(checks):
+        reasons[failed] = reason
+
+    ok = np.flatnonzero(reasons == "")
+    rejected = [{"index": int(i), "reason": reasons[i]} for i in np.flatnonzero(reasons != "")]
+
+    # Oldest first; for equal timestamps the later fix in the upload wins.
+    order = ok[np.lexsort((ok, offsets[ok]))]
+    keep = np.ones(len(order), dtype=bool)
+    keep[:-1] = offsets[order[:-1]] != offsets[order[1:]]
+    order = order[keep]
+
+    return (
+        np.round(lats[order], 6),
+        np.round(lngs[order], 6),
+        [parsed[i] for i in order],
+        rejected,
+    )
+
+
+def record_fixes(driver, fixes, now=None):
+    """
+    Store a batch of GPS fixes for ``driver``.
+
+    All statements run in one transaction: one UPDATE that clears the old
+    ``is_current`` flag, one INSERT for the whole batch and one UPDATE of
+    the ``Driver`` row. A batch older than the current position is stored
+    as history without moving the driver.
+    Returns ``(locations, rejected)``; ``locations`` are the created rows,
+    oldest first.
+    """
+    lats, lngs, timestamps, rejected = validate_fixes(fixes, now=now)
+    if not timestamps:
+        return [], rejected
+
+    with transaction.atomic():
+        # Normally exactly one current row is older than the batch and
+        # gets un-flagged here; if none was, either this is the driver's
+        # first fix or a newer one is already current (late upload).
+        unflagged = DriverLocation.objects.filter(
+            driver=driver, is_current=True, timestamp__lte=timestamps[-1]
+        ).update(is_current=False)
+        newest_is_current = bool(unflagged) or not DriverLocation.objects.filter(
+            driver=driver, is_current=True
+        ).exists()
+
+        locations = [
+            DriverLocation(
+                driver=driver,
+                latitude=Decimal(str(lat)),
+                longitude=Decimal(str(lng)),
+                timestamp=ts,
+                is_current=False,
+            )
+            for lat, lng, ts in zip(lats.tolist(), lngs.tolist(), timestamps)
+        ]
+        if newest_is_current:
+            locations[-1].is_current = True
+        DriverLocation.objects.bulk_create(locations)
+
+        if newest_is_current:
+            latest = locations[-1]
+            geohash = encode_geohash(latest.latitude, latest.longitude)
+            Driver.objects.filter(pk=driver.pk).update(
+                latitude=latest.latitude, longitude=latest.longitude, geohash=geohash
+            )
+            driver.latitude, driver.longitude, driver.geohash = latest.latitude, latest.longitude, geohash
+
+    return locations, rejected
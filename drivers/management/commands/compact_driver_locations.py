@@ -0,0 +1,79 @@
+# drivers/management/commands/compact_driver_locations.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from drivers import compaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Shrink DriverLocation history: simplify old tracks with Douglas-Peucker "
+        "and delete fixes past the retention horizon, in small chunked deletes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=compaction.RETENTION.days,
+            help="Delete history older than this.",
+        )
+        parser.add_argument(
+            "--simplify-after-days",
+            type=int,
+            default=compaction.SIMPLIFY_AFTER.days,
+            help="Keep newer history exactly as uploaded.",
+        )
+        parser.add_argument(
+            "--tolerance-m",
+            type=float,
+            default=compaction.TOLERANCE_M,
+            help="Simplified tracks stay within this many metres of the original.",
+        )
+        parser.add_argument("--page-size", type=int, default=compaction.PAGE_SIZE)
+        parser.add_argument("--chunk-size", type=int, default=compaction.CHUNK_SIZE)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between delete chunks to leave room for other writers.",
+        )
+        parser.add_argument(
+            "--vacuum",
+            action="store_true",
+            help="Rebuild the SQLite file afterwards so freed pages go back to the filesystem "
+                 "(locks the database while it runs).",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["simplify_after_days"] > options["retention_days"]:
+            options["simplify_after_days"] = options["retention_days"]
+
+        report = compaction.compact(
+            retention=timedelta(days=options["retention_days"]),
+            simplify_after=timedelta(days=options["simplify_after_days"]),
+            tolerance_m=options["tolerance_m"],
+            page_size=options["page_size"],
+            chunk_size=options["chunk_size"],
+            pause=options["pause"],
+            dry_run=options["dry_run"],
+        )
+        verb = "would remove" if options["dry_run"] else "removed"
+        self.stdout.write(
+            f"{verb} {report['expired'] + report['simplified']} rows: "
+            f"{report['expired']} past retention, {report['simplified']} simplified away "
+            f"({report['kept']} simplified fixes kept)"
+        )
+        if report["bytes_freed"] is not None:
+            self.stdout.write(f"freed {report['bytes_freed']} bytes inside the database file")
+
+        if options["vacuum"] and not options["dry_run"]:
+            before = compaction.storage_bytes()
+            compaction.vacuum()
+            after = compaction.storage_bytes()
+            if before and after:
+                self.stdout.write(f"vacuum returned {before[0] - after[0]} bytes to the filesystem")
+
+        self.stdout.write(self.style.SUCCESS("Compaction finished."))
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0003_driver_latitude_driver_longitude'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driverlocation',
+            index=models.Index(condition=models.Q(('is_current', True)), fields=['driver', '-timestamp'], name='driverloc_current_idx'),
+        ),
+    ]
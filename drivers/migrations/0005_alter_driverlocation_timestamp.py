@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0004_driverlocation_driverloc_current_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='driverlocation',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
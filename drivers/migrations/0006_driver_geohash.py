@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:38
+
+from django.db import migrations, models
+
+from trash_pickups.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    Driver = apps.get_model('drivers', 'Driver')
+    drivers = Driver.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).only('id', 'latitude', 'longitude')
+
+    batch = []
+    for driver in drivers.iterator(chunk_size=2000):
+        driver.geohash = encode_geohash(driver.latitude, driver.longitude)
+        batch.append(driver)
+        if len(batch) >= 2000:
+            Driver.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Driver.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0005_alter_driverlocation_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0007_driverlocation_driverloc_driver_ts_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driverlocation',
+            index=models.Index(fields=['timestamp'], name='driverloc_timestamp_idx'),
+        ),
+    ]
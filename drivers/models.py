@@ -3,6 +3,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from trash_pickups.geo import encode_geohash
+
 class Driver(models.Model):
     user = models.OneToOneField(
         User,
@@ -30,6 +32,15 @@ class Driver(models.Model):
     rating = models.FloatField(default=0.0)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    # Cell of the current position, kept in step with latitude/longitude
+    # on every location write; indexed for nearby-driver lookups.
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+    )
 
     def save(self, *args, **kwargs):
         if not self.user:
@@ -38,6 +49,12 @@ class Driver(models.Model):
             username = self.full_name.lower().replace(" ", "_")
             user, _ = User.objects.get_or_create(username=username)
             self.user = user
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and (
+            "latitude" in update_fields or "longitude" in update_fields
+        ):
+            kwargs["update_fields"] = set(update_fields) | {"geohash"}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -51,8 +68,22 @@ class DriverLocation(models.Model):
     )
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # When the fix was taken on the device (batched uploads arrive later).
+    timestamp = models.DateTimeField(default=timezone.now)
     is_current = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["driver", "-timestamp"],
+                condition=models.Q(is_current=True),
+                name="driverloc_current_idx",
+            ),
+            # Track history: one driver's fixes in a time window, in order.
+            models.Index(fields=["driver", "timestamp"], name="driverloc_driver_ts_idx"),
+            # Retention: every fix older than a cutoff, whichever driver.
+            models.Index(fields=["timestamp"], name="driverloc_timestamp_idx"),
+        ]
+
     def __str__(self):
         return f"{self.driver.full_name} @ {self.latitude}, {self.longitude}"
@@ -0,0 +1,47 @@
+# drivers/nearby.py
+"""
+Nearest drivers around a point.
+
+Candidates are read through the index on ``Driver.geohash`` (kept in
+step with every location write), restricted to the cells covering the
+search circle. Their positions are then refreshed from the live store,
+and distances are computed for all candidates at once.
+"""
+import numpy as np
+
+from trash_pickups.geo import covering_cells, geohash_filter, haversine_matrix
+from . import live
+from .models import Driver
+
+
+def nearby_drivers(lat, lng, radius_km, limit, **filters):
+    """
+    ``[(driver_id, distance_km)]`` for the ``limit`` nearest drivers within
+    ``radius_km`` that match ``filters`` (field lookups), nearest first.
+
+    The stored position may lag the live one by the write-behind window,
+    so a driver who crossed into the circle within the last seconds can
+    be missed until the next flush.
+    """
+    rows = list(
+        Driver.objects.filter(geohash_filter(covering_cells(lat, lng, radius_km)), **filters)
+        .values_list("pk", "latitude", "longitude")
+    )
+    if not rows:
+        return []
+
+    ids = [row[0] for row in rows]
+    lats = np.array([float(row[1]) for row in rows])
+    lngs = np.array([float(row[2]) for row in rows])
+    positions = live.current_locations(ids)
+    for index, pk in enumerate(ids):
+        position = positions.get(pk)
+        if position is not None:
+            lats[index], lngs[index] = position["lat"], position["lng"]
+
+    distances = haversine_matrix([lat], [lng], lats, lngs)[0]
+    inside = np.flatnonzero(distances <= radius_km)
+    if len(inside) > limit:
+        inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+    inside = inside[np.argsort(distances[inside], kind="stable")]
+    return [(ids[i], float(distances[i])) for i in inside]
@@ -1,5 +1,6 @@
 # drivers/serializers.py
 from rest_framework import serializers
+from . import live
 from .models import Driver, DriverLocation
 
 class DriverLocationSerializer(serializers.ModelSerializer):
@@ -15,6 +16,15 @@ class DriverLocationSerializer(serializers.ModelSerializer):
             'timestamp',
             'is_current',
         ]
+        read_only_fields = ['timestamp']
+
+class DriverListSerializer(serializers.ListSerializer):
+    """Looks up the live position of every listed driver in one go."""
+
+    def to_representation(self, data):
+        drivers = list(data.all() if hasattr(data, "all") else data)
+        self.current_locations = live.current_locations(driver.pk for driver in drivers)
+        return super().to_representation(drivers)
 
 class DriverSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source="user.username", read_only=True)
@@ -37,16 +47,13 @@ class DriverSerializer(serializers.ModelSerializer):
             "rating",
             "current_location",
         ]
+        list_serializer_class = DriverListSerializer
 
     def get_current_location(self, obj):
-        latest = obj.locations.filter(is_current=True).order_by("-timestamp").first()
-        if not latest:
-            return None
-        return {
-            "lat": float(latest.latitude),
-            "lng": float(latest.longitude),
-            "timestamp": latest.timestamp,
-        }
+        prefetched = getattr(self.parent, "current_locations", None)
+        if prefetched is not None:
+            return prefetched.get(obj.pk)
+        return live.current_location(obj.pk)
 
 class DriverWriteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,3 +1,494 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from trash_pickups.geo import encode_geohash
+
+from . import live
+from .compaction import compact, simplify
+from .trajectory import encode_deltas, encode_polyline
+from .locations import record_fixes, validate_fixes
+from .models import Driver, DriverLocation
+
+
+def make_driver(username, **kwargs):
+    return Driver.objects.create(
+        user=User.objects.create_user(username=username),
+        full_name=username.title(),
+        phone_number="123",
+        license_number=f"L-{username}",
+        **kwargs,
+    )
+
+
+def fix(lat, lng, when):
+    return {"latitude": lat, "longitude": lng, "timestamp": when.isoformat()}
+
+
+class ValidateFixesTests(TestCase):
+    def test_rejects_bad_fixes_and_sorts_the_rest(self):
+        now = timezone.now()
+        fixes = [
+            fix(7.2, 125.2, now - timedelta(seconds=10)),
+            {"latitude": 95, "longitude": 125, "timestamp": now.isoformat()},
+            {"latitude": "x", "longitude": 125, "timestamp": now.isoformat()},
+            fix(7.1, 125.1, now - timedelta(seconds=20)),
+            {"latitude": 7, "longitude": 125, "timestamp": "yesterday"},
+            fix(7, 125, now + timedelta(hours=1)),
+            fix(7, 125, now - timedelta(days=3)),
+            "not a fix",
+        ]
+        lats, lngs, timestamps, rejected = validate_fixes(fixes, now=now)
+
+        self.assertEqual(lats.tolist(), [7.1, 7.2])
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(
+            {r["index"]: r["reason"] for r in rejected},
+            {
+                1: "invalid latitude",
+                2: "invalid latitude",
+                4: "invalid timestamp",
+                5: "timestamp in the future",
+                6: "timestamp too old",
+                7: "invalid timestamp",
+            },
+        )
+
+    def test_epoch_milliseconds_and_duplicate_timestamps(self):
+        now = timezone.now()
+        ms = int((now - timedelta(seconds=5)).timestamp() * 1000)
+        lats, _, timestamps, rejected = validate_fixes(
+            [{"latitude": 1, "longitude": 2, "timestamp": ms},
+             {"latitude": 3, "longitude": 4, "timestamp": ms}],
+            now=now,
+        )
+        self.assertEqual(rejected, [])
+        # The later of two fixes with the same timestamp wins.
+        self.assertEqual(lats.tolist(), [3.0])
+        self.assertAlmostEqual(timestamps[0].timestamp(), ms / 1000, places=3)
+
+
+class RecordFixesTests(TestCase):
+    def setUp(self):
+        self.driver = make_driver("gps")
+        self.now = timezone.now()
+
+    def test_batch_moves_current_position_to_newest_fix(self):
+        record_fixes(self.driver, [fix(7.0, 125.0, self.now - timedelta(minutes=5))])
+        fixes = [fix(7.0 + k / 1000, 125.0, self.now - timedelta(seconds=60 - k)) for k in range(50)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            locations, rejected = record_fixes(self.driver, fixes)
+
+        self.assertEqual((len(locations), rejected), (50, []))
+        # Un-flag, one INSERT, Driver update (plus savepoint handling).
+        writes = [q for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+        self.assertEqual(len(writes), 3)
+
+        current = DriverLocation.objects.get(driver=self.driver, is_current=True)
+        self.assertEqual(current.latitude, Decimal("7.049000"))
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.latitude, Decimal("7.049000"))
+        self.assertEqual(DriverLocation.objects.filter(driver=self.driver).count(), 51)
+
+    def test_late_batch_is_history_only(self):
+        record_fixes(self.driver, [fix(8.0, 126.0, self.now)])
+        record_fixes(self.driver, [fix(7.0, 125.0, self.now - timedelta(minutes=10))])
+
+        current = DriverLocation.objects.get(driver=self.driver, is_current=True)
+        self.assertEqual(current.latitude, Decimal("8.000000"))
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.latitude, Decimal("8.000000"))
+
+
+class LocationEndpointTests(TestCase):
+    def setUp(self):
+        live.reset()
+        self.driver = make_driver("phone")
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver.user)
+
+    def test_batch_upload(self):
+        now = timezone.now()
+        response = self.client.post(
+            "/api/drivers/me/locations/",
+            {"fixes": [fix(7.1, 125.1, now - timedelta(seconds=30)),
+                       fix(7.2, 125.2, now),
+                       {"latitude": 7, "longitude": 999, "timestamp": now.isoformat()}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["accepted"], 2)
+        self.assertEqual(response.data["rejected"], [{"index": 2, "reason": "invalid longitude"}])
+        self.assertEqual(response.data["current"]["lat"], 7.2)
+
+        # History is written behind; the live position is readable at once.
+        self.assertFalse(DriverLocation.objects.filter(driver=self.driver).exists())
+        self.assertEqual(live.current_location(self.driver.pk)["lat"], 7.2)
+        self.assertEqual(live.flush(), 2)
+        self.assertEqual(DriverLocation.objects.filter(driver=self.driver).count(), 2)
+
+    def test_batch_upload_rejects_empty_and_oversized(self):
+        self.assertEqual(
+            self.client.post("/api/drivers/me/locations/", {"fixes": []}, format="json").status_code, 400
+        )
+        now = timezone.now().isoformat()
+        too_many = [{"latitude": 1, "longitude": 1, "timestamp": now}] * 501
+        self.assertEqual(
+            self.client.post("/api/drivers/me/locations/", too_many, format="json").status_code, 400
+        )
+
+    def test_single_update_uses_same_path(self):
+        response = self.client.patch(
+            "/api/drivers/update_location/", {"latitude": "7.5", "longitude": "125.5"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        live.flush()
+        self.assertEqual(DriverLocation.objects.filter(driver=self.driver, is_current=True).count(), 1)
+
+        response = self.client.patch(
+            "/api/drivers/update_location/", {"latitude": "700", "longitude": "125.5"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_location_create_goes_through_the_live_store(self):
+        pickup_owner = User.objects.create_user(username="owner")
+        response = self.client.post("/api/driver-locations/", {"latitude": "7.1", "longitude": "125.1"},
+                                    format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data["is_current"])
+        self.assertEqual(live.current_location(self.driver.pk)["lat"], 7.1)
+        self.assertFalse(DriverLocation.objects.exists())
+
+        live.flush()
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.geohash, encode_geohash(7.1, 125.1))
+        self.assertEqual(DriverLocation.objects.filter(driver=self.driver, is_current=True).count(), 1)
+
+        client = APIClient()
+        client.force_authenticate(pickup_owner)
+        response = client.post("/api/driver-locations/", {"latitude": "7.1", "longitude": "125.1"}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class LiveLocationTests(TestCase):
+    def setUp(self):
+        live.reset()
+        self.now = timezone.now()
+        self.drivers = [make_driver(f"live{k}") for k in range(3)]
+
+    def test_reads_are_served_from_the_cache(self):
+        live.ingest(self.drivers[0], [fix(7.1, 125.1, self.now)])
+
+        with self.assertNumQueries(0):
+            position = live.current_location(self.drivers[0].pk)
+        self.assertEqual((position["lat"], position["lng"]), (7.1, 125.1))
+
+    def test_cache_miss_falls_back_to_the_database(self):
+        record_fixes(self.drivers[1], [fix(7.3, 125.3, self.now)])
+
+        with self.assertNumQueries(1):
+            positions = live.current_locations([d.pk for d in self.drivers])
+        self.assertEqual(list(positions), [self.drivers[1].pk])
+        # The miss was cached; drivers without any fix still cost a query.
+        with self.assertNumQueries(0):
+            live.current_location(self.drivers[1].pk)
+
+    def test_late_fix_does_not_replace_a_newer_position(self):
+        live.ingest(self.drivers[0], [fix(8.0, 126.0, self.now)])
+        live.ingest(self.drivers[0], [fix(7.0, 125.0, self.now - timedelta(minutes=5))])
+
+        self.assertEqual(live.current_location(self.drivers[0].pk)["lat"], 8.0)
+        live.flush()
+        current = DriverLocation.objects.get(driver=self.drivers[0], is_current=True)
+        self.assertEqual(current.latitude, Decimal("8.000000"))
+
+    def test_flush_writes_all_drivers_in_a_few_statements(self):
+        record_fixes(self.drivers[0], [fix(6.0, 124.0, self.now - timedelta(minutes=10))])
+        for k, driver in enumerate(self.drivers):
+            live.ingest(driver, [fix(7 + k, 125, self.now - timedelta(seconds=30 - s)) for s in range(10)])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(live.flush(), 30)
+        writes = [q for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+        self.assertEqual(len(writes), 3)
+
+        self.assertEqual(DriverLocation.objects.filter(is_current=True).count(), 3)
+        self.assertEqual(DriverLocation.objects.count(), 31)
+        self.drivers[2].refresh_from_db()
+        self.assertEqual(self.drivers[2].latitude, Decimal("9.000000"))
+        self.assertEqual(len(live.buffer), 0)
+
+    @override_settings(LIVE_LOCATIONS={"CACHE": "live_locations", "MAX_PENDING_FIXES": 5})
+    def test_buffer_flushes_once_full(self):
+        live.ingest(self.drivers[0], [fix(7, 125, self.now - timedelta(seconds=s)) for s in range(4)])
+        self.assertFalse(DriverLocation.objects.exists())
+
+        live.ingest(self.drivers[1], [fix(7, 125, self.now)])
+        self.assertEqual(DriverLocation.objects.count(), 5)
+        self.assertEqual(len(live.buffer), 0)
+
+    @override_settings(LIVE_LOCATIONS={"CACHE": "live_locations", "FLUSH_INTERVAL_SECONDS": 0})
+    def test_zero_window_writes_through(self):
+        accepted, _, current = live.ingest(self.drivers[0], [fix(7.5, 125.5, self.now)])
+
+        self.assertEqual((accepted, current["lat"]), (1, 7.5))
+        self.assertTrue(DriverLocation.objects.filter(driver=self.drivers[0], is_current=True).exists())
+        self.assertEqual(len(live.buffer), 0)
+
+    def test_failed_flushes_are_capped_and_eventually_dropped(self):
+        rows = [(self.drivers[0].pk, 7.0, 125.0, self.now - timedelta(seconds=s)) for s in range(4)]
+        with self.settings(LIVE_LOCATIONS={"CACHE": "live_locations", "MAX_PENDING_FIXES": 6,
+                                           "MAX_FLUSH_ATTEMPTS": 3}):
+            live.buffer.add(rows)
+            self.assertEqual(live.buffer.put_back(live.buffer.take()), 0)
+            live.buffer.add(rows)
+            with self.assertLogs("drivers.live", "ERROR"):
+                # Never more than MAX_PENDING_FIXES; the oldest go first.
+                self.assertEqual(live.buffer.put_back(live.buffer.take()), 2)
+                self.assertEqual(len(live.buffer), 6)
+                # Third failure in a row: the failed rows are given up.
+                self.assertEqual(live.buffer.put_back(live.buffer.take()), 6)
+                self.assertEqual(len(live.buffer), 0)
+
+    @override_settings(LIVE_LOCATIONS={"CACHE": "live_locations", "MAX_PENDING_FIXES": 1})
+    def test_failed_flush_does_not_fail_the_upload(self):
+        with mock.patch("drivers.live._write", side_effect=DatabaseError("locked")):
+            with self.assertLogs("drivers.live", "ERROR"):
+                accepted, _, current = live.ingest(self.drivers[0], [fix(7.2, 125.2, self.now)])
+
+        self.assertEqual((accepted, current["lat"]), (1, 7.2))
+        self.assertEqual(len(live.buffer), 1)
+        live.flush_if_due()
+        self.assertEqual(DriverLocation.objects.filter(driver=self.drivers[0]).count(), 1)
+
+    @override_settings(LIVE_LOCATIONS={"CACHE": "live_locations", "FLUSH_INTERVAL_SECONDS": 0})
+    def test_failed_write_through_is_buffered(self):
+        with mock.patch("drivers.live.record_fixes", side_effect=DatabaseError("locked")):
+            with self.assertLogs("drivers.live", "ERROR"):
+                accepted, _, _ = live.ingest(self.drivers[0], [fix(7.2, 125.2, self.now)])
+
+        # Written by the retry that rides on the same upload.
+        self.assertEqual(accepted, 1)
+        self.assertEqual(DriverLocation.objects.filter(driver=self.drivers[0], is_current=True).count(), 1)
+        self.assertEqual(len(live.buffer), 0)
+
+    def test_request_finished_flushes_when_due(self):
+        live.ingest(self.drivers[0], [fix(7, 125, self.now)])
+        live.buffer._oldest -= 60
+
+        live.flush_if_due()
+        self.assertEqual(DriverLocation.objects.count(), 1)
+
+
+class LiveFlushTimerTests(TransactionTestCase):
+    @override_settings(LIVE_LOCATIONS={"CACHE": "live_locations", "FLUSH_INTERVAL_SECONDS": 0.05})
+    def test_idle_process_flushes_on_a_timer(self):
+        live.reset()
+        self.addCleanup(live.reset)
+        driver = make_driver("idle")
+        live.ingest(driver, [fix(7.0, 125.0, timezone.now())])
+
+        # No further uploads or requests: the timer writes the fix.
+        deadline = time.monotonic() + 2
+        while not DriverLocation.objects.exists() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(DriverLocation.objects.filter(driver=driver).count(), 1)
+        self.assertEqual(len(live.buffer), 0)
+
+
+class DriverListQueryTests(TestCase):
+    def setUp(self):
+        live.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="staff", is_staff=True))
+        self.now = timezone.now()
+
+    def add_drivers(self, count):
+        for _ in range(count):
+            driver = make_driver(f"fleet{Driver.objects.count()}")
+            record_fixes(driver, [fix(7.0, 125.0 + driver.pk / 1000, self.now)])
+
+    def list_queries(self):
+        live.reset()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/drivers/")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data
+
+    def test_list_query_count_does_not_grow_with_the_fleet(self):
+        self.add_drivers(2)
+        small, _ = self.list_queries()
+        self.add_drivers(20)
+        large, data = self.list_queries()
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(data), 22)
+        for row in data:
+            self.assertAlmostEqual(row["current_location"]["lng"], 125.0 + row["id"] / 1000)
+
+    def test_retrieve_uses_the_live_position(self):
+        self.add_drivers(1)
+        driver = Driver.objects.get()
+        live.ingest(driver, [fix(7.5, 125.5, self.now)])
+
+        response = self.client.get(f"/api/drivers/{driver.pk}/")
+        self.assertEqual(response.data["current_location"]["lat"], 7.5)
+
+
+class CompactionTests(TestCase):
+    def setUp(self):
+        self.driver = make_driver("history")
+        self.now = timezone.now()
+
+    def add_track(self, start, points, step=timedelta(seconds=10), lng_step=0.0001):
+        DriverLocation.objects.bulk_create([
+            DriverLocation(
+                driver=self.driver,
+                latitude=Decimal("7.000000"),
+                longitude=Decimal(str(round(125 + k * lng_step, 6))),
+                timestamp=start + k * step,
+                is_current=False,
+            )
+            for k in range(points)
+        ])
+
+    def test_simplify_keeps_corners_and_drops_straight_runs(self):
+        # East along a line, then north: only the ends and the corner matter.
+        lats = [7.0] * 10 + [7.0 + k * 0.0001 for k in range(1, 10)]
+        lngs = [125.0 + k * 0.0001 for k in range(10)] + [125.0009] * 9
+        self.assertEqual(simplify(lats, lngs, tolerance_m=1).tolist(), [0, 9, 18])
+        # Out and back along the same road keeps the turning point.
+        self.assertEqual(simplify([7, 7, 7, 7, 7], [125, 125.001, 125.002, 125.001, 125], 1).tolist(),
+                         [0, 2, 4])
+
+    def test_compact_expires_and_simplifies_history(self):
+        self.add_track(self.now - timedelta(days=120), 30)
+        self.add_track(self.now - timedelta(days=30), 250)
+        self.add_track(self.now - timedelta(days=1), 40)
+        record_fixes(self.driver, [fix(7.0, 125.0, self.now)])
+
+        report = compact(now=self.now, page_size=100, chunk_size=64)
+
+        self.assertEqual(report["expired"], 30)
+        # A straight track keeps the two ends of each of its three pages.
+        self.assertEqual((report["simplified"], report["kept"]), (244, 6))
+        self.assertIsNotNone(report["bytes_freed"])
+        self.assertEqual(DriverLocation.objects.filter(timestamp__gt=self.now - timedelta(days=7)).count(), 41)
+        self.assertTrue(DriverLocation.objects.filter(driver=self.driver, is_current=True).exists())
+
+    def test_dry_run_changes_nothing(self):
+        self.add_track(self.now - timedelta(days=120), 5)
+        self.add_track(self.now - timedelta(days=30), 50)
+        out = StringIO()
+
+        call_command("compact_driver_locations", "--dry-run", stdout=out)
+
+        self.assertIn("would remove 53 rows", out.getvalue())
+        self.assertEqual(DriverLocation.objects.count(), 55)
+
+
+class TrajectoryTests(TestCase):
+    def setUp(self):
+        live.reset()
+        self.driver = make_driver("tracked")
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver.user)
+        self.now = timezone.now()
+
+    def test_polyline_encoding(self):
+        # Reference example from the polyline algorithm documentation.
+        self.assertEqual(
+            encode_polyline([38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]),
+            "_p~iF~ps|U_ulLnnqC_mqNvxq`@",
+        )
+        self.assertEqual(encode_deltas([]), "")
+
+    def test_track_includes_buffered_fixes_and_polls_incrementally(self):
+        record_fixes(self.driver, [fix(7.0, 125.0 + k / 1000, self.now - timedelta(seconds=60 - k))
+                                   for k in range(3)])
+        live.ingest(self.driver, [fix(7.1, 125.1, self.now - timedelta(seconds=5))])
+        url = f"/api/drivers/{self.driver.pk}/trajectory/"
+
+        with self.assertNumQueries(2):
+            data = self.client.get(url).data
+        self.assertEqual((data["count"], data["truncated"]), (4, False))
+        self.assertEqual(data["polyline"], encode_polyline([7.0, 7.0, 7.0, 7.1], [125.0, 125.001, 125.002, 125.1]))
+
+        since = data["next_since"].isoformat()
+        self.assertEqual(self.client.get(url, {"since": since}).data["count"], 0)
+        live.ingest(self.driver, [fix(7.2, 125.2, self.now)])
+        self.assertEqual(self.client.get(url, {"since": since}).data["count"], 1)
+
+    def test_only_staff_and_the_driver_see_a_track(self):
+        url = f"/api/drivers/{self.driver.pk}/trajectory/"
+        self.client.force_authenticate(User.objects.create_user(username="nosy"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(User.objects.create_user(username="boss", is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url, {"since": "soon"}).status_code, 400)
+
+
+class NearbyDriversTests(TestCase):
+    def setUp(self):
+        live.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="ops", is_staff=True))
+        self.now = timezone.now()
+
+    def place(self, username, lat, lng, **kwargs):
+        return make_driver(username, latitude=Decimal(str(lat)), longitude=Decimal(str(lng)), **kwargs)
+
+    def test_nearest_first_with_filters_and_limit(self):
+        near = self.place("near", 7.005, 125.0)
+        nearer = self.place("nearer", 7.001, 125.0)
+        self.place("busy", 7.002, 125.0, status="on_pickup")
+        self.place("van", 7.003, 125.0, vehicle_type="van")
+        self.place("retired", 7.001, 125.001, is_active=False)
+        self.place("far", 7.1, 125.0)
+
+        response = self.client.get("/api/drivers/nearby/", {"lat": 7.0, "lng": 125.0, "status": "available",
+                                                            "vehicle_type": "motorcycle"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.data], [nearer.pk, near.pk])
+        self.assertAlmostEqual(response.data[0]["distance_km"], 0.111, places=2)
+
+        response = self.client.get("/api/drivers/nearby/", {"lat": 7.0, "lng": 125.0, "limit": 2})
+        self.assertEqual([row["id"] for row in response.data], [nearer.pk, Driver.objects.get(full_name="Busy").pk])
+
+    def test_geohash_follows_location_updates(self):
+        driver = self.place("mover", 7.0, 125.0)
+        live.ingest(driver, [fix(7.2, 125.2, self.now)])
+        live.flush()
+        driver.refresh_from_db()
+        self.assertEqual(driver.geohash, encode_geohash(7.2, 125.2))
+
+        self.assertEqual(self.client.get("/api/drivers/nearby/", {"lat": 7.0, "lng": 125.0}).data, [])
+        found = self.client.get("/api/drivers/nearby/", {"lat": 7.2, "lng": 125.2}).data
+        self.assertEqual([row["id"] for row in found], [driver.pk])
+
+    def test_live_position_overrides_a_stale_row(self):
+        driver = self.place("fresh", 7.001, 125.0)
+        live.remember(driver.pk, 7.04, 125.0, self.now)
+
+        response = self.client.get("/api/drivers/nearby/", {"lat": 7.0, "lng": 125.0, "radius_km": 3})
+        self.assertEqual(response.data, [])
+
+    def test_staff_only_and_validation(self):
+        self.assertEqual(self.client.get("/api/drivers/nearby/", {"lat": 7.0}).status_code, 400)
+        for radius in ("nan", "inf"):
+            response = self.client.get("/api/drivers/nearby/", {"lat": 7.0, "lng": 125.0, "radius_km": radius})
+            self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(make_driver("someone").user)
+        self.assertEqual(self.client.get("/api/drivers/nearby/", {"lat": 7.0, "lng": 125.0}).status_code, 403)
@@ -0,0 +1,117 @@
+# drivers/trajectory.py
+"""
+Compact driver tracks for map clients.
+
+Positions are encoded with the polyline algorithm (decoded natively by
+the common map SDKs) and timestamps as a second stream in the same
+encoding: epoch milliseconds of the first fix, then the delta to each
+following one. A fix costs a few bytes instead of a JSON object.
+Polling clients pass the returned ``next_since`` back as ``since`` and
+only receive newer fixes.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from . import live
+from .locations import _parse_timestamp
+from .models import DriverLocation
+
+PRECISION = 5
+DEFAULT_WINDOW = timedelta(hours=1)
+MAX_POINTS = 2000
+
+
+def _encode_values(values):
+    chars = []
+    for value in values:
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def encode_polyline(lats, lngs, precision=PRECISION):
+    factor = 10 ** precision
+    lats = np.round(np.asarray(lats, dtype=np.float64) * factor).astype(np.int64)
+    lngs = np.round(np.asarray(lngs, dtype=np.float64) * factor).astype(np.int64)
+    deltas = np.column_stack((np.diff(lats, prepend=0), np.diff(lngs, prepend=0)))
+    return _encode_values(deltas.ravel().tolist())
+
+
+def encode_deltas(values):
+    """First value as is, then the difference to each following one."""
+    return _encode_values(np.diff(np.asarray(values, dtype=np.int64), prepend=0).tolist())
+
+
+def parse_window(params, default_window=DEFAULT_WINDOW, now=None):
+    """
+    ``(since, until)`` from ``since``/``until`` query params (ISO 8601 or
+    epoch seconds/ms). ``since`` defaults to ``default_window`` ago,
+    ``until`` to open-ended. Raises ``ValueError`` naming a bad param.
+    """
+    bounds = {}
+    for name in ("since", "until"):
+        raw = params.get(name)
+        if raw in (None, ""):
+            bounds[name] = None
+            continue
+        try:
+            raw = float(raw)
+        except ValueError:
+            pass
+        bounds[name] = _parse_timestamp(raw)
+        if bounds[name] is None:
+            raise ValueError(name)
+    if bounds["since"] is None:
+        bounds["since"] = (now or timezone.now()) - default_window
+    return bounds["since"], bounds["until"]
+
+
+def history(driver_id, since, until=None):
+    """Stored fixes of one driver in ``(since, until]``, oldest first."""
+    stored = DriverLocation.objects.filter(driver_id=driver_id, timestamp__gt=since)
+    if until is not None:
+        stored = stored.filter(timestamp__lte=until)
+    return stored.order_by("timestamp")
+
+
+def track(driver_id, since, until=None, limit=MAX_POINTS):
+    """
+    ``(rows, truncated)``: the driver's fixes taken after ``since`` (and
+    up to ``until``), oldest first, as ``(lat, lng, timestamp)`` tuples,
+    including fixes not yet written behind. Columns are read with
+    ``values_list``; no model instances are built.
+    """
+    rows = [
+        (float(lat), float(lng), timestamp)
+        for lat, lng, timestamp in history(driver_id, since, until).values_list(
+            "latitude", "longitude", "timestamp"
+        )[:limit + 1]
+    ]
+    rows += [
+        (lat, lng, timestamp)
+        for _, lat, lng, timestamp in live.buffer.for_driver(driver_id)
+        if timestamp > since and (until is None or timestamp <= until)
+    ]
+    rows.sort(key=lambda row: row[2])
+    return rows[:limit], len(rows) > limit
+
+
+def trajectory(driver_id, since, until=None, limit=MAX_POINTS):
+    """The encoded track of one driver, ready to be returned as JSON."""
+    rows, truncated = track(driver_id, since, until, limit)
+    millis = [round(row[2].timestamp() * 1000) for row in rows]
+    return {
+        "driver": driver_id,
+        "count": len(rows),
+        "precision": PRECISION,
+        "polyline": encode_polyline([row[0] for row in rows], [row[1] for row in rows]),
+        "timestamps_ms": encode_deltas(millis),
+        "since": since,
+        "next_since": rows[-1][2] if rows else since,
+        "truncated": truncated,
+    }
@@ -1,14 +1,26 @@
 # drivers/views.py
+import math
+
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from . import live
+from .locations import MAX_BATCH_SIZE
+from .trajectory import parse_window, trajectory
 from .models import Driver, DriverLocation
+from .nearby import nearby_drivers
 from .serializers import (
     DriverSerializer,
     DriverWriteSerializer,
     DriverLocationSerializer,
 )
 
+NEARBY_DEFAULT_RADIUS_KM = 3.0
+NEARBY_MAX_RADIUS_KM = 50.0
+NEARBY_DEFAULT_LIMIT = 10
+NEARBY_MAX_LIMIT = 100
+
 class DriverViewSet(viewsets.ModelViewSet):
     queryset = Driver.objects.filter(is_active=True).select_related("user")
     permission_classes = [permissions.IsAuthenticated]
@@ -42,11 +54,49 @@ class DriverViewSet(viewsets.ModelViewSet):
         driver.save()
         return Response({"detail": "Status updated.", "status": driver.status}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], url_path='nearby', permission_classes=[permissions.IsAdminUser])
+    def nearby(self, request):
+        """
+        The nearest drivers to ``lat``/``lng`` within ``radius_km``, for
+        operations staff, each with ``distance_km``. Optional filters:
+        ``status``, ``vehicle_type`` and ``is_active`` (default true);
+        ``limit`` caps the result.
+        """
+        params = request.query_params
+        try:
+            lat = float(params["lat"])
+            lng = float(params["lng"])
+            radius_km = float(params.get("radius_km", NEARBY_DEFAULT_RADIUS_KM))
+            limit = int(params.get("limit", NEARBY_DEFAULT_LIMIT))
+        except (KeyError, ValueError):
+            return Response({"detail": "lat and lng are required; radius_km and limit must be numbers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({"detail": "Invalid lat or lng."}, status=status.HTTP_400_BAD_REQUEST)
+        if not math.isfinite(radius_km):
+            return Response({"detail": "Invalid radius_km."}, status=status.HTTP_400_BAD_REQUEST)
+        radius_km = min(max(radius_km, 0.0), NEARBY_MAX_RADIUS_KM)
+        limit = min(max(limit, 1), NEARBY_MAX_LIMIT)
+
+        filters = {"is_active": params.get("is_active", "true").lower() not in ("false", "0")}
+        for field in ("status", "vehicle_type"):
+            if params.get(field):
+                filters[field] = params[field]
+
+        nearest = nearby_drivers(lat, lng, radius_km, limit, **filters)
+        drivers = Driver.objects.select_related("user").in_bulk([pk for pk, _ in nearest])
+        data = DriverSerializer([drivers[pk] for pk, _ in nearest], many=True).data
+        for row, (_, distance) in zip(data, nearest):
+            row["distance_km"] = round(distance, 3)
+        return Response(data)
+
     @action(detail=False, methods=['patch'], url_path='update_location')
     def update_location(self, request):
         """
         Update the current driver's latitude and longitude.
-        Creates a new DriverLocation record and marks it as current.
+        The fix goes through ``live.ingest``: the live position is updated
+        at once and the ``DriverLocation`` row is written with the next
+        write-behind flush.
         """
         driver = Driver.objects.filter(user=request.user).first()
         if not driver:
@@ -59,32 +109,93 @@ class DriverViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Latitude and longitude are required."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        DriverLocation.objects.filter(driver=driver, is_current=True).update(is_current=False)
-
-        DriverLocation.objects.create(
-            driver=driver,
-            latitude=lat,
-            longitude=lng,
-            is_current=True
+        _, rejected, _ = live.ingest(
+            driver, [{"latitude": lat, "longitude": lng, "timestamp": timezone.now().isoformat()}]
         )
-
-        driver.latitude = lat
-        driver.longitude = lng
-        driver.save(update_fields=["latitude", "longitude"])
+        if rejected:
+            return Response({"detail": f"Invalid location: {rejected[0]['reason']}."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"message": "Driver location updated successfully."}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='me/locations')
+    def record_locations(self, request):
+        """
+        Upload GPS fixes buffered on the device.
+
+        Body: ``{"fixes": [{"latitude", "longitude", "timestamp"}, ...]}``
+        (or the bare list), timestamps as ISO 8601 or epoch seconds/ms.
+        Valid fixes are stored even if some are rejected; the newest one
+        becomes the driver's live position right away, history is written
+        behind (see ``drivers.live``).
+        """
+        driver = Driver.objects.filter(user=request.user).first()
+        if not driver:
+            return Response({"detail": "Driver not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        fixes = request.data.get("fixes") if isinstance(request.data, dict) else request.data
+        if not isinstance(fixes, list) or not fixes:
+            return Response({"detail": "Send a non-empty list of fixes."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(fixes) > MAX_BATCH_SIZE:
+            return Response({"detail": f"At most {MAX_BATCH_SIZE} fixes per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        accepted, rejected, current = live.ingest(driver, fixes)
+        return Response({
+            "accepted": accepted,
+            "rejected": rejected,
+            "current": current,
+        }, status=status.HTTP_201_CREATED if accepted else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['get'], url_path='trajectory')
+    def trajectory(self, request, pk=None):
+        """
+        The driver's track as an encoded polyline (staff or the driver).
+        Query params: ``since`` (default one hour ago) and ``until``.
+        """
+        driver = self.get_object()
+        if not request.user.is_staff and driver.user_id != request.user.id:
+            return Response({"detail": "You cannot view this driver's track."},
+                            status=status.HTTP_403_FORBIDDEN)
+        try:
+            since, until = parse_window(request.query_params)
+        except ValueError as exc:
+            return Response({"detail": f"Invalid {exc} timestamp."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(trajectory(driver.pk, since, until))
+
 class DriverLocationViewSet(viewsets.ModelViewSet):
     queryset = DriverLocation.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = DriverLocationSerializer
 
-    def perform_create(self, serializer):
-        driver = Driver.objects.filter(user=self.request.user).first()
+    def create(self, request, *args, **kwargs):
+        """
+        Record the caller's position now. Goes through ``live.ingest`` like
+        the other location uploads, so the live position, geohash and
+        geofences follow; the row itself is written behind.
+        """
+        driver = Driver.objects.filter(user=request.user).first()
         if not driver:
             return Response({"detail": "You are not registered as a driver."},
                             status=status.HTTP_403_FORBIDDEN)
 
-        DriverLocation.objects.filter(driver=driver, is_current=True).update(is_current=False)
-        serializer.save(driver=driver, is_current=True)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        timestamp = timezone.now()
+        _, rejected, current = live.ingest(driver, [{
+            "latitude": serializer.validated_data["latitude"],
+            "longitude": serializer.validated_data["longitude"],
+            "timestamp": timestamp.isoformat(),
+        }])
+        if rejected:
+            return Response({"detail": f"Invalid location: {rejected[0]['reason']}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "driver_name": driver.full_name,
+            "latitude": serializer.validated_data["latitude"],
+            "longitude": serializer.validated_data["longitude"],
+            "timestamp": timestamp,
+            "is_current": current is not None and current["timestamp"] == timestamp,
+        }, status=status.HTTP_201_CREATED)
 
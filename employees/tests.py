@@ -1,3 +1,36 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import OwnerProfile
+from subscriptions.models import SubscriptionPlan, UserSubscription
+from .models import Employee
+
+
+class EmployeeAccountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner")
+        OwnerProfile.objects.create(user=self.owner, restaurant_name="Resto", address="Somewhere")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def add_employee(self):
+        return self.client.post("/api/employees/", {"name": "Ana", "email": "ana@example.com",
+                                                    "position": "Cook"}, format="json")
+
+    def test_adding_staff_accounts_needs_the_plan_feature(self):
+        premium = SubscriptionPlan.objects.create(name="premium", price=Decimal("499.00"), duration_days=30)
+        UserSubscription.create_new_subscription(self.owner, premium)
+        self.assertEqual(self.add_employee().status_code, 403)
+        # Listing existing staff is not gated.
+        self.assertEqual(self.client.get("/api/employees/").status_code, 200)
 
-# Create your tests here.
+        enterprise = SubscriptionPlan.objects.create(name="enterprise", price=Decimal("999.00"), duration_days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscription.create_new_subscription(self.owner, enterprise)
+        self.assertEqual(self.add_employee().status_code, 201)
+        self.assertEqual(Employee.objects.get().restaurant_name, "Resto")
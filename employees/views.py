@@ -5,10 +5,18 @@ from rest_framework.decorators import action
 from .models import Employee
 from .serializers import EmployeeSerializer, EmployeeRegisterSerializer
 from accounts.models import OwnerProfile
+from subscriptions.entitlements import HasPlanFeature
 
 
 class EmployeeViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
+    # Adding staff accounts is a plan feature; existing ones stay manageable.
+    required_feature = "staff_accounts"
+
+    def get_permissions(self):
+        if self.action == "create":
+            return [permissions.IsAuthenticated(), HasPlanFeature()]
+        return super().get_permissions()
 
     def get_queryset(self):
         try:
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import OutboxJob
+
+
+@admin.register(OutboxJob)
+class OutboxJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "attempts", "available_at", "created_at", "completed_at")
+    list_filter = ("status", "kind")
+    search_fields = ("kind", "last_error")
@@ -0,0 +1,113 @@
+# outbox/jobs.py
+"""
+Enqueue, claim and run outbox jobs.
+
+Apps register a handler per job kind with ``@handler("kind")`` (imported
+from their ``AppConfig.ready``). Handlers get the job payload and must
+be idempotent: a job whose worker dies halfway is run again.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 60 * 60
+# A running job whose worker has not finished it after this long is
+# assumed lost and handed out again.
+LEASE_SECONDS = 5 * 60
+
+_handlers = {}
+
+
+def handler(kind):
+    """Register the function that runs jobs of ``kind``."""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload):
+    """
+    Add a job. Call it inside the transaction that makes the change, so
+    the job is committed (or rolled back) together with it.
+    """
+    return OutboxJob.objects.create(kind=kind, payload=payload)
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts`` (exponential, capped)."""
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim_batch(worker_id, size):
+    """
+    Claim up to ``size`` due jobs for ``worker_id``.
+
+    Claiming is a conditional UPDATE on rows that are still pending, so
+    two workers never get the same job even without row locks.
+    """
+    now = timezone.now()
+    OutboxJob.objects.filter(
+        status="running", locked_at__lt=now - timedelta(seconds=LEASE_SECONDS)
+    ).update(status="pending", locked_by="")
+
+    ids = list(
+        OutboxJob.objects.filter(status="pending", available_at__lte=now)
+        .order_by("available_at", "id")
+        .values_list("id", flat=True)[:size]
+    )
+    if not ids:
+        return []
+
+    OutboxJob.objects.filter(id__in=ids, status="pending").update(
+        status="running",
+        locked_by=worker_id,
+        locked_at=now,
+        attempts=F("attempts") + 1,
+    )
+    return list(OutboxJob.objects.filter(locked_by=worker_id, status="running").order_by("id"))
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    func = _handlers.get(job.kind)
+    try:
+        if func is None:
+            raise LookupError(f"No handler registered for outbox job kind {job.kind!r}")
+        func(job.payload)
+    except Exception as e:
+        logger.exception("Outbox job %s (%s) failed", job.id, job.kind)
+        if job.attempts >= MAX_ATTEMPTS:
+            updates = {"status": "failed"}
+        else:
+            updates = {"status": "pending", "available_at": timezone.now() + backoff(job.attempts)}
+        OutboxJob.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            locked_by="", last_error=f"{type(e).__name__}: {e}", **updates
+        )
+        return False
+
+    OutboxJob.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status="done", locked_by="", completed_at=timezone.now(), last_error=""
+    )
+    return True
+
+
+def run_batch(size=100, worker_id=None):
+    """Claim and run one batch. Returns ``(succeeded, failed)``."""
+    worker_id = worker_id or uuid.uuid4().hex
+    succeeded = failed = 0
+    for job in claim_batch(worker_id, size):
+        if run_job(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
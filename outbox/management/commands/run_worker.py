@@ -0,0 +1,50 @@
+# outbox/management/commands/run_worker.py
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from outbox.jobs import run_batch
+
+
+class Command(BaseCommand):
+    help = "Run outbox jobs (post-commit side effects such as reward points), retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when there is nothing to do.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the jobs that are due now, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        worker_id = f"worker-{uuid.uuid4().hex[:12]}"
+        self.stdout.write(f"{worker_id} started")
+
+        total_ok = total_failed = 0
+        try:
+            while True:
+                succeeded, failed = run_batch(options["batch_size"], worker_id)
+                total_ok += succeeded
+                total_failed += failed
+                if succeeded or failed:
+                    self.stdout.write(f"ran {succeeded + failed} jobs ({failed} failed)")
+                    continue
+                if options["once"]:
+                    break
+                close_old_connections()
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{worker_id} stopped: {total_ok} succeeded, {total_failed} failed"
+        ))
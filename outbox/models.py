@@ -0,0 +1,39 @@
+# outbox/models.py
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxJob(models.Model):
+    """
+    A side effect to run after the transaction that enqueued it commits.
+
+    Rows are written in the same transaction as the change that causes
+    them, so a job exists if and only if that change was committed. The
+    ``run_worker`` command claims and executes them.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True, default="")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "available_at"], name="outbox_status_available_idx"),
+            models.Index(fields=["locked_by"], name="outbox_locked_by_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
@@ -0,0 +1,117 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from drivers.models import Driver
+from rewards.models import RewardPoint, RewardTransaction
+from trash_pickups.models import TrashPickup
+from . import jobs
+from .models import OutboxJob
+
+calls = []
+
+
+@jobs.handler("tests.flaky")
+def flaky(payload):
+    calls.append(payload)
+    if payload.get("fail"):
+        raise RuntimeError("boom")
+
+
+class OutboxJobTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_claimed_jobs_are_not_handed_out_twice(self):
+        jobs.enqueue("tests.flaky", {"n": 1})
+        jobs.enqueue("tests.flaky", {"n": 2})
+
+        first = jobs.claim_batch("a", 10)
+        second = jobs.claim_batch("b", 10)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second, [])
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        job = jobs.enqueue("tests.flaky", {"fail": True})
+
+        self.assertEqual(jobs.run_batch(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertIn("boom", job.last_error)
+
+        # Not due yet, so nothing runs.
+        self.assertEqual(jobs.run_batch(), (0, 0))
+
+        OutboxJob.objects.filter(pk=job.pk).update(attempts=jobs.MAX_ATTEMPTS - 1, available_at=timezone.now())
+        jobs.run_batch()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+    def test_unknown_kind_fails_the_job(self):
+        jobs.enqueue("tests.missing", {})
+        self.assertEqual(jobs.run_batch(), (0, 1))
+
+
+class PickupCompletionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        driver_user = User.objects.create_user(username="driver")
+        self.driver = Driver.objects.create(
+            user=driver_user, full_name="Driver", phone_number="1", license_number="L"
+        )
+        self.pickup = TrashPickup.objects.create(
+            user=self.owner,
+            restaurant_name="Resto",
+            pickup_address="Somewhere",
+            waste_type="Food",
+            weight_kg=Decimal("12.50"),
+            driver=self.driver,
+            status="accepted",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(driver_user)
+
+    def test_completion_enqueues_award_and_worker_applies_it_once(self):
+        response = self.client.patch(f"/api/trash_pickups/{self.pickup.pk}/complete/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(RewardTransaction.objects.exists())
+        self.assertEqual(OutboxJob.objects.get().kind, "rewards.award_pickup")
+
+        call_command("run_worker", "--once", stdout=StringIO())
+
+        self.assertEqual(RewardPoint.objects.get(user=self.owner).points, 12)
+        self.assertEqual(OutboxJob.objects.get().status, "done")
+
+        # A re-delivered job must not award twice.
+        jobs.enqueue("rewards.award_pickup", {"pickup_id": self.pickup.pk})
+        jobs.run_batch()
+        self.assertEqual(RewardTransaction.objects.filter(pickup=self.pickup).count(), 1)
+
+    def test_racing_award_jobs_award_once(self):
+        from rewards.jobs import award_pickup
+
+        award_pickup({"pickup_id": self.pickup.pk})
+        # A second delivery that read "not awarded yet" before the first
+        # committed: the constraint turns its write into a no-op.
+        with mock.patch.object(QuerySet, "exists", return_value=False):
+            award_pickup({"pickup_id": self.pickup.pk})
+
+        self.assertEqual(RewardTransaction.objects.filter(pickup=self.pickup).count(), 1)
+        self.assertEqual(RewardPoint.objects.get(user=self.owner).points, 12)
+
+    def test_cannot_complete_twice(self):
+        self.client.patch(f"/api/trash_pickups/{self.pickup.pk}/complete/")
+        response = self.client.patch(f"/api/trash_pickups/{self.pickup.pk}/complete/")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(OutboxJob.objects.count(), 1)
@@ -3,6 +3,9 @@ ASGI config for restaurant_waste_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The server-sent event stream (``trash_pickups.streams``) only works
+under an ASGI server, e.g. ``uvicorn restaurant_waste_backend.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -0,0 +1,110 @@
+# restaurant_waste_backend/pagination.py
+import base64
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first cursor pagination keyed on ``(ordering_field, id)``.
+
+    The cursor carries the key of the last row on the page, and the next
+    page is "rows strictly before that key". With an index on
+    ``(owner, ordering_field, id)`` every page is the same index range
+    scan, so page 500 costs as much as page 1 (unlike OFFSET).
+    """
+
+    ordering_field = "created_at"
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = self.ordering_field
+
+        queryset = queryset.order_by(f"-{field}", "-id")
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            # The leading "<=" gives the database a seekable range on the
+            # index; the OR only breaks ties between equal timestamps.
+            queryset = queryset.filter(
+                Q(**{f"{field}__lte": value})
+                & (Q(**{f"{field}__lt": value}) | Q(id__lt=pk))
+            )
+
+        results = list(queryset[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        self.next_position = None
+        if self.has_next:
+            last = results[-1]
+            self.next_position = (getattr(last, field), last.pk)
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def encode_cursor(self, position):
+        value, pk = position
+        raw = parse.urlencode({"v": value.isoformat(), "id": pk})
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(raw, keep_blank_values=True)
+            value = parse_datetime(tokens["v"][0])
+            pk = int(tokens["id"][0])
+        except (TypeError, ValueError, KeyError, IndexError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+
+class PaidAtKeysetPagination(KeysetPagination):
+    ordering_field = "paid_at"
@@ -0,0 +1,167 @@
+# restaurant_waste_backend/push.py
+"""
+Publish/subscribe fan-out for server-sent event streams.
+
+Code running anywhere in the process (sync views, signal handlers,
+management commands) calls ``publish(topic, event, data)``; streaming
+responses on an ASGI worker's event loop ``subscribe()`` to topics and
+await messages. Each message is encoded once, however many subscribers
+receive it, and handed to every event loop in a single thread-safe call.
+
+``LocalBroker`` reaches the subscribers of this process only. With
+several worker processes, point ``PUSH["BROKER"]`` at a class with the
+same ``subscribe``/``publish`` interface backed by a shared channel.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    "BROKER": "restaurant_waste_backend.push.LocalBroker",
+    "QUEUE_SIZE": 100,
+    "KEEPALIVE_SECONDS": 15,
+}
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "PUSH", {})}
+
+
+class Message:
+    __slots__ = ("topic", "event", "data", "_frame")
+
+    def __init__(self, topic, event, data):
+        self.topic = topic
+        self.event = event
+        self.data = data
+        self._frame = None
+
+    @property
+    def frame(self):
+        """The message in the ``text/event-stream`` wire format."""
+        if self._frame is None:
+            payload = json.dumps(self.data, cls=DjangoJSONEncoder, separators=(",", ":"))
+            self._frame = f"event: {self.event}\ndata: {payload}\n\n".encode()
+        return self._frame
+
+
+class Subscription:
+    """
+    Messages for a set of topics, queued on one event loop. A slow
+    reader loses the oldest messages rather than growing the queue.
+    """
+
+    def __init__(self, broker, loop, queue_size):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+        self.topics = set()
+        self.dropped = 0
+
+    def add(self, *topics):
+        self.broker._add(self, topics)
+
+    def remove(self, *topics):
+        self.broker._remove(self, topics)
+
+    def close(self):
+        self.broker._remove(self, tuple(self.topics))
+
+    async def get(self, timeout=None):
+        """Next message; ``asyncio.TimeoutError`` after ``timeout`` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+def _deliver(subscriptions, message):
+    for subscription in subscriptions:
+        subscription._put(message)
+
+
+class LocalBroker:
+    """In-process broker; ``publish`` may be called from any thread."""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or config()["QUEUE_SIZE"]
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, *topics):
+        """Subscribe from a coroutine; messages queue on its event loop."""
+        subscription = Subscription(self, asyncio.get_running_loop(), self.queue_size)
+        subscription.add(*topics)
+        return subscription
+
+    def publish(self, topic, event, data):
+        """Send ``data`` to the subscribers of ``topic``; returns how many there were."""
+        with self._lock:
+            subscribers = tuple(self._subscribers.get(topic, ()))
+        if not subscribers:
+            return 0
+        message = Message(topic, event, data)
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, group, message)
+            except RuntimeError:
+                # The loop was closed under us; its subscribers are gone.
+                pass
+        return len(subscribers)
+
+    def stats(self):
+        with self._lock:
+            subscriptions = set().union(*self._subscribers.values()) if self._subscribers else set()
+            return {"topics": len(self._subscribers), "subscriptions": len(subscriptions)}
+
+    def _add(self, subscription, topics):
+        with self._lock:
+            for topic in topics:
+                self._subscribers[topic].add(subscription)
+                subscription.topics.add(topic)
+
+    def _remove(self, subscription, topics):
+        with self._lock:
+            for topic in topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+                subscription.topics.discard(topic)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(config()["BROKER"])()
+    return _broker
+
+
+def set_broker(broker):
+    """Replace the process broker (e.g. with a stand-in); returns the old one."""
+    global _broker
+    with _broker_lock:
+        previous, _broker = _broker, broker
+    return previous
+
+
+def publish(topic, event, data):
+    return get_broker().publish(topic, event, data)
@@ -37,7 +37,9 @@ INSTALLED_APPS = [
     'django_extensions',
     'drivers.apps.DriversConfig',
     'users',
-    'accounts'
+    'accounts',
+    'outbox',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
@@ -96,10 +98,71 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file (not in-memory) test database so threaded concurrency
+        # tests can open several connections to it.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Caches
+# Live driver positions get their own cache so it can be pointed at a
+# shared backend (e.g. Redis) when running several processes. The default
+# cache holds an entry per active user (entitlements) and per driver
+# (geofences, routes), so it is sized for the whole user base rather than
+# LocMem's default of 300 entries. Entries are dropped when the data behind
+# them changes, which only reaches other processes through a shared
+# backend: ``check --deploy`` rejects LocMem here (trash_pickups.E001).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'live_locations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'live-locations',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+LIVE_LOCATIONS = {
+    'CACHE': 'live_locations',
+    # Seconds a live position stays answerable from the cache.
+    'TTL_SECONDS': 15 * 60,
+    # Write-behind window: buffered fixes are written to DriverLocation at
+    # least this often (0 writes every upload through immediately).
+    'FLUSH_INTERVAL_SECONDS': 5,
+    # Maximum acceptable loss: never buffer more fixes than this.
+    'MAX_PENDING_FIXES': 2000,
+    # Buffered fixes are dropped after this many failed flushes in a row.
+    'MAX_FLUSH_ATTEMPTS': 5,
+}
+
+# Server-sent event streams (trash_pickups.streams). The local broker
+# only reaches clients connected to the same process.
+PUSH = {
+    'BROKER': 'restaurant_waste_backend.push.LocalBroker',
+    # Messages kept for a slow client before the oldest are dropped.
+    'QUEUE_SIZE': 100,
+    'KEEPALIVE_SECONDS': 15,
+}
+
+# Subscription payments and the nightly auto-renewal run
+# (subscriptions.billing). FakeGateway never contacts a payment provider.
+BILLING = {
+    'GATEWAY': 'subscriptions.billing.FakeGateway',
+    'GATEWAY_OPTIONS': {},
+    # Subscriptions ending within this many hours are renewed.
+    'RENEW_AHEAD_HOURS': 24,
+    'BATCH_SIZE': 500,
+    # Charges in flight at once.
+    'CONCURRENCY': 32,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -0,0 +1,238 @@
+# restaurant_waste_backend/tests.py
+"""
+Query-plan checks for the hot read paths.
+
+A realistic amount of data is seeded, ``ANALYZE`` is run so the planner
+sees production-like statistics, and then every endpoint is called while
+its queries are captured. Each captured SELECT goes through
+``EXPLAIN QUERY PLAN``; a full scan of one of the large tables fails the
+test, so a dropped or unusable index shows up here instead of in prod.
+"""
+import random
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from drivers.compaction import CHUNK_SIZE, PAGE_SIZE, expired, history_page
+from drivers.models import Driver, DriverLocation
+from drivers.trajectory import history
+from rewards.models import RewardRedemption, RewardTransaction
+from subscriptions.billing import due_for_renewal
+from subscriptions.expiry import BATCH_SIZE, overdue
+from subscriptions.models import SubscriptionPayment, SubscriptionPlan, UserSubscription
+from trash_pickups.dispatch import load_pending_pickups
+from trash_pickups.geo import encode_geohash
+from trash_pickups.models import TrashPickup
+
+# Tables that grow with traffic. Catalog tables (plans, vouchers,
+# drivers) stay small and may be scanned.
+LARGE_TABLES = {
+    TrashPickup._meta.db_table,
+    DriverLocation._meta.db_table,
+    RewardTransaction._meta.db_table,
+    RewardRedemption._meta.db_table,
+    SubscriptionPayment._meta.db_table,
+    UserSubscription._meta.db_table,
+}
+SCAN_RE = re.compile(r"^SCAN (\w+)")
+
+CENTER = (7.0731, 125.6128)
+
+
+def query_plan(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(sql, params=()):
+    """Large tables the plan of ``sql`` reads end to end."""
+    scans = []
+    for detail in query_plan(sql, params):
+        match = SCAN_RE.match(detail)
+        if match and match.group(1) in LARGE_TABLES:
+            scans.append(detail)
+    return scans
+
+
+class QueryPlanTests(TestCase):
+    USERS = 200
+    DRIVERS = 40
+    PICKUPS = 8000
+    LOCATIONS_PER_DRIVER = 100
+    ROWS_PER_USER = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        now = timezone.now()
+
+        users = User.objects.bulk_create(
+            [User(username=f"owner{i}") for i in range(cls.USERS)]
+        )
+        drivers = []
+        for i in range(cls.DRIVERS):
+            drivers.append(Driver.objects.create(
+                user=User.objects.create_user(username=f"driver{i}"),
+                full_name=f"Driver {i}",
+                phone_number="123",
+                license_number=f"L-{i}",
+                latitude=Decimal("7.073100"),
+                longitude=Decimal("125.612800"),
+            ))
+
+        pickups = []
+        for i in range(cls.PICKUPS):
+            lat = round(CENTER[0] + rng.uniform(-0.3, 0.3), 6)
+            lng = round(CENTER[1] + rng.uniform(-0.3, 0.3), 6)
+            status = rng.choice(["pending", "pending", "accepted", "completed"])
+            pickups.append(TrashPickup(
+                user=users[i % cls.USERS],
+                driver=drivers[i % cls.DRIVERS] if status != "pending" else None,
+                restaurant_name="Resto",
+                pickup_address="Somewhere",
+                waste_type="Food",
+                weight_kg=Decimal("5.00"),
+                status=status,
+                latitude=Decimal(str(lat)),
+                longitude=Decimal(str(lng)),
+                geohash=encode_geohash(lat, lng),
+            ))
+        TrashPickup.objects.bulk_create(pickups, batch_size=1000)
+
+        locations = []
+        for driver in drivers:
+            for k in range(cls.LOCATIONS_PER_DRIVER):
+                locations.append(DriverLocation(
+                    driver=driver,
+                    latitude=Decimal("7.073100"),
+                    longitude=Decimal("125.612800"),
+                    is_current=k == cls.LOCATIONS_PER_DRIVER - 1,
+                ))
+        DriverLocation.objects.bulk_create(locations, batch_size=1000)
+
+        plan = SubscriptionPlan.objects.create(name="basic", price=Decimal("99.00"), duration_days=30)
+        transactions, redemptions, subscriptions = [], [], []
+        for user in users:
+            for k in range(cls.ROWS_PER_USER):
+                transactions.append(RewardTransaction(user=user, points=10, description="seed"))
+                redemptions.append(RewardRedemption(user=user, item_name="Item", points_spent=5))
+                start = now - timedelta(days=30 * (k + 1))
+                subscriptions.append(UserSubscription(
+                    user=user, plan=plan, start_date=start,
+                    end_date=start + timedelta(days=30), status="expired",
+                ))
+        RewardTransaction.objects.bulk_create(transactions, batch_size=1000)
+        RewardRedemption.objects.bulk_create(redemptions, batch_size=1000)
+        subscriptions = UserSubscription.objects.bulk_create(subscriptions, batch_size=1000)
+        SubscriptionPayment.objects.bulk_create(
+            [
+                SubscriptionPayment(
+                    user=sub.user, subscription=sub, plan_name_snapshot="Basic",
+                    amount=Decimal("99.00"), method="gcash", paid_at=sub.start_date,
+                )
+                for sub in subscriptions
+            ],
+            batch_size=1000,
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.owner = users[0]
+        cls.driver = drivers[0]
+
+    def assertEndpointUsesIndexes(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        for query in ctx.captured_queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            self.assertEqual(full_scans(sql), [], f"{url}: {sql}")
+
+    def assertQuerysetUsesIndexes(self, queryset, index=None):
+        """No full scan; with ``index``, the plan must also search that
+        index and read rows in its order (no temporary sort)."""
+        sql, params = queryset.query.sql_with_params()
+        self.assertEqual(full_scans(sql, params), [], sql)
+        if index is not None:
+            plan = query_plan(sql, params)
+            self.assertTrue(any(f"INDEX {index} " in detail for detail in plan), plan)
+            self.assertFalse([detail for detail in plan if "TEMP B-TREE" in detail], plan)
+
+    def test_owner_endpoints(self):
+        for url in [
+            "/api/trash_pickups/",
+            "/api/rewards/points/",
+            "/api/rewards/transactions/",
+            "/api/rewards/redemptions/",
+            "/api/subscriptions/mine/",
+            "/api/subscriptions/entitlements/",
+            "/api/subscriptions/payments/",
+        ]:
+            with self.subTest(url=url):
+                self.assertEndpointUsesIndexes(self.owner, url)
+
+    def test_driver_endpoints(self):
+        user = self.driver.user
+        for url in [
+            "/api/trash_pickups/",
+            f"/api/trash_pickups/available/?lat={CENTER[0]}&lng={CENTER[1]}&radius_km=3",
+            "/api/trash_pickups/available/",
+            "/api/trash_pickups/route/",
+            "/api/drivers/me/",
+            "/api/drivers/",
+        ]:
+            with self.subTest(url=url):
+                self.assertEndpointUsesIndexes(user, url)
+
+    def test_second_page_uses_index(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        next_url = client.get("/api/rewards/transactions/?page_size=5").data["next"]
+        self.assertIsNotNone(next_url)
+        self.assertEndpointUsesIndexes(self.owner, next_url)
+
+    def test_background_queries(self):
+        self.assertQuerysetUsesIndexes(
+            TrashPickup.objects.filter(status="pending", driver__isnull=True)
+            .values_list("id", "latitude", "longitude")
+        )
+        self.assertQuerysetUsesIndexes(overdue().order_by("end_date").values("pk")[:BATCH_SIZE])
+        now = timezone.now()
+        self.assertQuerysetUsesIndexes(
+            due_for_renewal(now + timedelta(hours=24), now).order_by("end_date", "pk").values("pk")[:500]
+        )
+        self.assertQuerysetUsesIndexes(
+            history(self.driver.pk, now - timedelta(hours=1), now).values_list("latitude", "longitude", "timestamp"),
+            index="driverloc_driver_ts_idx",
+        )
+        self.assertQuerysetUsesIndexes(
+            expired(now - timedelta(days=30)).values_list("pk", flat=True)[:CHUNK_SIZE],
+            index="driverloc_timestamp_idx",
+        )
+        for cursor in [None, (now - timedelta(days=2), 1)]:
+            self.assertQuerysetUsesIndexes(
+                history_page(self.driver.pk, now - timedelta(days=3), now - timedelta(days=1), cursor)
+                .values_list("pk", "latitude", "longitude", "timestamp")[:PAGE_SIZE],
+                index="driverloc_driver_ts_idx",
+            )
+        self.assertEqual(len(load_pending_pickups()[0]), TrashPickup.objects.filter(
+            status="pending", driver__isnull=True
+        ).count())
+
+    def test_full_scan_is_detected(self):
+        sql, params = TrashPickup.objects.filter(weight_kg__gt=1).query.sql_with_params()
+        self.assertTrue(full_scans(sql, params))
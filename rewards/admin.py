@@ -1,6 +1,6 @@
 # rewards/admin.py
 from django.contrib import admin
-from .models import RewardPoint, RewardTransaction, Voucher, RewardRedemption
+from .models import RewardPoint, RewardTransaction, RewardCheckpoint, Voucher, RewardRedemption
 
 @admin.register(Voucher)
 class VoucherAdmin(admin.ModelAdmin):
@@ -16,6 +16,11 @@ class RewardPointAdmin(admin.ModelAdmin):
 class RewardTransactionAdmin(admin.ModelAdmin):
     list_display = ("user", "points", "description", "created_at")
 
+@admin.register(RewardCheckpoint)
+class RewardCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("user", "balance", "last_transaction_id", "created_at")
+    search_fields = ("user__username",)
+
 @admin.register(RewardRedemption)
 class RewardRedemptionAdmin(admin.ModelAdmin):
     list_display = ("user", "item_name", "points_spent", "status", "created_at")
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class RewardsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rewards'
+
+    def ready(self):
+        import rewards.jobs
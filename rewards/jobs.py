@@ -0,0 +1,28 @@
+# rewards/jobs.py
+from django.db import IntegrityError
+
+from outbox.jobs import handler
+
+
+@handler("rewards.award_pickup")
+def award_pickup(payload):
+    """Award points for a completed pickup, at most once per pickup."""
+    from trash_pickups.models import TrashPickup
+    from . import ledger
+    from .models import RewardTransaction
+
+    pickup = TrashPickup.objects.select_related("user").get(pk=payload["pickup_id"])
+    if RewardTransaction.objects.filter(pickup=pickup).exists():
+        return
+
+    try:
+        ledger.record(
+            pickup.user,
+            int(pickup.weight_kg),
+            description=f"Completed {pickup.weight_kg}kg pickup",
+            pickup=pickup,
+        )
+    except IntegrityError:
+        # Another delivery of this job awarded it since the check above;
+        # the unique constraint rolled this one back.
+        pass
@@ -0,0 +1,70 @@
+# rewards/ledger.py
+"""
+Reward points ledger.
+
+``RewardTransaction`` rows are the source of truth; ``RewardPoint.points``
+is a cached balance kept in step with them. Every change goes through
+``record``/``debit`` so the transaction and the cached balance are
+written in the same database transaction.
+"""
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import RewardCheckpoint, RewardPoint, RewardTransaction
+
+
+FLOOR_DESCRIPTION = "Balance floored at 0"
+
+
+def record(user, points, description="", pickup=None):
+    """
+    Append a transaction and apply it to the cached balance.
+
+    The cached balance never goes below 0; when a deduction is floored,
+    the shortfall is written as its own entry so the ledger still sums to
+    the cached balance.
+    """
+    with transaction.atomic():
+        entry = RewardTransaction.objects.create(
+            user=user, pickup=pickup, points=points, description=description
+        )
+        RewardPoint.objects.get_or_create(user=user)
+        reward = RewardPoint.objects.select_for_update().get(user=user)
+        shortfall = -(reward.points + points)
+        reward.add_points(points)
+        if shortfall > 0:
+            RewardTransaction.objects.create(user=user, points=shortfall, description=FLOOR_DESCRIPTION)
+    return entry
+
+
+def debit(user, cost, description=""):
+    """
+    Spend ``cost`` points if the balance covers it.
+
+    Returns the new transaction, or None (and changes nothing) when the
+    user cannot afford it.
+    """
+    with transaction.atomic():
+        if not RewardPoint.debit(user, cost):
+            return None
+        return RewardTransaction.objects.create(
+            user=user, points=-cost, description=description
+        )
+
+
+def latest_checkpoint(user_id):
+    return (
+        RewardCheckpoint.objects.filter(user_id=user_id)
+        .order_by("-last_transaction_id")
+        .first()
+    )
+
+
+def balance(user_id):
+    """Ledger balance: latest checkpoint plus every transaction after it."""
+    checkpoint = latest_checkpoint(user_id)
+    base, after_id = (checkpoint.balance, checkpoint.last_transaction_id) if checkpoint else (0, 0)
+    total = RewardTransaction.objects.filter(
+        user_id=user_id, id__gt=after_id
+    ).aggregate(total=Sum("points"))["total"]
+    return base + (total or 0)
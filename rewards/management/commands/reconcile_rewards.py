@@ -0,0 +1,168 @@
+# rewards/management/commands/reconcile_rewards.py
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from rewards.ledger import FLOOR_DESCRIPTION
+from rewards.models import RewardCheckpoint, RewardPoint, RewardTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's reward balance from the transaction ledger "
+        "(latest checkpoint + transactions after it), repair RewardPoint "
+        "rows that drifted, and write new checkpoints where many "
+        "transactions have piled up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint-every",
+            type=int,
+            default=200,
+            help="Write a checkpoint once a user has this many settled transactions after the last one.",
+        )
+        parser.add_argument(
+            "--settle-minutes",
+            type=int,
+            default=5,
+            help="Only checkpoint transactions older than this, so rows still being committed are never skipped.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        settled_before = timezone.now() - timedelta(minutes=options["settle_minutes"])
+
+        totals = {"users": 0, "repaired": 0, "created": 0, "floored": 0, "checkpoints": 0}
+        last_id = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            with transaction.atomic():
+                stats = self.reconcile_chunk(user_ids, settled_before, options)
+            for key, value in stats.items():
+                totals[key] += value
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Checked {totals['users']} users. Dry run, nothing written: would repair "
+                f"{totals['repaired']} balances, create {totals['created']} missing balance rows, "
+                f"floor {totals['floored']} negative ledgers at 0 and write {totals['checkpoints']} checkpoints."
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {totals['users']} users. Repaired {totals['repaired']} balances, "
+            f"created {totals['created']} missing balance rows, "
+            f"floored {totals['floored']} negative ledgers at 0, "
+            f"wrote {totals['checkpoints']} checkpoints."
+        ))
+
+    def reconcile_chunk(self, user_ids, settled_before, options):
+        # Lock the cached balances before reading the ledger: a concurrent
+        # ledger.record() for these users either committed already (and is
+        # summed below) or waits for this chunk and applies on top of it.
+        rewards = {
+            reward.user_id: reward
+            for reward in RewardPoint.objects.select_for_update().filter(user_id__in=user_ids).order_by("user_id")
+        }
+
+        checkpoints = {}
+        for cp in RewardCheckpoint.objects.filter(user_id__in=user_ids).order_by(
+            "user_id", "-last_transaction_id"
+        ):
+            checkpoints.setdefault(cp.user_id, cp)
+
+        # One grouped pass over each user's transactions after their latest
+        # checkpoint; the (user, id) index turns that into range scans.
+        latest_cp = RewardCheckpoint.objects.filter(user_id=OuterRef("user_id")).order_by(
+            "-last_transaction_id"
+        )
+        settled = Q(created_at__lte=settled_before)
+        rows = (
+            RewardTransaction.objects.filter(user_id__in=user_ids)
+            .annotate(
+                after_id=Coalesce(
+                    Subquery(latest_cp.values("last_transaction_id")[:1]),
+                    Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+            .filter(id__gt=F("after_id"))
+            .order_by()
+            .values("user_id")
+            .annotate(
+                total=Sum("points"),
+                settled_total=Sum("points", filter=settled),
+                settled_count=Count("id", filter=settled),
+                settled_last_id=Max("id", filter=settled),
+            )
+        )
+        since_checkpoint = {row["user_id"]: row for row in rows}
+
+        balances = {}
+        new_checkpoints = []
+        for user_id in user_ids:
+            cp = checkpoints.get(user_id)
+            base = cp.balance if cp else 0
+            row = since_checkpoint.get(user_id)
+            if row is None:
+                if cp is not None:
+                    balances[user_id] = base
+                continue
+            balances[user_id] = base + (row["total"] or 0)
+            if row["settled_count"] >= options["checkpoint_every"]:
+                new_checkpoints.append(RewardCheckpoint(
+                    user_id=user_id,
+                    balance=base + (row["settled_total"] or 0),
+                    last_transaction_id=row["settled_last_id"],
+                ))
+
+        # Balances are floored at 0. A ledger summing below that (older
+        # deductions were floored without an entry) gets the missing entry,
+        # so the account is not reported again on every run.
+        floors = [
+            RewardTransaction(user_id=user_id, points=-balance, description=FLOOR_DESCRIPTION)
+            for user_id, balance in balances.items()
+            if balance < 0
+        ]
+
+        to_update = []
+        for reward in rewards.values():
+            expected = max(balances.get(reward.user_id, 0), 0)
+            if reward.points != expected:
+                reward.points = expected
+                to_update.append(reward)
+        to_create = [
+            RewardPoint(user_id=user_id, points=balance)
+            for user_id, balance in balances.items()
+            if user_id not in rewards and balance > 0
+        ]
+
+        if not options["dry_run"]:
+            RewardPoint.objects.bulk_update(to_update, ["points"], batch_size=500)
+            # A row created by a concurrent ledger.record() wins.
+            RewardPoint.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+            RewardTransaction.objects.bulk_create(floors, batch_size=500)
+            RewardCheckpoint.objects.bulk_create(new_checkpoints, batch_size=500)
+
+        return {
+            "users": len(user_ids),
+            "repaired": len(to_update),
+            "created": len(to_create),
+            "floored": len(floors),
+            "checkpoints": len(new_checkpoints),
+        }
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards', '0007_alter_rewardpoint_options_and_more'),
+        ('trash_pickups', '0012_trashpickup_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rewardredemption',
+            name='rewards_rew_user_id_8de60d_idx',
+        ),
+        migrations.AddIndex(
+            model_name='rewardredemption',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='redemption_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rewardtransaction',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='rewardtx_user_created_idx'),
+        ),
+    ]
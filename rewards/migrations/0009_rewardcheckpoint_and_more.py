@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards', '0008_remove_rewardredemption_rewards_rew_user_id_8de60d_idx_and_more'),
+        ('trash_pickups', '0013_trashpickup_pickup_user_created_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RewardCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.IntegerField()),
+                ('last_transaction_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='rewardtransaction',
+            index=models.Index(fields=['user', 'id'], name='rewardtx_user_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='rewardcheckpoint',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reward_checkpoints', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='rewardcheckpoint',
+            index=models.Index(fields=['user', '-last_transaction_id'], name='rewardcp_user_last_tx_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:59
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards', '0009_rewardcheckpoint_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voucher',
+            name='discount_percent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)]),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:31
+
+from django.db import migrations
+from django.db.models import Sum
+
+OPENING_DESCRIPTION = 'Opening balance'
+
+
+def write_opening_balances(apps, schema_editor):
+    # Balances kept before the ledger became the source of truth: give
+    # every RewardPoint row whatever its transactions do not account for
+    # as one opening entry, so reconcile_rewards keeps the balance.
+    RewardPoint = apps.get_model('rewards', 'RewardPoint')
+    RewardTransaction = apps.get_model('rewards', 'RewardTransaction')
+
+    rewards = RewardPoint.objects.order_by('user_id').values_list('user_id', 'points')
+    last_user_id = 0
+    while True:
+        chunk = dict(rewards.filter(user_id__gt=last_user_id)[:2000])
+        if not chunk:
+            break
+        last_user_id = max(chunk)
+        totals = dict(
+            RewardTransaction.objects.filter(user_id__in=chunk)
+            .order_by()
+            .values('user_id')
+            .annotate(total=Sum('points'))
+            .values_list('user_id', 'total')
+        )
+        RewardTransaction.objects.bulk_create([
+            RewardTransaction(user_id=user_id, points=points - totals.get(user_id, 0),
+                              description=OPENING_DESCRIPTION)
+            for user_id, points in chunk.items()
+            if points != totals.get(user_id, 0)
+        ])
+
+
+def remove_opening_balances(apps, schema_editor):
+    RewardTransaction = apps.get_model('rewards', 'RewardTransaction')
+    RewardTransaction.objects.filter(description=OPENING_DESCRIPTION).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards', '0010_voucher_discount_percent'),
+    ]
+
+    operations = [
+        migrations.RunPython(write_opening_balances, remove_opening_balances),
+    ]
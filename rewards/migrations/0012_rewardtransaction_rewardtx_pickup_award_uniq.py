@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def detach_duplicate_awards(apps, schema_editor):
+    # Pickups completed twice before awards went through the outbox may
+    # have been awarded twice. The earliest entry stays the pickup's
+    # award; later ones stay in the ledger (balances are unchanged) but
+    # no longer point at the pickup.
+    RewardTransaction = apps.get_model('rewards', 'RewardTransaction')
+    duplicated = (
+        RewardTransaction.objects.filter(pickup__isnull=False)
+        .order_by()
+        .values('pickup_id')
+        .annotate(count=Count('id'), first=Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicated.iterator():
+        RewardTransaction.objects.filter(pickup_id=row['pickup_id'], id__gt=row['first']).update(pickup=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards', '0011_opening_balances'),
+        ('trash_pickups', '0014_trashpickup_pickup_open_geohash_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(detach_duplicate_awards, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rewardtransaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('pickup__isnull', False)), fields=('pickup',), name='rewardtx_pickup_award_uniq'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 # rewards/models.py
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -17,11 +20,31 @@ class RewardPoint(models.Model):
         return f"{self.user.username} - {self.points} points"
 
     def add_points(self, amount: int) -> None:
-        """Safely add or deduct points (floors at 0)."""
-        self.points += amount
-        if self.points < 0:
-            self.points = 0
-        self.save(update_fields=["points"])
+        """
+        Add or deduct points (floors at 0).
+
+        The change is applied by the database in a single UPDATE, so
+        concurrent awards and redemptions for the same user do not
+        overwrite each other.
+        """
+        RewardPoint.objects.filter(pk=self.pk).update(
+            points=Greatest(F("points") + amount, 0)
+        )
+        self.refresh_from_db(fields=["points"])
+
+    @classmethod
+    def debit(cls, user, cost: int) -> bool:
+        """
+        Deduct ``cost`` points only if the balance covers it.
+
+        One conditional UPDATE (``WHERE points >= cost``): returns False
+        without changing anything when the user cannot afford it.
+        """
+        if cost <= 0:
+            return True
+        return cls.objects.filter(user=user, points__gte=cost).update(
+            points=F("points") - cost
+        ) == 1
 
 class RewardTransaction(models.Model):
     user = models.ForeignKey(
@@ -41,15 +64,55 @@ class RewardTransaction(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="rewardtx_user_created_idx"),
+            models.Index(fields=["user", "id"], name="rewardtx_user_id_idx"),
+        ]
+        constraints = [
+            # Only pickup awards link a pickup: at most one per pickup,
+            # however many times the award job runs.
+            models.UniqueConstraint(
+                fields=["pickup"],
+                condition=models.Q(pickup__isnull=False),
+                name="rewardtx_pickup_award_uniq",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.points} pts - {self.description or 'Transaction'}"
 
+class RewardCheckpoint(models.Model):
+    """
+    Ledger balance of a user up to and including ``last_transaction_id``.
+
+    A balance is the latest checkpoint plus the transactions after it,
+    so it never needs to sum the user's whole history.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="reward_checkpoints"
+    )
+    balance = models.IntegerField()
+    last_transaction_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-last_transaction_id"], name="rewardcp_user_last_tx_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.balance} pts @ tx {self.last_transaction_id}"
+
 class Voucher(models.Model):
     code = models.CharField(max_length=50, unique=True)
     name = models.CharField(max_length=100)                      # Readable name
     description = models.TextField(blank=True, default="")       # Optional description
     discount_amount = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    # Taken off the list price before ``discount_amount``.
+    discount_percent = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+    )
     points_required = models.PositiveIntegerField(default=0)
     image = models.ImageField(upload_to='vouchers/', null=True, blank=True)
     is_active = models.BooleanField(default=True)
@@ -104,7 +167,7 @@ class RewardRedemption(models.Model):
     class Meta:
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["user", "created_at"]),
+            models.Index(fields=["user", "-created_at", "-id"], name="redemption_user_created_idx"),
             models.Index(fields=["is_used"]),
         ]
 
@@ -22,6 +22,7 @@ class VoucherSerializer(serializers.ModelSerializer):
             "name",
             "description",
             "discount_amount",
+            "discount_percent",
             "points_required",
             "image",
             "is_active",
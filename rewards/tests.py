@@ -1,3 +1,260 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from donations.models import DonationDrive, DonationParticipation
+from . import ledger
+from .models import RewardCheckpoint, RewardPoint, RewardTransaction, Voucher
+
+
+def run_threads(target, args_list):
+    barrier = threading.Barrier(len(args_list))
+    results = []
+    lock = threading.Lock()
+
+    def worker(*args):
+        try:
+            barrier.wait()
+            for attempt in range(50):
+                try:
+                    result = target(*args)
+                    break
+                except OperationalError:
+                    # SQLite "database is locked": retry, the write never happened.
+                    threading.Event().wait(0.002 * (attempt + 1))
+            with lock:
+                results.append(result)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=args) for args in args_list]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TransactionPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_walks_every_row_once_even_with_equal_timestamps(self):
+        RewardTransaction.objects.bulk_create(
+            RewardTransaction(user=self.user, points=i, description=str(i)) for i in range(7)
+        )
+        # Force timestamp ties so only the id can break them.
+        RewardTransaction.objects.filter(points__lt=4).update(created_at=timezone.now())
+
+        seen = []
+        url = "/api/rewards/transactions/?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            seen.extend(row["points"] for row in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(sorted(seen), list(range(7)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/rewards/transactions/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
+
+class RewardPointBalanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner")
+        self.reward = RewardPoint.objects.create(user=self.user, points=10)
+
+    def test_add_points_floors_at_zero(self):
+        self.reward.add_points(-25)
+        self.assertEqual(self.reward.points, 0)
+
+    def test_debit_is_refused_when_balance_is_short(self):
+        self.assertFalse(RewardPoint.debit(self.user, 11))
+        self.assertTrue(RewardPoint.debit(self.user, 10))
+        self.reward.refresh_from_db()
+        self.assertEqual(self.reward.points, 0)
+
+    def test_redeem_without_enough_points_changes_nothing(self):
+        voucher = Voucher.objects.create(code="BIG", name="Big", points_required=50)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post("/api/rewards/redeem/", {"voucher_id": voucher.id})
+
+        self.assertEqual(response.status_code, 400)
+        self.reward.refresh_from_db()
+        self.assertEqual(self.reward.points, 10)
+        self.assertFalse(RewardTransaction.objects.exists())
+
+
+class ConcurrentRewardPointTests(TransactionTestCase):
+    def test_concurrent_awards_are_not_lost(self):
+        user = User.objects.create_user(username="owner")
+        reward = RewardPoint.objects.create(user=user, points=0)
+
+        def award(_):
+            RewardPoint.objects.get(pk=reward.pk).add_points(5)
+
+        run_threads(award, [(i,) for i in range(20)])
+
+        reward.refresh_from_db()
+        self.assertEqual(reward.points, 100)
+
+    def test_concurrent_debits_never_overdraw(self):
+        user = User.objects.create_user(username="owner")
+        reward = RewardPoint.objects.create(user=user, points=50)
+
+        results = run_threads(lambda _: RewardPoint.debit(user, 20), [(i,) for i in range(10)])
+
+        self.assertEqual(sum(results), 2)
+        reward.refresh_from_db()
+        self.assertEqual(reward.points, 10)
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner")
+
+    def test_record_and_debit_keep_balance_and_ledger_in_step(self):
+        ledger.record(self.user, 30, "earned")
+        self.assertIsNotNone(ledger.debit(self.user, 10, "spent"))
+        self.assertIsNone(ledger.debit(self.user, 100, "too much"))
+
+        self.assertEqual(ledger.balance(self.user.id), 20)
+        self.assertEqual(RewardPoint.objects.get(user=self.user).points, 20)
+        self.assertEqual(RewardTransaction.objects.filter(user=self.user).count(), 2)
+
+    def test_completed_donation_awards_points(self):
+        drive = DonationDrive.objects.create(title="Drive", description="", target_item="Food")
+        participation = DonationParticipation.objects.create(
+            user=self.user, drive=drive, donated_item="Rice", quantity=1
+        )
+
+        participation.mark_completed()
+
+        self.assertEqual(ledger.balance(self.user.id), 20)
+        self.assertEqual(RewardPoint.objects.get(user=self.user).points, 20)
+
+    def test_floored_deduction_is_recorded(self):
+        ledger.record(self.user, 10, "earned")
+        ledger.record(self.user, -25, "penalty")
+
+        self.assertEqual(RewardPoint.objects.get(user=self.user).points, 0)
+        self.assertEqual(ledger.balance(self.user.id), 0)
+        self.assertEqual(
+            RewardTransaction.objects.filter(user=self.user).latest("id").description, ledger.FLOOR_DESCRIPTION
+        )
+
+    def test_balance_uses_latest_checkpoint(self):
+        first = RewardTransaction.objects.create(user=self.user, points=5)
+        RewardCheckpoint.objects.create(user=self.user, balance=100, last_transaction_id=first.id)
+        RewardTransaction.objects.create(user=self.user, points=7)
+
+        self.assertEqual(ledger.balance(self.user.id), 107)
+
+
+class ReconcileRewardsTests(TestCase):
+    def test_repairs_drifted_balances_and_writes_checkpoints(self):
+        drifted = User.objects.create_user(username="drifted")
+        missing = User.objects.create_user(username="missing")
+        RewardPoint.objects.create(user=drifted, points=999)
+        RewardTransaction.objects.bulk_create(
+            [RewardTransaction(user=drifted, points=2) for _ in range(5)]
+            + [RewardTransaction(user=missing, points=3)]
+        )
+        RewardTransaction.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+        call_command("reconcile_rewards", "--chunk-size", "1", "--checkpoint-every", "5", stdout=StringIO())
+
+        self.assertEqual(RewardPoint.objects.get(user=drifted).points, 10)
+        self.assertEqual(RewardPoint.objects.get(user=missing).points, 3)
+        checkpoint = RewardCheckpoint.objects.get(user=drifted)
+        self.assertEqual(checkpoint.balance, 10)
+        self.assertFalse(RewardCheckpoint.objects.filter(user=missing).exists())
+
+        # Later transactions are counted on top of the checkpoint.
+        ledger.record(drifted, 4, "after checkpoint")
+        RewardPoint.objects.filter(user=drifted).update(points=0)
+        call_command("reconcile_rewards", stdout=StringIO())
+        self.assertEqual(RewardPoint.objects.get(user=drifted).points, 14)
+
+    def test_floored_accounts_are_settled_once(self):
+        user = User.objects.create_user(username="floored")
+        RewardPoint.objects.create(user=user, points=0)
+        # An old deduction that was floored without a ledger entry.
+        RewardTransaction.objects.bulk_create([
+            RewardTransaction(user=user, points=10), RewardTransaction(user=user, points=-25),
+        ])
+
+        out = StringIO()
+        call_command("reconcile_rewards", stdout=out)
+        self.assertIn("Repaired 0 balances", out.getvalue())
+        self.assertIn("floored 1 negative ledgers", out.getvalue())
+        self.assertEqual(ledger.balance(user.id), 0)
+
+        ledger.record(user, 4, "after the floor")
+        out = StringIO()
+        call_command("reconcile_rewards", stdout=out)
+        self.assertIn("Repaired 0 balances", out.getvalue())
+        self.assertIn("floored 0 negative ledgers", out.getvalue())
+        self.assertEqual(RewardPoint.objects.get(user=user).points, 4)
+
+    def test_opening_balances_survive_the_first_reconcile(self):
+        write_opening_balances = import_module("rewards.migrations.0011_opening_balances").write_opening_balances
+        legacy = User.objects.create_user(username="legacy")
+        partial = User.objects.create_user(username="partial")
+        RewardPoint.objects.create(user=legacy, points=120)
+        RewardPoint.objects.create(user=partial, points=50)
+        RewardTransaction.objects.create(user=partial, points=20)
+
+        write_opening_balances(apps, None)
+        out = StringIO()
+        call_command("reconcile_rewards", stdout=out)
+
+        self.assertIn("Repaired 0 balances", out.getvalue())
+        self.assertEqual(RewardPoint.objects.get(user=legacy).points, 120)
+        self.assertEqual(RewardPoint.objects.get(user=partial).points, 50)
+        self.assertEqual(
+            RewardTransaction.objects.get(user=partial, description="Opening balance").points, 30
+        )
+
+    def test_dry_run_reports_would_be_changes(self):
+        user = User.objects.create_user(username="floored")
+        RewardPoint.objects.create(user=user, points=3)
+        RewardTransaction.objects.create(user=user, points=-5)
+
+        out = StringIO()
+        call_command("reconcile_rewards", "--dry-run", stdout=out)
+
+        self.assertIn("would repair 1 balances", out.getvalue())
+        self.assertIn("floor 1 negative ledgers", out.getvalue())
+        self.assertEqual(RewardPoint.objects.get(user=user).points, 3)
+        self.assertEqual(RewardTransaction.objects.filter(user=user).count(), 1)
+
+    def test_locks_balances_before_reading_the_ledger(self):
+        user = User.objects.create_user(username="owner")
+        ledger.record(user, 5, "earned")
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("reconcile_rewards", stdout=StringIO())
+        tables = [
+            "point" if '"rewards_rewardpoint"' in q["sql"] else "ledger"
+            for q in ctx.captured_queries
+            if q["sql"].startswith("SELECT") and ('"rewards_rewardpoint"' in q["sql"] or "SUM(" in q["sql"])
+        ]
+        self.assertEqual(tables[:2], ["point", "ledger"])
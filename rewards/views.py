@@ -1,7 +1,9 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db import models
+from django.db import models, transaction
+from restaurant_waste_backend.pagination import KeysetPagination
+from . import ledger
 from .models import RewardPoint, RewardTransaction, RewardRedemption, Voucher
 from .serializers import (
     RewardPointSerializer,
@@ -21,6 +23,7 @@ class RewardPointView(generics.RetrieveAPIView):
 class RewardTransactionListView(generics.ListAPIView):
     serializer_class = RewardTransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return RewardTransaction.objects.filter(user=self.request.user).order_by('-created_at')
@@ -45,28 +48,26 @@ class RedeemVoucherView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        reward, _ = RewardPoint.objects.get_or_create(user=request.user)
-        if reward.points < voucher.points_required:
-            return Response(
-                {"success": False, "message": "Not enough points."},
-                status=status.HTTP_400_BAD_REQUEST,
+        with transaction.atomic():
+            spent = ledger.debit(
+                request.user,
+                voucher.points_required,
+                description=f"Redeemed {voucher.name}",
+            )
+            if spent is None:
+                return Response(
+                    {"success": False, "message": "Not enough points."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            redemption = RewardRedemption.objects.create(
+                user=request.user,
+                voucher=voucher,
+                item_name=voucher.name,
+                points_spent=voucher.points_required,
+                status="completed",
+                is_used=False,
             )
-
-        reward.add_points(-voucher.points_required)
-        redemption = RewardRedemption.objects.create(
-            user=request.user,
-            voucher=voucher,      
-            item_name=voucher.name,     
-            points_spent=voucher.points_required,
-            status="completed",
-            is_used=False,
-        )
-
-        RewardTransaction.objects.create(
-            user=request.user,
-            points=-voucher.points_required,
-            description=f"Redeemed {voucher.name}",
-        )
         serializer = RewardRedemptionSerializer(redemption, context={"request": request})
         return Response(
             {
@@ -80,9 +81,14 @@ class RedeemVoucherView(APIView):
 class RewardRedemptionListView(generics.ListAPIView):
     serializer_class = RewardRedemptionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return RewardRedemption.objects.filter(user=self.request.user).order_by('-created_at')
+        return (
+            RewardRedemption.objects.filter(user=self.request.user)
+            .select_related("voucher")
+            .order_by('-created_at')
+        )
 
 class MyRewardsListView(generics.ListAPIView):
     serializer_class = RewardRedemptionSerializer
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import SubscriptionPlan, UserSubscription, SubscriptionPayment
+from .models import (
+    DailyRevenue,
+    DailySubscriberStats,
+    SubscriptionPayment,
+    SubscriptionPlan,
+    UserSubscription,
+)
 
 
 @admin.register(SubscriptionPlan)
@@ -21,3 +27,17 @@ class SubscriptionPaymentAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "plan_name_snapshot", "amount", "method", "status", "paid_at")
     list_filter = ("method", "status")
     search_fields = ("user__username", "plan_name_snapshot")
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(admin.ModelAdmin):
+    list_display = ("day", "plan", "method", "payments", "amount")
+    list_filter = ("plan", "method")
+    date_hierarchy = "day"
+
+
+@admin.register(DailySubscriberStats)
+class DailySubscriberStatsAdmin(admin.ModelAdmin):
+    list_display = ("day", "plan", "new", "cancelled", "expired")
+    list_filter = ("plan",)
+    date_hierarchy = "day"
@@ -0,0 +1,286 @@
+# subscriptions/billing.py
+"""
+Payment gateway access and the nightly auto-renewal run.
+
+Charges go through the gateway named by ``BILLING["GATEWAY"]``: any class
+with thread-safe ``charge(user_id, amount, method, idempotency_key)`` and
+``refund(reference, amount)`` methods returning a ``ChargeResult``.
+``FakeGateway`` is the local stand-in; it can simulate network latency
+and declined cards.
+
+``renew_subscriptions`` walks the ``auto_renew`` subscriptions ending
+within ``RENEW_AHEAD_HOURS`` in keyset batches over the
+``(status, end_date)`` index. The charges of a batch run on a bounded
+thread pool (they are network-bound; no database work happens on the
+pool), then the batch is written back in one transaction: one bulk
+INSERT of payments and one UPDATE per plan extending the renewed
+subscriptions. A declined subscription is retried on the next run until
+it runs out and the expiry sweeper picks it up.
+"""
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from outbox.jobs import enqueue
+from . import entitlements, pricing, rollups
+from .models import SubscriptionPayment, UserSubscription
+
+DEFAULTS = {
+    "GATEWAY": "subscriptions.billing.FakeGateway",
+    "GATEWAY_OPTIONS": {},
+    "RENEW_AHEAD_HOURS": 24,
+    "BATCH_SIZE": 500,
+    "CONCURRENCY": 32,
+    # Used when a subscription has no earlier payment to copy the method from.
+    "DEFAULT_METHOD": "card",
+    # Added on top of the discounted price, e.g. "0.12" for 12% VAT.
+    "TAX_RATE": "0",
+}
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "BILLING", {})}
+
+
+class ChargeResult:
+    __slots__ = ("ok", "reference", "error")
+
+    def __init__(self, ok, reference="", error=""):
+        self.ok = ok
+        self.reference = reference
+        self.error = error
+
+
+class FakeGateway:
+    """
+    Local gateway: every charge succeeds unless ``failure_rate`` says
+    otherwise, after sleeping ``latency`` (+ up to ``jitter``) seconds.
+    A repeated idempotency key returns the first result, like a real
+    gateway would, so a retried renewal never charges twice.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.charges = {}
+        self.refunds = {}
+
+    def charge(self, user_id, amount, method, idempotency_key):
+        with self._lock:
+            if idempotency_key in self.charges:
+                return self.charges[idempotency_key]
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            declined = self._random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        if declined:
+            result = ChargeResult(False, error="Card declined.")
+        else:
+            result = ChargeResult(True, reference=f"fake-{uuid.uuid4().hex[:16]}")
+        with self._lock:
+            return self.charges.setdefault(idempotency_key, result)
+
+    def refund(self, reference, amount):
+        with self._lock:
+            # Refunding the same charge twice is a no-op.
+            self.refunds.setdefault(reference, amount)
+        return ChargeResult(True, reference=reference)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                cfg = config()
+                _gateway = import_string(cfg["GATEWAY"])(**cfg["GATEWAY_OPTIONS"])
+    return _gateway
+
+
+def set_gateway(gateway):
+    """Replace the process gateway (e.g. with a stand-in); returns the old one."""
+    global _gateway
+    with _gateway_lock:
+        previous, _gateway = _gateway, gateway
+    return previous
+
+
+def charge(user_id, amount, method, idempotency_key, gateway=None):
+    """Charge through the gateway; gateway errors come back as a declined charge."""
+    try:
+        return (gateway or get_gateway()).charge(user_id, amount, method, idempotency_key)
+    except Exception as exc:
+        return ChargeResult(False, error=str(exc) or exc.__class__.__name__)
+
+
+def refund(reference, amount, gateway=None):
+    return (gateway or get_gateway()).refund(reference, amount)
+
+
+# Still renewable: checked when picking subscriptions and again when
+# writing back, in case one changed while its charge was in flight.
+RENEWABLE = {"status": "active", "auto_renew": True, "plan__is_active": True}
+
+
+def due_for_renewal(horizon, now=None):
+    """
+    Renewable subscriptions ending between ``now`` and ``horizon``. One
+    that already lapsed is left to the expiry sweeper, and only a user's
+    latest subscription is renewed, whatever older rows still say.
+    """
+    superseded = UserSubscription.objects.filter(
+        user_id=OuterRef("user_id"), start_date__gt=OuterRef("start_date")
+    )
+    return UserSubscription.objects.filter(
+        ~Exists(superseded), end_date__gte=now or timezone.now(), end_date__lte=horizon, **RENEWABLE
+    )
+
+
+def _last_methods(subscription_ids):
+    rows = (
+        SubscriptionPayment.objects.filter(subscription_id__in=subscription_ids, status="paid")
+        .order_by("subscription_id", "paid_at")
+        .values_list("subscription_id", "method")
+    )
+    # Ordered by paid_at, so the newest payment wins.
+    return dict(rows)
+
+
+def _record(batch, methods, amounts, results, now):
+    """
+    Write back a batch of charges; returns the pks of the subscriptions
+    renewed. A subscription cancelled, switched to manual renewal or
+    expired while its charge was in flight is not extended: its charge is
+    refunded through the outbox (``subscriptions.refund``) instead.
+    """
+    extend = defaultdict(list)
+    for sub, result in zip(batch, results):
+        if result.ok:
+            extend[sub.plan.duration_days].append(sub.pk)
+
+    with transaction.atomic():
+        for days, pks in extend.items():
+            UserSubscription.objects.filter(pk__in=pks, **RENEWABLE).update(
+                end_date=F("end_date") + timedelta(days=days)
+            )
+        renewed = set()
+        if extend:
+            # The UPDATE above holds the write lock (row locks elsewhere),
+            # so the rows it extended are exactly those still renewable.
+            renewed = set(
+                UserSubscription.objects.select_for_update()
+                .filter(pk__in=[pk for pks in extend.values() for pk in pks], **RENEWABLE)
+                .values_list("pk", flat=True)
+            )
+
+        payments = []
+        for sub, result in zip(batch, results):
+            if result.ok and sub.pk not in renewed:
+                enqueue("subscriptions.refund", {"reference": result.reference, "amount": str(amounts[sub.pk])})
+                continue
+            payments.append(SubscriptionPayment(
+                user_id=sub.user_id,
+                subscription_id=sub.pk,
+                plan_name_snapshot=sub.plan.get_name_display(),
+                amount=amounts[sub.pk],
+                method=methods[sub.pk],
+                status="paid" if result.ok else "failed",
+                reference=result.reference,
+                paid_at=now,
+            ))
+        SubscriptionPayment.objects.bulk_create(payments)
+        rollups.record_payments(payments)
+        # Bulk writes send no signals: rollups above, entitlements here.
+        user_ids = [sub.user_id for sub in batch]
+        transaction.on_commit(lambda: entitlements.forget(user_ids))
+    return renewed
+
+
+def _due_batches(due, batch_size):
+    """Keyset pages of ``due`` (ordered by end date, pk), each subscription once."""
+    last = None
+    # A renewed subscription can come due again within a long horizon;
+    # it is renewed once per run.
+    handled = set()
+    while True:
+        page = due
+        if last is not None:
+            page = due.filter(Q(end_date__gt=last[0]) | Q(end_date=last[0], pk__gt=last[1]))
+        rows = list(page[:batch_size])
+        if not rows:
+            return
+        last = (rows[-1].end_date, rows[-1].pk)
+        batch = [sub for sub in rows if sub.pk not in handled]
+        handled.update(sub.pk for sub in batch)
+        if batch:
+            yield batch
+
+
+def renew_subscriptions(now=None, ahead=None, batch_size=None, concurrency=None, gateway=None):
+    """
+    Charge and extend every subscription due for renewal. Returns
+    ``{"renewed", "failed", "refunded", "charged", "seconds"}``.
+
+    The charges of the next batch are queued before the current one is
+    written, so the pool never drains at batch boundaries.
+    """
+    cfg = config()
+    now = now or timezone.now()
+    ahead = ahead if ahead is not None else timedelta(hours=cfg["RENEW_AHEAD_HOURS"])
+    gateway = gateway or get_gateway()
+    started = time.perf_counter()
+    report = {"renewed": 0, "failed": 0, "refunded": 0, "charged": Decimal("0.00")}
+
+    def attempt(sub, method, amount):
+        # One key per subscription period: rerunning a night is safe.
+        key = f"renewal:{sub.pk}:{sub.end_date.isoformat()}"
+        return charge(sub.user_id, amount, method, key, gateway)
+
+    def finish(batch, methods, amounts, futures):
+        results = [future.result() for future in futures]
+        renewed = _record(batch, methods, amounts, results, now)
+        for sub, result in zip(batch, results):
+            if sub.pk in renewed:
+                report["renewed"] += 1
+                report["charged"] += amounts[sub.pk]
+            elif result.ok:
+                report["refunded"] += 1
+            else:
+                report["failed"] += 1
+
+    due = due_for_renewal(now + ahead, now).select_related("plan").order_by("end_date", "pk")
+    in_flight = None
+    with ThreadPoolExecutor(max_workers=concurrency or cfg["CONCURRENCY"],
+                            thread_name_prefix="renewal") as pool:
+        for batch in _due_batches(due, batch_size or cfg["BATCH_SIZE"]):
+            known = _last_methods([sub.pk for sub in batch])
+            methods = {sub.pk: known.get(sub.pk, cfg["DEFAULT_METHOD"]) for sub in batch}
+            # Priced like checkout, from the cached plan (tax included).
+            amounts = {sub.pk: pricing.quote(pricing.get_plan(sub.plan_id) or sub.plan).total for sub in batch}
+            futures = [pool.submit(attempt, sub, methods[sub.pk], amounts[sub.pk]) for sub in batch]
+            if in_flight is not None:
+                finish(*in_flight)
+            in_flight = (batch, methods, amounts, futures)
+        if in_flight is not None:
+            finish(*in_flight)
+
+    report["seconds"] = time.perf_counter() - started
+    return report
@@ -0,0 +1,77 @@
+# subscriptions/checkout.py
+"""
+Subscription checkout: voucher, charge, subscription and payment.
+
+The price is quoted (``subscriptions.pricing``) first and charged through the
+gateway outside any transaction, so no database lock is held during the
+round trip. Everything the database records then happens in one short
+transaction: the voucher is claimed with a conditional UPDATE (still
+active, not expired, same discounts as quoted) and the subscription and
+payment are inserted. Of many checkouts racing for one code exactly one
+claims it; the others roll back and their charge is refunded through
+the outbox (``subscriptions.refund``), so a failure leaves no rows behind.
+"""
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+
+from outbox.jobs import enqueue
+from . import billing, pricing
+from .models import SubscriptionPayment, UserSubscription
+
+INVALID_VOUCHER = "Invalid or expired voucher."
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def checkout(user, plan, method, voucher_code=None, gateway=None):
+    """
+    Charge ``user`` for ``plan`` (as quoted with the voucher) and start
+    the subscription. Returns ``(subscription, payment, quote)``; raises
+    ``CheckoutError`` with the HTTP status to answer with.
+    """
+    now = timezone.now()
+    voucher = None
+    if voucher_code:
+        voucher = pricing.find_voucher(voucher_code, now)
+        if voucher is None:
+            raise CheckoutError(INVALID_VOUCHER)
+    quote = pricing.quote(plan, voucher)
+    amount = quote.total
+
+    result = None
+    if amount > 0:
+        result = billing.charge(user.pk, amount, method, f"subscribe:{user.pk}:{uuid.uuid4().hex}", gateway)
+        if not result.ok:
+            raise CheckoutError(f"Payment failed: {result.error}", status=402)
+
+    try:
+        with transaction.atomic():
+            if voucher is not None:
+                claimed = pricing.usable_vouchers(now).filter(
+                    pk=voucher["pk"],
+                    discount_amount=voucher["discount_amount"],
+                    discount_percent=voucher["discount_percent"],
+                ).update(is_active=False)
+                if not claimed:
+                    raise CheckoutError(INVALID_VOUCHER)
+            subscription = UserSubscription.create_new_subscription(user, plan)
+            payment = SubscriptionPayment.objects.create(
+                user=user,
+                subscription=subscription,
+                plan_name_snapshot=plan.get_name_display(),
+                amount=amount,
+                method=method,
+                status="paid",
+                reference=result.reference if result else "",
+            )
+    except Exception:
+        if result is not None:
+            enqueue("subscriptions.refund", {"reference": result.reference, "amount": str(amount)})
+        raise
+    return subscription, payment, quote
@@ -0,0 +1,98 @@
+# subscriptions/entitlements.py
+"""
+What a user's subscription lets them do.
+
+A user's plan and feature set are resolved from their latest
+subscription (one indexed query) and cached per user. The cached entry
+remembers when the subscription ends and is ignored after that, so a
+subscription running out needs no invalidation; changes to a user's
+subscriptions or payments drop the entry (``subscriptions.signals``).
+"""
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework.permissions import BasePermission
+
+from .models import UserSubscription
+
+ENTITLEMENTS_CACHE_TIMEOUT = 10 * 60
+
+# Features each plan unlocks; users without an active plan get none.
+PLAN_FEATURES = {
+    "basic": frozenset({"pickup_scheduling"}),
+    "premium": frozenset({"pickup_scheduling", "live_tracking", "route_planning"}),
+    "enterprise": frozenset({"pickup_scheduling", "live_tracking", "route_planning", "staff_accounts"}),
+}
+
+
+class Entitlements:
+    __slots__ = ("plan", "features", "valid_until")
+
+    def __init__(self, plan=None, features=frozenset(), valid_until=None):
+        self.plan = plan
+        self.features = features
+        # End of the subscription these were derived from.
+        self.valid_until = valid_until
+
+    def __contains__(self, feature):
+        return feature in self.features
+
+
+def _cache_key(user_id):
+    return f"entitlements:{user_id}"
+
+
+def resolve(user_id):
+    """Entitlements of a user, straight from the database."""
+    sub = (
+        UserSubscription.objects.filter(user_id=user_id)
+        .select_related("plan")
+        .order_by("-start_date")
+        .first()
+    )
+    if sub is None or not sub.is_active:
+        return Entitlements()
+    return Entitlements(sub.plan.name, PLAN_FEATURES.get(sub.plan.name, frozenset()), sub.end_date)
+
+
+def get_entitlements(user):
+    if not user.is_authenticated:
+        return Entitlements()
+    key = _cache_key(user.pk)
+    entitlements = cache.get(key)
+    if entitlements is None or (
+        entitlements.valid_until is not None and entitlements.valid_until < timezone.now()
+    ):
+        entitlements = resolve(user.pk)
+        cache.set(key, entitlements, ENTITLEMENTS_CACHE_TIMEOUT)
+    return entitlements
+
+
+def has_feature(user, feature):
+    return feature in get_entitlements(user)
+
+
+def forget(user_ids):
+    cache.delete_many([_cache_key(pk) for pk in user_ids])
+
+
+class HasPlanFeature(BasePermission):
+    """
+    Allows the request if the user's plan includes ``view.required_feature``.
+    Answered from the cache, without a query, once the user's entitlements
+    are cached. Staff are not subscribers and are let through. A view
+    without ``required_feature`` is a configuration error, never an open
+    door.
+    """
+
+    message = "Your subscription plan does not include this feature."
+
+    def has_permission(self, request, view):
+        feature = getattr(view, "required_feature", None)
+        if not feature:
+            raise ImproperlyConfigured(
+                f"{type(view).__name__} uses HasPlanFeature but sets no required_feature."
+            )
+        if request.user.is_staff:
+            return True
+        return has_feature(request.user, feature)
@@ -0,0 +1,48 @@
+# subscriptions/expiry.py
+"""
+Expiry sweeper for ``UserSubscription``.
+
+Reads never write: the API derives an overdue subscription's status from
+``end_date`` (``UserSubscription.current_status``). This sweeper brings
+the stored ``status`` in line afterwards, so queries on ``status`` stay
+correct. Each batch is read through the ``(status, end_date)`` index and
+expired with one UPDATE, together with the day's expiry rollups, in its
+own transaction so the write lock is held briefly.
+"""
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import UserSubscription
+
+BATCH_SIZE = 1000
+
+
+def overdue(now=None):
+    """Subscriptions still marked active whose end date has passed."""
+    return UserSubscription.objects.filter(status="active", end_date__lt=now or timezone.now())
+
+
+def expire_subscriptions(now=None, batch_size=BATCH_SIZE, pause=0):
+    """
+    Mark every overdue active subscription as expired, ``batch_size``
+    rows per UPDATE. Returns the number of subscriptions expired.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                overdue(now).select_for_update().order_by("end_date")
+                .values_list("pk", "plan_id", "end_date")[:batch_size]
+            )
+            if rows:
+                UserSubscription.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(status="expired")
+                rollups.record_expiries([(plan_id, end_date) for _, plan_id, end_date in rows])
+        expired += len(rows)
+        if len(rows) < batch_size:
+            return expired
+        if pause:
+            time.sleep(pause)
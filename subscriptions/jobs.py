@@ -0,0 +1,14 @@
+# subscriptions/jobs.py
+from decimal import Decimal
+
+from outbox.jobs import handler
+
+
+@handler("subscriptions.refund")
+def refund_charge(payload):
+    """Give back a charge whose checkout did not go through."""
+    from . import billing
+
+    result = billing.refund(payload["reference"], Decimal(payload["amount"]))
+    if not result.ok:
+        raise RuntimeError(f"Refund of {payload['reference']} failed: {result.error}")
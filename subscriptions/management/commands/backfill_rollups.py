@@ -0,0 +1,20 @@
+# subscriptions/management/commands/backfill_rollups.py
+from django.core.management.base import BaseCommand
+
+from subscriptions import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily revenue and subscriber rollups from the full payment "
+        "and subscription history, read in keyset chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=rollups.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        revenue_rows, stats_rows = rollups.backfill(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {revenue_rows} daily revenue rows and {stats_rows} daily subscriber rows."
+        ))
@@ -0,0 +1,40 @@
+# subscriptions/management/commands/expire_subscriptions.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from subscriptions import expiry
+
+
+class Command(BaseCommand):
+    help = "Mark overdue active subscriptions as expired, one batched UPDATE at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=expiry.BATCH_SIZE)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches to leave room for other writers.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep sweeping every this many seconds instead of exiting after one pass.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                expired = expiry.expire_subscriptions(
+                    batch_size=options["batch_size"], pause=options["pause"]
+                )
+                self.stdout.write(f"expired {expired} subscriptions")
+                if not options["interval"]:
+                    break
+                close_old_connections()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,40 @@
+# subscriptions/management/commands/renew_subscriptions.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from subscriptions import billing
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge and extend auto-renewing subscriptions that end soon, with "
+        "charges running concurrently against the payment gateway."
+    )
+
+    def add_arguments(self, parser):
+        cfg = billing.config()
+        parser.add_argument(
+            "--ahead-hours",
+            type=float,
+            default=cfg["RENEW_AHEAD_HOURS"],
+            help="Renew subscriptions ending within this many hours.",
+        )
+        parser.add_argument("--batch-size", type=int, default=cfg["BATCH_SIZE"])
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=cfg["CONCURRENCY"],
+            help="Charges in flight at once.",
+        )
+
+    def handle(self, *args, **options):
+        report = billing.renew_subscriptions(
+            ahead=timedelta(hours=options["ahead_hours"]),
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+        )
+        self.stdout.write(
+            f"renewed {report['renewed']} subscriptions ({report['charged']} PHP charged), "
+            f"{report['failed']} declined, {report['refunded']} refunded, in {report['seconds']:.1f}s"
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptionpayment',
+            index=models.Index(fields=['user', '-paid_at', '-id'], name='payment_user_paid_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0002_subscriptionpayment_payment_user_paid_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['user', '-start_date'], name='usersub_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['status', 'end_date'], name='usersub_status_end_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0003_usersubscription_usersub_user_start_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscriptionpayment',
+            name='reference',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0004_subscriptionpayment_reference'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersubscription',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('plan_name', models.CharField(max_length=100)),
+                ('method', models.CharField(max_length=20)),
+                ('payments', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'plan_name', 'method'), name='revenue_day_plan_method_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySubscriberStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('new', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('expired', models.IntegerField(default=0)),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='subscriptions.subscriptionplan')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'plan'), name='substats_day_plan_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+def _plan_choices(apps):
+    return apps.get_model('subscriptions', 'SubscriptionPlan')._meta.get_field('name').choices
+
+
+def display_names_to_codes(apps, schema_editor):
+    # Revenue rows were keyed by the payment's plan display name.
+    DailyRevenue = apps.get_model('subscriptions', 'DailyRevenue')
+    for code, label in _plan_choices(apps):
+        DailyRevenue.objects.filter(plan=label).update(plan=code)
+
+
+def codes_to_display_names(apps, schema_editor):
+    DailyRevenue = apps.get_model('subscriptions', 'DailyRevenue')
+    for code, label in _plan_choices(apps):
+        DailyRevenue.objects.filter(plan=code).update(plan=label)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0005_usersubscription_cancelled_at_dailyrevenue_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailyrevenue',
+            name='revenue_day_plan_method_uniq',
+        ),
+        migrations.RenameField(
+            model_name='dailyrevenue',
+            old_name='plan_name',
+            new_name='plan',
+        ),
+        migrations.RunPython(display_names_to_codes, codes_to_display_names),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(fields=('day', 'plan', 'method'), name='revenue_day_plan_method_uniq'),
+        ),
+    ]
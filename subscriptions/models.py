@@ -40,26 +40,46 @@ class UserSubscription(models.Model):
     end_date = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="active")
     auto_renew = models.BooleanField(default=True)
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-start_date"], name="usersub_user_start_idx"),
+            models.Index(fields=["status", "end_date"], name="usersub_status_end_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} -> {self.plan.get_name_display()} ({self.status})"
 
+    @property
+    def current_status(self):
+        # An overdue subscription is expired even before the sweeper
+        # (``subscriptions.expiry``) has updated the row.
+        if self.status == "active" and self.end_date < timezone.now():
+            return "expired"
+        return self.status
+
     @property
     def is_active(self):
-        return self.status == "active" and self.end_date >= timezone.now()
+        return self.current_status == "active"
 
     def mark_cancelled(self):
+        was_active = self.status == "active"
         self.auto_renew = False
         self.status = "cancelled"
+        self.cancelled_at = timezone.now()
         self.save()
-
-    def mark_expired_if_needed(self):
-        if self.end_date < timezone.now() and self.status == "active":
-            self.status = "expired"
-            self.save()
+        if was_active:
+            from .rollups import record_cancellations
+            record_cancellations([self])
 
     @classmethod
     def create_new_subscription(cls, user, plan: SubscriptionPlan):
+        """
+        Start a subscription to ``plan``. It supersedes the user's earlier
+        active ones: they run out without being renewed.
+        """
+        cls.objects.filter(user=user, status="active", auto_renew=True).update(auto_renew=False)
         start = timezone.now()
         end = start + timedelta(days=plan.duration_days)
         return cls.objects.create(
@@ -95,7 +115,51 @@ class SubscriptionPayment(models.Model):
     amount = models.DecimalField(max_digits=8, decimal_places=2)
     method = models.CharField(max_length=20, choices=PAYMENT_METHODS)
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS, default="paid")
+    reference = models.CharField(max_length=100, blank=True)          # gateway charge id
     paid_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-paid_at", "-id"], name="payment_user_paid_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} paid {self.amount} via {self.method} ({self.status})"
+
+
+# ------------------------------------------------
+# 📊 Daily rollups for finance dashboards (see rollups.py)
+# ------------------------------------------------
+class DailyRevenue(models.Model):
+    """Paid payments per day, plan and method."""
+    day = models.DateField()
+    # Plan code (``SubscriptionPlan.name``), like the subscriber stats.
+    plan = models.CharField(max_length=100)
+    method = models.CharField(max_length=20)
+    payments = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "plan", "method"], name="revenue_day_plan_method_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.plan}/{self.method}: {self.amount} ({self.payments})"
+
+
+class DailySubscriberStats(models.Model):
+    """Subscriptions started, cancelled and expired per day and plan."""
+    day = models.DateField()
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.CASCADE, related_name="daily_stats")
+    new = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    expired = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "plan"], name="substats_day_plan_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.plan}: +{self.new} -{self.cancelled} -{self.expired}"
@@ -0,0 +1,113 @@
+# subscriptions/pricing.py
+"""
+Subscription prices, computed in ``Decimal`` throughout.
+
+A quote starts from the plan's list price and applies the voucher: its
+``discount_percent`` first, then its ``discount_amount`` off what is
+left, never below zero. Tax (``BILLING["TAX_RATE"]``) is added on the
+discounted subtotal. Each step is rounded half up to the centavo.
+
+Active plans are cached in the process and reloaded once any plan is
+saved or deleted (``subscriptions.signals``); a token in the default
+cache carries that to other processes sharing it. A quote therefore
+reads the database only to look up its voucher.
+"""
+import threading
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from rewards.models import Voucher
+from . import billing
+from .models import SubscriptionPlan
+
+CENT = Decimal("0.01")
+PLANS_TOKEN_KEY = "pricing:plans"
+
+
+def money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class Quote:
+    __slots__ = ("plan", "list_price", "percent_off", "amount_off", "subtotal", "tax", "total")
+
+    def __init__(self, plan, list_price, percent_off, amount_off, subtotal, tax, total):
+        self.plan = plan
+        self.list_price = list_price
+        self.percent_off = percent_off
+        self.amount_off = amount_off
+        self.subtotal = subtotal
+        self.tax = tax
+        self.total = total
+
+    @property
+    def discount(self):
+        return self.percent_off + self.amount_off
+
+
+def quote(plan, voucher=None, tax_rate=None):
+    """
+    Price ``plan`` with ``voucher`` (a row from ``find_voucher``, or None).
+    Pure arithmetic: no queries.
+    """
+    list_price = money(plan.price)
+    percent_off = amount_off = Decimal("0.00")
+    if voucher is not None:
+        percent_off = money(list_price * Decimal(voucher["discount_percent"]) / 100)
+        amount_off = min(money(voucher["discount_amount"]), list_price - percent_off)
+    subtotal = list_price - percent_off - amount_off
+    rate = Decimal(str(billing.config()["TAX_RATE"] if tax_rate is None else tax_rate))
+    tax = money(subtotal * rate)
+    return Quote(plan, list_price, percent_off, amount_off, subtotal, tax, subtotal + tax)
+
+
+def usable_vouchers(now):
+    return Voucher.objects.filter(Q(expires_at__isnull=True) | Q(expires_at__gte=now), is_active=True)
+
+
+def find_voucher(code, now=None):
+    """The usable voucher ``code`` as a dict of its pricing fields, or None."""
+    return (
+        usable_vouchers(now or timezone.now())
+        .filter(code=code)
+        .values("pk", "discount_amount", "discount_percent")
+        .first()
+    )
+
+
+_plans = None
+_plans_token = None
+_plans_lock = threading.Lock()
+
+
+def active_plans():
+    """``{pk: plan}`` of the active plans; treat the instances as read-only."""
+    global _plans, _plans_token
+    token = cache.get(PLANS_TOKEN_KEY)
+    if _plans is None or token is None or token != _plans_token:
+        with _plans_lock:
+            if token is None:
+                cache.add(PLANS_TOKEN_KEY, uuid.uuid4().hex, None)
+                token = cache.get(PLANS_TOKEN_KEY)
+            if _plans is None or token != _plans_token:
+                _plans = {plan.pk: plan for plan in SubscriptionPlan.objects.filter(is_active=True)}
+                _plans_token = token
+    return _plans
+
+
+def get_plan(plan_id):
+    try:
+        return active_plans().get(int(plan_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def forget_plans():
+    global _plans
+    with _plans_lock:
+        _plans = None
+    cache.set(PLANS_TOKEN_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,256 @@
+# subscriptions/rollups.py
+"""
+Daily finance rollups: revenue by plan and payment method, and
+subscriptions started, cancelled and expired per plan.
+
+The tables are kept current as things happen, in the same transaction
+as the change: payments and subscriptions created or deleted (signals),
+cancellations (``UserSubscription.mark_cancelled``), the expiry sweeper
+and the renewal run. Each update is one ``INSERT ... ON CONFLICT DO
+UPDATE`` adding to the day's counters, so concurrent writers never lose
+an increment. Edits made by hand (e.g. in the admin) are not tracked;
+``backfill_rollups`` rebuilds both tables from history.
+
+Active subscribers per plan are the running sum of new minus cancelled
+minus expired, computed when the rollups are read.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    DailyRevenue,
+    DailySubscriberStats,
+    SubscriptionPayment,
+    SubscriptionPlan,
+    UserSubscription,
+)
+
+CHUNK_SIZE = 5000
+STAT_FIELDS = ("new", "cancelled", "expired")
+
+# Payments freeze the plan's display name; rollups are keyed by its code.
+PLAN_LABELS = dict(SubscriptionPlan.PLAN_CHOICES)
+PLAN_CODES = {label: code for code, label in SubscriptionPlan.PLAN_CHOICES}
+
+
+def _day(value):
+    return timezone.localdate(value)
+
+
+def _plan_code(snapshot):
+    # Snapshots not matching a known plan label are kept as they are.
+    return PLAN_CODES.get(snapshot, snapshot)
+
+
+def _add(model, key_fields, counter_fields, rows):
+    """Add ``{key: counters}`` onto the model's rows, creating missing ones."""
+    rows = {key: counters for key, counters in rows.items() if any(counters)}
+    if not rows:
+        return
+    meta = model._meta
+    qn = connection.ops.quote_name
+    table = qn(meta.db_table)
+    fields = [meta.get_field(name) for name in (*key_fields, *counter_fields)]
+    columns = ", ".join(qn(field.column) for field in fields)
+    conflict = ", ".join(qn(meta.get_field(name).column) for name in key_fields)
+    updates = ", ".join(
+        f"{qn(column)} = {table}.{qn(column)} + excluded.{qn(column)}"
+        for column in (meta.get_field(name).column for name in counter_fields)
+    )
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+    )
+    params = [
+        [field.get_db_prep_value(value, connection) for field, value in zip(fields, (*key, *counters))]
+        for key, counters in rows.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+    if any(value < 0 for counters in rows.values() for value in counters):
+        # Drop rows a reversal brought back to nothing, as a backfill would.
+        keys = Q()
+        for key in rows:
+            keys |= Q(**dict(zip(key_fields, key)))
+        model.objects.filter(keys, **dict.fromkeys(counter_fields, 0)).delete()
+
+
+def record_payments(payments, sign=1):
+    rows = defaultdict(lambda: [0, Decimal("0.00")])
+    for payment in payments:
+        if payment.status != "paid":
+            continue
+        row = rows[(_day(payment.paid_at), _plan_code(payment.plan_name_snapshot), payment.method)]
+        row[0] += sign
+        row[1] += sign * Decimal(payment.amount)
+    _add(DailyRevenue, ("day", "plan", "method"), ("payments", "amount"), rows)
+
+
+def _record_stats(field, days_and_plans, sign):
+    rows = defaultdict(lambda: [0, 0, 0])
+    index = STAT_FIELDS.index(field)
+    for day, plan_id in days_and_plans:
+        rows[(day, plan_id)][index] += sign
+    _add(DailySubscriberStats, ("day", "plan"), STAT_FIELDS, rows)
+
+
+def record_new(subscriptions, sign=1):
+    _record_stats("new", [(_day(sub.start_date), sub.plan_id) for sub in subscriptions], sign)
+
+
+def _cancelled_on(sub):
+    # Cancellations from before ``cancelled_at`` existed count when the
+    # subscription would have ended.
+    return _day(sub.cancelled_at or sub.end_date)
+
+
+def record_cancellations(subscriptions, sign=1):
+    _record_stats("cancelled", [(_cancelled_on(sub), sub.plan_id) for sub in subscriptions], sign)
+
+
+def record_expiries(plans_and_end_dates, sign=1):
+    """Expiries count on the day the subscription ran out."""
+    _record_stats("expired", [(_day(end_date), plan_id) for plan_id, end_date in plans_and_end_dates], sign)
+
+
+def _stream(queryset, fields, chunk_size):
+    """``values_list`` rows of ``queryset`` in primary key chunks."""
+    last = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last).order_by("pk").values_list("pk", *fields)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last = chunk[-1][0]
+
+
+def backfill(chunk_size=CHUNK_SIZE):
+    """
+    Rebuild both rollup tables from the payment and subscription history,
+    read in ``chunk_size`` keyset chunks. The old rows are swapped for the
+    new ones in one transaction. Returns ``(revenue_rows, stats_rows)``.
+    """
+    revenue = defaultdict(lambda: [0, Decimal("0.00")])
+    paid = SubscriptionPayment.objects.filter(status="paid")
+    for _, paid_at, plan_name, method, amount in _stream(
+        paid, ("paid_at", "plan_name_snapshot", "method", "amount"), chunk_size
+    ):
+        row = revenue[(_day(paid_at), _plan_code(plan_name), method)]
+        row[0] += 1
+        row[1] += amount
+
+    stats = defaultdict(lambda: [0, 0, 0])
+    for _, plan_id, start_date, end_date, status, cancelled_at in _stream(
+        UserSubscription.objects.all(),
+        ("plan_id", "start_date", "end_date", "status", "cancelled_at"),
+        chunk_size,
+    ):
+        stats[(_day(start_date), plan_id)][0] += 1
+        if status == "cancelled":
+            stats[(_day(cancelled_at or end_date), plan_id)][1] += 1
+        elif status == "expired":
+            stats[(_day(end_date), plan_id)][2] += 1
+
+    with transaction.atomic():
+        DailyRevenue.objects.all().delete()
+        DailySubscriberStats.objects.all().delete()
+        DailyRevenue.objects.bulk_create(
+            [
+                DailyRevenue(day=day, plan=plan, method=method, payments=count, amount=amount)
+                for (day, plan, method), (count, amount) in revenue.items()
+            ],
+            batch_size=chunk_size,
+        )
+        DailySubscriberStats.objects.bulk_create(
+            [
+                DailySubscriberStats(day=day, plan_id=plan_id, new=new, cancelled=cancelled, expired=expired)
+                for (day, plan_id), (new, cancelled, expired) in stats.items()
+            ],
+            batch_size=chunk_size,
+        )
+    return len(revenue), len(stats)
+
+
+def _monthly(price, duration_days):
+    return price * 30 / duration_days
+
+
+def report(since, until):
+    """
+    Rollups for the days ``since`` through ``until``: revenue rows,
+    subscriber rows with the running ``active`` count and ``mrr`` (at
+    current plan prices), and a summary of the period. Every row names
+    its plan by code (``plan``, also the ``plan_mix`` key) and display
+    name (``plan_name``).
+    """
+    plans = {plan.pk: plan for plan in SubscriptionPlan.objects.all()}
+
+    revenue = [
+        {**row, "plan_name": PLAN_LABELS.get(row["plan"], row["plan"])}
+        for row in DailyRevenue.objects.filter(day__range=(since, until))
+        .order_by("day", "plan", "method")
+        .values("day", "plan", "method", "payments", "amount")
+    ]
+
+    active = defaultdict(int)
+    before = (
+        DailySubscriberStats.objects.filter(day__lt=since)
+        .values("plan")
+        .annotate(net=Sum(F("new") - F("cancelled") - F("expired")))
+    )
+    for row in before:
+        active[row["plan"]] = row["net"]
+    active_start = sum(active.values())
+
+    subscribers = []
+    totals = dict.fromkeys(STAT_FIELDS, 0)
+    for row in (
+        DailySubscriberStats.objects.filter(day__range=(since, until))
+        .order_by("day", "plan")
+        .values("day", "plan", *STAT_FIELDS)
+    ):
+        plan = plans[row["plan"]]
+        active[plan.pk] += row["new"] - row["cancelled"] - row["expired"]
+        for field in STAT_FIELDS:
+            totals[field] += row[field]
+        subscribers.append({
+            **row,
+            "plan": plan.name,
+            "plan_name": plan.get_name_display(),
+            "active": active[plan.pk],
+            "mrr": round(active[plan.pk] * _monthly(plan.price, plan.duration_days), 2),
+        })
+
+    churned = totals["cancelled"] + totals["expired"]
+    plan_mix = defaultdict(int)
+    for pk, count in active.items():
+        if count:
+            plan_mix[plans[pk].name] += count
+    return {
+        "since": since,
+        "until": until,
+        "revenue": revenue,
+        "subscribers": subscribers,
+        "summary": {
+            "revenue": sum((row["amount"] for row in revenue), Decimal("0.00")),
+            **totals,
+            "active_start": active_start,
+            "active_end": sum(active.values()),
+            "churn_rate": round(churned / active_start, 4) if active_start else None,
+            "mrr": round(sum(
+                (count * _monthly(plans[pk].price, plans[pk].duration_days) for pk, count in active.items()),
+                Decimal("0.00"),
+            ), 2),
+            "plan_mix": dict(plan_mix),
+        },
+    }
+
+
+def default_window(days=90):
+    until = timezone.localdate()
+    return until - timedelta(days=days - 1), until
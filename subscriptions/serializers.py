@@ -1,6 +1,5 @@
 from rest_framework import serializers
 from .models import SubscriptionPlan, UserSubscription, SubscriptionPayment
-from django.utils import timezone
 
 class SubscriptionPlanSerializer(serializers.ModelSerializer):
     display_name = serializers.CharField(source='get_name_display', read_only=True)
@@ -12,7 +11,8 @@ class SubscriptionPlanSerializer(serializers.ModelSerializer):
 
 class UserSubscriptionSerializer(serializers.ModelSerializer):
     plan_name = serializers.CharField(source='plan.get_name_display', read_only=True)
-    is_active = serializers.SerializerMethodField()
+    status = serializers.CharField(source='current_status', read_only=True)
+    is_active = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = UserSubscription
@@ -26,9 +26,6 @@ class UserSubscriptionSerializer(serializers.ModelSerializer):
             'is_active',
         ]
 
-    def get_is_active(self, obj):
-        return obj.status == "active" and obj.end_date >= timezone.now()
-
 
 class SubscriptionPaymentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,53 @@
+# subscriptions/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import pricing, rollups
+from .entitlements import forget
+from .models import SubscriptionPayment, SubscriptionPlan, UserSubscription
+
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+@receiver(post_save, sender=SubscriptionPayment)
+@receiver(post_delete, sender=SubscriptionPayment)
+def forget_entitlements(sender, instance, **kwargs):
+    # After commit, so a concurrent request cannot cache the old state again.
+    user_id = instance.user_id
+    transaction.on_commit(lambda: forget([user_id]))
+
+
+@receiver(post_save, sender=SubscriptionPayment)
+def add_payment_to_rollups(sender, instance, created, **kwargs):
+    if created:
+        rollups.record_payments([instance])
+
+
+@receiver(post_delete, sender=SubscriptionPayment)
+def remove_payment_from_rollups(sender, instance, **kwargs):
+    rollups.record_payments([instance], sign=-1)
+
+
+@receiver(post_save, sender=UserSubscription)
+def add_subscription_to_rollups(sender, instance, created, **kwargs):
+    if created:
+        rollups.record_new([instance])
+
+
+@receiver(post_delete, sender=UserSubscription)
+def remove_subscription_from_rollups(sender, instance, **kwargs):
+    rollups.record_new([instance], sign=-1)
+    if instance.status == "cancelled":
+        rollups.record_cancellations([instance], sign=-1)
+    elif instance.status == "expired":
+        rollups.record_expiries([(instance.plan_id, instance.end_date)], sign=-1)
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def forget_plans(sender, **kwargs):
+    # Now, so this transaction sees its own change, and again after
+    # commit, in case another request reloaded the old rows meanwhile.
+    pricing.forget_plans()
+    transaction.on_commit(pricing.forget_plans)
@@ -1,3 +1,494 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from outbox.jobs import run_batch
+from rewards.models import Voucher
+from . import billing, pricing
+from .checkout import CheckoutError, checkout
+from .entitlements import HasPlanFeature, get_entitlements, has_feature
+from .expiry import expire_subscriptions
+from .models import (
+    DailyRevenue,
+    DailySubscriberStats,
+    SubscriptionPayment,
+    SubscriptionPlan,
+    UserSubscription,
+)
+
+
+class ExpiryTests(TestCase):
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(name="basic", price=Decimal("199.00"), duration_days=30)
+        self.user = User.objects.create_user(username="owner")
+        self.now = timezone.now()
+
+    def subscribe(self, days_left, status="active", user=None):
+        return UserSubscription.objects.create(
+            user=user or self.user, plan=self.plan,
+            start_date=self.now - timedelta(days=30), end_date=self.now + timedelta(days=days_left),
+            status=status,
+        )
+
+    def test_get_reports_expiry_without_writing(self):
+        sub = self.subscribe(-1)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertNumQueries(2):
+            response = client.get("/api/subscriptions/mine/")
+        self.assertEqual((response.data["status"], response.data["is_active"]), ("expired", False))
+        sub.refresh_from_db()
+        self.assertEqual(sub.status, "active")
+
+    def test_sweeper_expires_only_overdue_active_rows_in_batches(self):
+        overdue = [self.subscribe(-day, user=User.objects.create_user(username=f"u{day}")) for day in range(1, 6)]
+        current = self.subscribe(3)
+        cancelled = self.subscribe(-2, status="cancelled")
+
+        # Per batch: savepoint, select, update, rollup upsert, release.
+        with self.assertNumQueries(15):
+            self.assertEqual(expire_subscriptions(now=self.now, batch_size=2), 5)
+        self.assertEqual(
+            set(UserSubscription.objects.filter(status="expired").values_list("pk", flat=True)),
+            {sub.pk for sub in overdue},
+        )
+        current.refresh_from_db()
+        cancelled.refresh_from_db()
+        self.assertEqual((current.status, cancelled.status), ("active", "cancelled"))
+
+        out = StringIO()
+        call_command("expire_subscriptions", stdout=out)
+        self.assertIn("expired 0 subscriptions", out.getvalue())
+
+
+class StandInGateway(billing.FakeGateway):
+    """Declines the given users and remembers every call."""
+
+    def __init__(self, declined_users=(), **kwargs):
+        super().__init__(**kwargs)
+        self.declined_users = set(declined_users)
+        self.calls = []
+
+    def charge(self, user_id, amount, method, idempotency_key):
+        self.calls.append((user_id, amount, method))
+        if user_id in self.declined_users:
+            return billing.ChargeResult(False, error="Card declined.")
+        return super().charge(user_id, amount, method, idempotency_key)
+
+
+class RenewalTests(TestCase):
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(name="basic", price=Decimal("199.00"), duration_days=30)
+        self.now = timezone.now()
+
+    def subscribe(self, username, hours_left, **kwargs):
+        return UserSubscription.objects.create(
+            user=User.objects.create_user(username=username), plan=self.plan,
+            start_date=self.now - timedelta(days=29), end_date=self.now + timedelta(hours=hours_left),
+            **kwargs,
+        )
+
+    def test_renews_due_subscriptions_and_records_payments(self):
+        paying = self.subscribe("paying", 5)
+        SubscriptionPayment.objects.create(
+            user=paying.user, subscription=paying, plan_name_snapshot="Basic",
+            amount=Decimal("199.00"), method="gcash", paid_at=self.now - timedelta(days=29),
+        )
+        declined = self.subscribe("declined", 10)
+        later = self.subscribe("later", 72)
+        manual = self.subscribe("manual", 5, auto_renew=False)
+        gateway = StandInGateway(declined_users=[declined.user_id])
+
+        report = billing.renew_subscriptions(now=self.now, gateway=gateway, batch_size=1)
+        self.assertEqual((report["renewed"], report["failed"], report["charged"]), (1, 1, Decimal("199.00")))
+        self.assertEqual(gateway.calls, [
+            (paying.user_id, Decimal("199.00"), "gcash"),
+            (declined.user_id, Decimal("199.00"), "card"),
+        ])
+        for sub, days in [(paying, 30), (declined, 0), (later, 0), (manual, 0)]:
+            end_date = sub.end_date
+            sub.refresh_from_db()
+            self.assertEqual(sub.end_date - end_date, timedelta(days=days))
+        self.assertEqual(
+            list(declined.payments.values_list("status", flat=True)), ["failed"]
+        )
+        self.assertTrue(paying.payments.get(status="paid", paid_at=self.now).reference.startswith("fake-"))
+
+        # Only the declined subscription is still due on the next run.
+        gateway.declined_users.clear()
+        report = billing.renew_subscriptions(now=self.now, gateway=gateway)
+        self.assertEqual((report["renewed"], report["failed"]), (1, 0))
+
+    def test_user_with_two_active_rows_is_charged_once(self):
+        older = self.subscribe("twice", 3)
+        newer = UserSubscription.objects.create(
+            user=older.user, plan=self.plan, start_date=self.now - timedelta(days=1),
+            end_date=self.now + timedelta(hours=5),
+        )
+        lapsed = self.subscribe("lapsed", -2)
+        gateway = StandInGateway()
+
+        report = billing.renew_subscriptions(now=self.now, gateway=gateway)
+        self.assertEqual((report["renewed"], gateway.calls), (1, [(older.user_id, Decimal("199.00"), "card")]))
+        self.assertEqual(list(SubscriptionPayment.objects.values_list("subscription", flat=True)), [newer.pk])
+        end_date = lapsed.end_date
+        lapsed.refresh_from_db()
+        self.assertEqual(lapsed.end_date, end_date)
+
+    def test_subscribing_again_supersedes_the_earlier_subscription(self):
+        earlier = self.subscribe("switcher", 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            later = UserSubscription.create_new_subscription(earlier.user, self.plan)
+        earlier.refresh_from_db()
+        self.assertEqual((earlier.status, earlier.auto_renew), ("active", False))
+        self.assertEqual(list(billing.due_for_renewal(later.end_date, self.now)), [later])
+
+    def test_subscriptions_changed_mid_charge_are_refunded_not_extended(self):
+        kept, cancelled, manual, expired = (
+            self.subscribe(name, 5) for name in ("kept", "cancelled", "manual", "expired")
+        )
+        batch = list(billing.due_for_renewal(self.now + timedelta(hours=24)).select_related("plan").order_by("pk"))
+        gateway = billing.FakeGateway()
+        previous = billing.set_gateway(gateway)
+        self.addCleanup(billing.set_gateway, previous)
+        results = [gateway.charge(sub.user_id, sub.plan.price, "card", f"k{sub.pk}") for sub in batch]
+
+        # What happens while the charges are in flight.
+        cancelled.mark_cancelled()
+        UserSubscription.objects.filter(pk=manual.pk).update(auto_renew=False)
+        UserSubscription.objects.filter(pk=expired.pk).update(status="expired")
+
+        amounts = {sub.pk: sub.plan.price for sub in batch}
+        self.assertEqual(billing._record(batch, {sub.pk: "card" for sub in batch}, amounts, results, self.now),
+                         {kept.pk})
+        for sub, days in [(kept, 30), (cancelled, 0), (manual, 0), (expired, 0)]:
+            end_date = sub.end_date
+            sub.refresh_from_db()
+            self.assertEqual(sub.end_date - end_date, timedelta(days=days))
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, "cancelled")
+        self.assertEqual(list(SubscriptionPayment.objects.values_list("subscription", flat=True)), [kept.pk])
+
+        self.assertEqual(run_batch(), (3, 0))
+        refunded = {result.reference for sub, result in zip(batch, results) if sub.pk != kept.pk}
+        self.assertEqual(set(gateway.refunds), refunded)
+
+    def test_renewals_are_priced_like_checkout(self):
+        sub = self.subscribe("taxed", 5)
+        gateway = StandInGateway()
+        with self.settings(BILLING={"TAX_RATE": "0.12"}):
+            report = billing.renew_subscriptions(now=self.now, gateway=gateway)
+            expected = pricing.quote(self.plan).total
+        self.assertEqual(expected, Decimal("222.88"))
+        self.assertEqual((report["charged"], gateway.calls[0][1]), (expected, expected))
+        self.assertEqual(sub.payments.get().amount, expected)
+        self.assertEqual(DailyRevenue.objects.get().amount, expected)
+
+    def test_charges_run_concurrently(self):
+        for i in range(40):
+            self.subscribe(f"owner{i}", 1)
+        gateway = billing.FakeGateway(latency=0.05)
+        report = billing.renew_subscriptions(now=self.now, gateway=gateway, concurrency=20)
+        self.assertEqual(report["renewed"], 40)
+        # Serially this would take 40 x 50 ms.
+        self.assertLess(report["seconds"], 1.0)
+
+    def test_subscribe_charges_through_the_gateway(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="owner"))
+        previous = billing.set_gateway(billing.FakeGateway(failure_rate=1.0))
+        self.addCleanup(billing.set_gateway, previous)
+
+        response = client.post("/api/subscriptions/subscribe/", {"plan_id": self.plan.pk}, format="json")
+        self.assertEqual(response.status_code, 402)
+        self.assertFalse(UserSubscription.objects.exists())
+
+        billing.set_gateway(billing.FakeGateway())
+        response = client.post("/api/subscriptions/subscribe/", {"plan_id": self.plan.pk}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(SubscriptionPayment.objects.get().reference.startswith("fake-"))
+
+
+class PremiumOnlyView(APIView):
+    permission_classes = [permissions.IsAuthenticated, HasPlanFeature]
+    required_feature = "live_tracking"
+
+    def get(self, request):
+        return Response({"ok": True})
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.basic = SubscriptionPlan.objects.create(name="basic", price=Decimal("199.00"), duration_days=30)
+        self.premium = SubscriptionPlan.objects.create(name="premium", price=Decimal("499.00"), duration_days=30)
+        self.user = User.objects.create_user(username="owner")
+        self.factory = APIRequestFactory()
+
+    def call(self):
+        request = self.factory.get("/premium/")
+        force_authenticate(request, user=self.user)
+        return PremiumOnlyView.as_view()(request)
+
+    def test_permission_is_served_from_the_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscription.create_new_subscription(self.user, self.basic)
+        self.assertEqual(self.call().status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscription.create_new_subscription(self.user, self.premium)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.call().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.call().status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.subscriptions.latest("start_date").mark_cancelled()
+        self.assertEqual(self.call().status_code, 403)
+
+    def test_view_without_a_required_feature_is_refused(self):
+        class Misconfigured(PremiumOnlyView):
+            required_feature = None
+
+        request = self.factory.get("/premium/")
+        force_authenticate(request, user=self.user)
+        with self.assertRaises(ImproperlyConfigured):
+            Misconfigured.as_view()(request)
+
+    def test_cache_holds_entitlements_for_many_users(self):
+        User.objects.bulk_create([User(username=f"many{i}") for i in range(1000)])
+        users = list(User.objects.filter(username__startswith="many"))
+        for user in users:
+            get_entitlements(user)
+        with self.assertNumQueries(0):
+            for user in users:
+                get_entitlements(user)
+
+    def test_cached_entitlements_lapse_with_the_subscription(self):
+        UserSubscription.objects.create(
+            user=self.user, plan=self.premium, end_date=timezone.now() + timedelta(milliseconds=50)
+        )
+        self.assertTrue(has_feature(self.user, "live_tracking"))
+        # Runs out without any write that would drop the cache entry.
+        time.sleep(0.06)
+        self.assertFalse(has_feature(self.user, "live_tracking"))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get("/api/subscriptions/entitlements/").data["features"], [])
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(name="premium", price=Decimal("499.00"), duration_days=30)
+        self.user = User.objects.create_user(username="owner")
+        self.voucher = Voucher.objects.create(code="SAVE100", name="Save 100", discount_amount=Decimal("100.00"))
+        self.gateway = billing.FakeGateway()
+        previous = billing.set_gateway(self.gateway)
+        self.addCleanup(billing.set_gateway, previous)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def subscribe(self, code="SAVE100"):
+        return self.client.post("/api/subscriptions/subscribe/",
+                                {"plan_id": self.plan.pk, "voucher_code": code}, format="json")
+
+    def test_voucher_is_used_once(self):
+        response = self.subscribe()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["subscription"]["final_amount"], Decimal("399.00"))
+        self.voucher.refresh_from_db()
+        self.assertFalse(self.voucher.is_active)
+
+        response = self.subscribe()
+        self.assertEqual((response.status_code, response.data["error"]), (400, "Invalid or expired voucher."))
+        self.assertEqual(UserSubscription.objects.count(), 1)
+        self.assertEqual(len(self.gateway.charges), 1)
+
+    def test_declined_charge_leaves_nothing_behind(self):
+        self.gateway.failure_rate = 1.0
+        self.assertEqual(self.subscribe().status_code, 402)
+        self.voucher.refresh_from_db()
+        self.assertTrue(self.voucher.is_active)
+        self.assertFalse(UserSubscription.objects.exists())
+        self.assertFalse(SubscriptionPayment.objects.exists())
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_exactly_one_of_many_checkouts_gets_the_voucher(self):
+        plan = SubscriptionPlan.objects.create(name="basic", price=Decimal("199.00"), duration_days=30)
+        Voucher.objects.create(code="ONCE", name="Once", discount_amount=Decimal("50.00"))
+        users = [User.objects.create_user(username=f"owner{i}") for i in range(8)]
+        gateway = billing.FakeGateway(latency=0.01)
+        barrier = threading.Barrier(len(users))
+        outcomes = []
+
+        def worker(user):
+            try:
+                barrier.wait()
+                checkout(user, plan, "gcash", "ONCE", gateway=gateway)
+                outcomes.append("ok")
+            except CheckoutError as e:
+                outcomes.append(str(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(outcomes.count("ok"), 1)
+        self.assertEqual(UserSubscription.objects.count(), 1)
+        self.assertEqual(SubscriptionPayment.objects.get().amount, Decimal("149.00"))
+        self.assertFalse(Voucher.objects.get().is_active)
+
+        # Every losing charge is refunded by the outbox worker.
+        previous = billing.set_gateway(gateway)
+        self.addCleanup(billing.set_gateway, previous)
+        self.assertEqual(run_batch(), (len(users) - 1, 0))
+        self.assertEqual(len(gateway.refunds), len(users) - 1)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.basic = SubscriptionPlan.objects.create(name="basic", price=Decimal("300.00"), duration_days=30)
+        self.premium = SubscriptionPlan.objects.create(name="premium", price=Decimal("900.00"), duration_days=90)
+        previous = billing.set_gateway(billing.FakeGateway())
+        self.addCleanup(billing.set_gateway, previous)
+        self.staff = APIClient()
+        self.staff.force_authenticate(User.objects.create_user(username="finance", is_staff=True))
+
+    def subscribe(self, username, plan, method="gcash"):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username=username))
+        response = client.post("/api/subscriptions/subscribe/", {"plan_id": plan.pk, "method": method},
+                               format="json")
+        self.assertEqual(response.status_code, 201)
+        return client
+
+    def snapshot(self):
+        return (
+            sorted(DailyRevenue.objects.values_list("day", "plan", "method", "payments", "amount")),
+            sorted(DailySubscriberStats.objects.values_list("day", "plan", "new", "cancelled", "expired")),
+        )
+
+    def test_incremental_rollups_match_a_backfill(self):
+        self.subscribe("a", self.basic)
+        self.subscribe("b", self.basic, method="card")
+        quitter = self.subscribe("c", self.premium)
+        self.assertEqual(quitter.post("/api/subscriptions/cancel/").status_code, 200)
+        lapsed = UserSubscription.objects.get(user__username="a")
+        UserSubscription.objects.filter(pk=lapsed.pk).update(end_date=timezone.now() - timedelta(days=1))
+        expire_subscriptions()
+        due = UserSubscription.objects.get(user__username="b")
+        billing.renew_subscriptions(now=due.end_date - timedelta(hours=1))
+        UserSubscription.objects.get(user__username="c").delete()
+
+        incremental = self.snapshot()
+        call_command("backfill_rollups", chunk_size=2, stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(sum(row[3] for row in incremental[0]), 3)
+
+    def test_staff_report(self):
+        self.subscribe("a", self.basic)
+        self.subscribe("b", self.premium)
+        today = timezone.localdate()
+
+        response = self.staff.get("/api/subscriptions/rollups/")
+        self.assertEqual(response.status_code, 200)
+        summary = response.data["summary"]
+        self.assertEqual(summary["revenue"], Decimal("1200.00"))
+        self.assertEqual((summary["new"], summary["active_start"], summary["active_end"]), (2, 0, 2))
+        self.assertEqual(summary["mrr"], Decimal("600.00"))
+        self.assertEqual(summary["plan_mix"], {"basic": 1, "premium": 1})
+        # Revenue, subscriber and plan-mix rows share the plan code as key.
+        self.assertEqual(
+            sorted((row["plan"], row["plan_name"]) for row in response.data["revenue"]),
+            [("basic", "Basic"), ("premium", "Premium")],
+        )
+        self.assertEqual(
+            sorted((row["plan"], row["plan_name"]) for row in response.data["subscribers"]),
+            [("basic", "Basic"), ("premium", "Premium")],
+        )
+
+        # The day after, yesterday's subscribers are the starting point.
+        tomorrow = (today + timedelta(days=1)).isoformat()
+        response = self.staff.get("/api/subscriptions/rollups/", {"since": tomorrow, "until": tomorrow})
+        self.assertEqual((response.data["summary"]["active_start"], response.data["revenue"]), (2, []))
+
+        self.assertEqual(self.staff.get("/api/subscriptions/rollups/", {"since": "May 1"}).status_code, 400)
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username="a"))
+        self.assertEqual(client.get("/api/subscriptions/rollups/").status_code, 403)
+
+
+class PricingTests(TestCase):
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(name="premium", price=Decimal("499.00"), duration_days=30)
+        Voucher.objects.create(code="HALF", name="Half", discount_percent=Decimal("12.5"),
+                               discount_amount=Decimal("20.00"))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="owner"))
+
+    def test_percent_then_fixed_then_tax(self):
+        voucher = pricing.find_voucher("HALF")
+        quote = pricing.quote(self.plan, voucher, tax_rate="0.12")
+        # 12.5% of 499.00 = 62.375, rounded half up.
+        self.assertEqual((quote.percent_off, quote.amount_off), (Decimal("62.38"), Decimal("20.00")))
+        self.assertEqual((quote.subtotal, quote.tax, quote.total),
+                         (Decimal("416.62"), Decimal("49.99"), Decimal("466.61")))
+
+        voucher["discount_amount"] = Decimal("1000.00")
+        quote = pricing.quote(self.plan, voucher, tax_rate="0.12")
+        self.assertEqual((quote.discount, quote.total), (Decimal("499.00"), Decimal("0.00")))
+
+    def test_quote_reads_only_the_voucher(self):
+        url = "/api/subscriptions/quote/"
+        pricing.active_plans()
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"plan_id": self.plan.pk})
+        self.assertEqual(response.data["total"], Decimal("499.00"))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"plan_id": self.plan.pk, "voucher_code": "HALF"})
+        self.assertEqual((response.data["discount"], response.data["total"]), (Decimal("82.38"), Decimal("416.62")))
+
+        self.assertEqual(self.client.get(url, {"plan_id": self.plan.pk, "voucher_code": "NOPE"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"plan_id": "x"}).status_code, 404)
+        self.assertFalse(UserSubscription.objects.exists())
+        self.assertTrue(Voucher.objects.get(code="HALF").is_active)
+
+    def test_saving_a_plan_refreshes_the_cache(self):
+        self.assertEqual(pricing.get_plan(self.plan.pk).price, Decimal("499.00"))
+        self.plan.price = Decimal("549.00")
+        self.plan.save()
+        self.assertEqual(pricing.get_plan(self.plan.pk).price, Decimal("549.00"))
+        self.plan.is_active = False
+        self.plan.save()
+        self.assertIsNone(pricing.get_plan(self.plan.pk))
+
+    def test_checkout_charges_the_quote(self):
+        previous = billing.set_gateway(billing.FakeGateway())
+        self.addCleanup(billing.set_gateway, previous)
+        with self.settings(BILLING={"TAX_RATE": "0.12"}):
+            response = self.client.post("/api/subscriptions/subscribe/",
+                                        {"plan_id": self.plan.pk, "voucher_code": "HALF"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["subscription"]["tax"], response.data["subscription"]["final_amount"]),
+                         (Decimal("49.99"), Decimal("466.61")))
+        self.assertEqual(SubscriptionPayment.objects.get().amount, Decimal("466.61"))
@@ -5,7 +5,10 @@ from . import views
 urlpatterns = [
     path("plans/", views.SubscriptionPlanListView.as_view(), name="subscription_plans"),
     path("mine/", views.MySubscriptionView.as_view(), name="my_subscription"),
+    path("entitlements/", views.MyEntitlementsView.as_view(), name="my_entitlements"),
     path("subscribe/", views.SubscribeToPlanView.as_view(), name="subscribe_to_plan"),
+    path("quote/", views.QuoteView.as_view(), name="subscription_quote"),
     path("cancel/", views.CancelSubscriptionView.as_view(), name="cancel_subscription"),
     path("payments/", views.MyPaymentsView.as_view(), name="my_payments"),
+    path("rollups/", views.RollupsView.as_view(), name="subscription_rollups"),
 ]
@@ -1,9 +1,13 @@
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
+from restaurant_waste_backend.pagination import PaidAtKeysetPagination
+from .checkout import INVALID_VOUCHER, CheckoutError, checkout
+from .entitlements import get_entitlements
+from . import pricing, rollups
 from .models import SubscriptionPlan, UserSubscription, SubscriptionPayment
 from .serializers import (
     SubscriptionPlanSerializer,
@@ -30,14 +34,28 @@ class MySubscriptionView(generics.RetrieveAPIView):
     serializer_class = UserSubscriptionSerializer
 
     def get_object(self):
-        sub = (
+        # Read-only: an overdue subscription is reported as expired by the
+        # serializer; the stored status is updated by expire_subscriptions.
+        return (
             UserSubscription.objects.filter(user=self.request.user)
             .order_by('-start_date')
             .first()
         )
-        if sub:
-            sub.mark_expired_if_needed()
-        return sub
+
+
+# -----------------------------------------
+# 2b. What my plan lets me do
+# -----------------------------------------
+class MyEntitlementsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        entitlements = get_entitlements(request.user)
+        return Response({
+            "plan": entitlements.plan,
+            "features": sorted(entitlements.features),
+            "valid_until": entitlements.valid_until,
+        })
 
 
 # -----------------------------------------
@@ -62,42 +80,15 @@ class SubscribeToPlanView(APIView):
         if not plan_id:
             return Response({"error": "plan_id is required"}, status=400)
 
-        plan = get_object_or_404(SubscriptionPlan, id=plan_id, is_active=True)
-        discount = 0
-        applied_voucher = None
+        plan = pricing.get_plan(plan_id)
+        if plan is None:
+            return Response({"detail": "Not found."}, status=404)
 
-        # 🧾 Optional: Check voucher validity
-        if voucher_code:
-            from rewards.models import Voucher
-            try:
-                voucher = Voucher.objects.get(code=voucher_code, is_active=True)
-                discount = float(voucher.discount_amount)
-                applied_voucher = voucher
-            except Voucher.DoesNotExist:
-                return Response({"error": "Invalid or expired voucher."}, status=400)
-
-        # 🧮 Compute final price
-        total_amount = float(plan.price) - discount
-        if total_amount < 0:
-            total_amount = 0
-
-        # ✅ Create subscription
-        new_sub = UserSubscription.create_new_subscription(request.user, plan)
-
-        # 💸 Log payment
-        SubscriptionPayment.objects.create(
-            user=request.user,
-            subscription=new_sub,
-            plan_name_snapshot=plan.get_name_display(),
-            amount=total_amount,
-            method=method,
-            status="paid",
-        )
-
-        # 🔓 Mark voucher as used if needed
-        if applied_voucher:
-            applied_voucher.is_active = False
-            applied_voucher.save()
+        # 🧾 Voucher, charge, subscription and payment in one go
+        try:
+            new_sub, payment, quote = checkout(request.user, plan, method, voucher_code)
+        except CheckoutError as e:
+            return Response({"error": str(e)}, status=e.status)
 
         return Response(
             {
@@ -105,8 +96,9 @@ class SubscribeToPlanView(APIView):
                 "subscription": {
                     "plan_name": plan.get_name_display(),
                     "plan_price": plan.price,
-                    "discount_applied": discount,
-                    "final_amount": total_amount,
+                    "discount_applied": quote.discount,
+                    "tax": quote.tax,
+                    "final_amount": payment.amount,
                     "end_date": new_sub.end_date,
                     "voucher_code": voucher_code,
                 },
@@ -115,6 +107,47 @@ class SubscribeToPlanView(APIView):
         )
 
 
+# -----------------------------------------
+# 3b. Preview the price of a plan
+# -----------------------------------------
+class QuoteView(APIView):
+    """
+    GET ?plan_id=2&voucher_code=SAVE10 — what subscribing would cost,
+    without creating anything. Reads at most the voucher from the database.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        plan_id = request.query_params.get("plan_id")
+        voucher_code = request.query_params.get("voucher_code") or None
+        if not plan_id:
+            return Response({"error": "plan_id is required"}, status=400)
+
+        plan = pricing.get_plan(plan_id)
+        if plan is None:
+            return Response({"detail": "Not found."}, status=404)
+
+        voucher = None
+        if voucher_code:
+            voucher = pricing.find_voucher(voucher_code)
+            if voucher is None:
+                return Response({"error": INVALID_VOUCHER}, status=400)
+
+        quote = pricing.quote(plan, voucher)
+        return Response({
+            "plan_id": plan.pk,
+            "plan_name": plan.get_name_display(),
+            "list_price": quote.list_price,
+            "percent_off": quote.percent_off,
+            "amount_off": quote.amount_off,
+            "discount": quote.discount,
+            "subtotal": quote.subtotal,
+            "tax": quote.tax,
+            "total": quote.total,
+            "voucher_code": voucher_code,
+        })
+
+
 # -----------------------------------------
 # 4. Cancel auto-renew
 # -----------------------------------------
@@ -123,7 +156,9 @@ class CancelSubscriptionView(APIView):
 
     def post(self, request, *args, **kwargs):
         sub = (
-            UserSubscription.objects.filter(user=request.user, status="active")
+            UserSubscription.objects.filter(
+                user=request.user, status="active", end_date__gte=timezone.now()
+            )
             .order_by('-start_date')
             .first()
         )
@@ -148,6 +183,38 @@ class CancelSubscriptionView(APIView):
 class MyPaymentsView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = SubscriptionPaymentSerializer
+    pagination_class = PaidAtKeysetPagination
 
     def get_queryset(self):
-        return SubscriptionPayment.objects.filter(user=self.request.user).order_by('-paid_at')
\ No newline at end of file
+        return SubscriptionPayment.objects.filter(user=self.request.user).order_by('-paid_at')
+
+
+# -----------------------------------------
+# 6. Finance rollups (staff)
+# -----------------------------------------
+ROLLUP_MAX_DAYS = 400
+
+
+class RollupsView(APIView):
+    """
+    Daily revenue and subscriber rollups: ``?since=YYYY-MM-DD&until=YYYY-MM-DD``
+    (default: the last 90 days).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        since, until = rollups.default_window()
+        try:
+            if "until" in request.query_params:
+                until = parse_date(request.query_params["until"])
+            if "since" in request.query_params:
+                since = parse_date(request.query_params["since"])
+        except ValueError:
+            since = None
+        if since is None or until is None:
+            return Response({"error": "since and until must be dates (YYYY-MM-DD)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if since > until or (until - since).days >= ROLLUP_MAX_DAYS:
+            return Response({"error": f"Pick a range of 1 to {ROLLUP_MAX_DAYS} days."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(rollups.report(since, until))
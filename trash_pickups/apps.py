@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TrashPickupsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trash_pickups'
+
+    def ready(self):
+        import trash_pickups.checks
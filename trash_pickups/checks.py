@@ -0,0 +1,28 @@
+# trash_pickups/checks.py
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries live in one process only.
+PROCESS_LOCAL_CACHES = {"django.core.cache.backends.locmem.LocMemCache"}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_fence_cache(app_configs, **kwargs):
+    """
+    Geofences are dropped from the default cache when a pickup is assigned
+    or moved. With a process-local cache only the worker that made the
+    change drops them; every other worker keeps checking the old fences.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        "The default cache is process-local, so geofences dropped by one "
+        "worker stay stale in the others.",
+        hint=(
+            "Point CACHES['default'] at a shared backend (Redis, Memcached or "
+            "the database cache). A single-process deployment may silence "
+            "trash_pickups.E001."
+        ),
+        id="trash_pickups.E001",
+    )]
@@ -0,0 +1,431 @@
+# trash_pickups/dispatch.py
+"""
+Batch dispatch: match pending pickups to available drivers.
+
+All open pickups and idle drivers are loaded as coordinate arrays, a
+driver x pickup distance matrix is built in one vectorized pass, and the
+assignment with the smallest total driving distance is solved exactly
+(shortest augmenting path / Jonker-Volgenant style Hungarian method).
+The result is written back as one batch of guarded UPDATEs, so a pickup
+a driver accepted by hand in the meantime is never overwritten.
+
+With ``max_km`` set, drivers and pickups with nothing within reach are
+dropped and the rest are split into the connected components of the
+"within reach" graph. No pair across two components can be matched, so
+solving each component on its own is still exact, and the solver only
+ever sees one city (or one isolated neighbourhood) at a time instead of
+the whole country.
+"""
+import time
+
+import numpy as np
+from django.db import connection, transaction
+
+from drivers.models import Driver
+from . import geofence
+from .events import publish_status
+from .geo import EARTH_RADIUS_KM, haversine_matrix
+from .models import TrashPickup
+
+# Pairs further apart than max_km get this cost: the solver only uses
+# them when nothing else is left, and they are dropped afterwards.
+UNREACHABLE_COST = 1e6
+
+
+def load_pending_pickups():
+    """(ids, lats, lngs) of pending unassigned pickups with coordinates."""
+    rows = list(
+        TrashPickup.objects.filter(
+            status="pending",
+            driver__isnull=True,
+            latitude__isnull=False,
+            longitude__isnull=False,
+        ).order_by("id").values_list("id", "latitude", "longitude")
+    )
+    return _to_arrays(rows)
+
+
+def load_available_drivers():
+    """(ids, lats, lngs) of idle available drivers with a known position."""
+    rows = list(
+        Driver.objects.filter(
+            status="available",
+            is_active=True,
+            latitude__isnull=False,
+            longitude__isnull=False,
+        )
+        .exclude(assigned_pickups__status__in=["accepted", "in_progress"])
+        .order_by("id")
+        .values_list("id", "latitude", "longitude")
+        .distinct()
+    )
+    return _to_arrays(rows)
+
+
+def _to_arrays(rows):
+    if not rows:
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), empty, empty
+    ids, lats, lngs = zip(*rows)
+    return (
+        np.fromiter(ids, dtype=np.int64, count=len(ids)),
+        np.fromiter((float(x) for x in lats), dtype=np.float64, count=len(lats)),
+        np.fromiter((float(x) for x in lngs), dtype=np.float64, count=len(lngs)),
+    )
+
+
+def solve_assignment(cost):
+    """
+    Minimum-cost assignment for a rectangular cost matrix.
+
+    Every row is matched to a distinct column (so the matrix must not have
+    more rows than columns). Returns ``col_for_row``. Rows left over by
+    the warm start are added by one Dijkstra-style shortest augmenting
+    path each over reduced costs; the inner step works on whole rows of
+    the matrix at once.
+    """
+    n_rows, n_cols = cost.shape
+    if n_rows > n_cols:
+        raise ValueError("cost matrix must not have more rows than columns")
+
+    row_index = np.arange(n_rows)
+    col_for_row = np.full(n_rows, -1, dtype=np.int64)
+    row_for_col = np.full(n_cols, -1, dtype=np.int64)
+
+    # Warm start (Jonker-Volgenant): every row whose cheapest column is
+    # still free takes it, then augmenting row reduction lets contested
+    # rows outbid each other. Both keep the duals feasible, and on
+    # geographic data they settle most rows before any path search.
+    v = np.zeros(n_cols)
+    nearest = np.argmin(cost, axis=1)
+    for row in np.argsort(cost[row_index, nearest], kind="stable"):
+        col = nearest[row]
+        if row_for_col[col] < 0:
+            row_for_col[col] = row
+            col_for_row[row] = col
+
+    free = list(np.flatnonzero(col_for_row < 0))
+    for _ in range(2):
+        free = _augmenting_row_reduction(cost, v, col_for_row, row_for_col, free)
+
+    u = np.empty(n_rows)
+    assigned = col_for_row >= 0
+    u[assigned] = cost[assigned, col_for_row[assigned]] - v[col_for_row[assigned]]
+    u[~assigned] = 0.0
+
+    reduced = np.empty(n_cols)
+    better = np.empty(n_cols, dtype=bool)
+    for current in free:
+        # shortest: tentative path lengths, +inf once a column is scanned.
+        # final: path length of each scanned column. Scanned columns get
+        # a price of -inf, which keeps their reduced cost at +inf.
+        shortest = np.full(n_cols, np.inf)
+        final = np.empty(n_cols)
+        path = np.empty(n_cols, dtype=np.int64)
+        prices = v.copy()
+        scanned_rows = [current]
+        scanned_cols = []
+
+        min_value = 0.0
+        row = current
+        while True:
+            np.subtract(cost[row], prices, out=reduced)
+            reduced += min_value - u[row]
+            np.less(reduced, shortest, out=better)
+            np.putmask(path, better, row)
+            np.copyto(shortest, reduced, where=better)
+
+            col = int(shortest.argmin())
+            min_value = shortest[col]
+            if min_value == np.inf:
+                raise ValueError("cost matrix has no feasible assignment")
+
+            final[col] = min_value
+            shortest[col] = np.inf
+            prices[col] = -np.inf
+            scanned_cols.append(col)
+            if row_for_col[col] < 0:
+                break
+            row = row_for_col[col]
+            scanned_rows.append(row)
+
+        # Update the dual variables so reduced costs stay non-negative.
+        others = np.array(scanned_rows[1:], dtype=np.int64)
+        u[current] += min_value
+        u[others] += min_value - final[col_for_row[others]]
+        v[scanned_cols] -= min_value - final[scanned_cols]
+
+        # Flip the augmenting path.
+        while True:
+            row = path[col]
+            row_for_col[col] = row
+            col_for_row[row], col = col, col_for_row[row]
+            if row == current:
+                break
+
+    return col_for_row
+
+
+def _augmenting_row_reduction(cost, v, col_for_row, row_for_col, free_rows):
+    """
+    One augmenting row reduction pass over ``free_rows``.
+
+    A free row takes its cheapest column (by reduced cost), lowering that
+    column's price by the gap to its second-best option; whoever held the
+    column becomes free. Returns the rows still free afterwards.
+    """
+    free = list(free_rows)
+    still_free = []
+    pending = len(free)
+    k = 0
+    steps_left = 10 * len(free) + 100
+    while k < pending and steps_left:
+        steps_left -= 1
+        row = free[k]
+        k += 1
+
+        reduced = cost[row] - v
+        if reduced.shape[0] > 1:
+            best_two = np.argpartition(reduced, 1)[:2]
+            if reduced[best_two[1]] < reduced[best_two[0]]:
+                best_two = best_two[::-1]
+            col, second = int(best_two[0]), int(best_two[1])
+            gap = reduced[second] - reduced[col]
+        else:
+            col, second, gap = 0, 0, 0.0
+
+        previous = row_for_col[col]
+        if gap > 0:
+            v[col] -= gap
+        elif previous >= 0:
+            col = second
+            previous = row_for_col[col]
+
+        col_for_row[row] = col
+        row_for_col[col] = row
+        if previous >= 0:
+            col_for_row[previous] = -1
+            if gap > 0:
+                k -= 1
+                free[k] = previous
+            else:
+                still_free.append(previous)
+
+    still_free.extend(free[k:pending])
+    return still_free
+
+
+def greedy_assignment(cost):
+    """
+    Baseline: rows in order each take their nearest free column, which is
+    what drivers polling ``available`` nearest-first amount to.
+    """
+    n_rows, n_cols = cost.shape
+    taken = np.zeros(n_cols, dtype=bool)
+    col_for_row = np.full(n_rows, -1, dtype=np.int64)
+    for row in range(min(n_rows, n_cols)):
+        col = int(np.argmin(np.where(taken, np.inf, cost[row])))
+        col_for_row[row] = col
+        taken[col] = True
+    return col_for_row
+
+
+def reach_components(reachable):
+    """
+    Connected components of the bipartite ``reachable`` (drivers x
+    pickups) graph, found breadth first a whole frontier at a time.
+
+    Returns ``(driver_label, pickup_label)``; components are numbered from
+    0 and a driver or pickup with nothing in reach is a component of its
+    own.
+    """
+    n_drivers, n_pickups = reachable.shape
+    driver_label = np.full(n_drivers, -1, dtype=np.int64)
+    pickup_label = np.full(n_pickups, -1, dtype=np.int64)
+    label = 0
+    for seed in range(n_drivers):
+        if driver_label[seed] >= 0:
+            continue
+        driver_label[seed] = label
+        drivers = np.array([seed])
+        while len(drivers):
+            pickups = np.flatnonzero(reachable[drivers].any(axis=0) & (pickup_label < 0))
+            pickup_label[pickups] = label
+            drivers = np.flatnonzero(reachable[:, pickups].any(axis=1) & (driver_label < 0))
+            driver_label[drivers] = label
+        label += 1
+    lonely = pickup_label < 0
+    pickup_label[lonely] = label + np.arange(lonely.sum())
+    return driver_label, pickup_label
+
+
+def plan_dispatch(max_km=None):
+    """
+    Compute the optimal driver/pickup matching without writing anything.
+
+    Returns ``(pairs, stats)`` where ``pairs`` is a list of
+    ``(pickup_id, driver_id, distance_km)``.
+    """
+    started = time.perf_counter()
+    pickups = load_pending_pickups()
+    drivers = load_available_drivers()
+    loaded = time.perf_counter()
+    pairs, stats = match(pickups, drivers, max_km)
+    stats["load_seconds"] = loaded - started
+    return pairs, stats
+
+
+def match(pickups, drivers, max_km=None):
+    """
+    ``plan_dispatch`` on ``(ids, lats, lngs)`` arrays of pickups and
+    drivers, as returned by the loaders.
+    """
+    started = time.perf_counter()
+    pickup_ids, pickup_lats, pickup_lngs = pickups
+    driver_ids, driver_lats, driver_lngs = drivers
+
+    stats = {
+        "pickups": len(pickup_ids),
+        "drivers": len(driver_ids),
+        "components": 0,
+        "largest_component": 0,
+        "assigned": 0,
+        "total_km": 0.0,
+        "greedy_assigned": 0,
+        "greedy_total_km": 0.0,
+        "greedy_seconds": 0.0,
+        "load_seconds": 0.0,
+        "solve_seconds": 0.0,
+    }
+    if not len(pickup_ids) or not len(driver_ids):
+        return [], stats
+
+    pairs = []
+    for driver_idx, pickup_idx, distances in _blocks(drivers, pickups, max_km):
+        block_pairs, block_stats = _match_block(pickup_ids, driver_ids, driver_idx, pickup_idx, distances, max_km)
+        pairs.extend(block_pairs)
+        for key, value in block_stats.items():
+            stats[key] += value
+        stats["components"] += 1
+        stats["largest_component"] = max(stats["largest_component"], min(len(driver_idx), len(pickup_idx)))
+    stats["solve_seconds"] = time.perf_counter() - started - stats["greedy_seconds"]
+    return pairs, stats
+
+
+def _blocks(drivers, pickups, max_km):
+    """
+    Yield ``(driver_idx, pickup_idx, distances)`` for each part of the
+    problem that can be solved on its own.
+
+    Without ``max_km`` that is the whole problem. With it, points are
+    first cut into latitude bands more than ``max_km`` apart (no pair
+    across a band is in reach, and it spares the distance matrix between
+    far-apart cities), then each band into its reach components.
+    """
+    _, driver_lats, driver_lngs = drivers
+    _, pickup_lats, pickup_lngs = pickups
+    if max_km is None:
+        yield (
+            np.arange(len(driver_lats)),
+            np.arange(len(pickup_lats)),
+            haversine_matrix(driver_lats, driver_lngs, pickup_lats, pickup_lngs),
+        )
+        return
+
+    n_drivers = len(driver_lats)
+    lats = np.concatenate([driver_lats, pickup_lats])
+    order = np.argsort(lats, kind="stable")
+    gaps = np.diff(lats[order]) > np.degrees(max_km / EARTH_RADIUS_KM)
+    for band in np.split(order, np.flatnonzero(gaps) + 1):
+        band_drivers = band[band < n_drivers]
+        band_pickups = band[band >= n_drivers] - n_drivers
+        if not len(band_drivers) or not len(band_pickups):
+            continue
+        distances = haversine_matrix(
+            driver_lats[band_drivers], driver_lngs[band_drivers],
+            pickup_lats[band_pickups], pickup_lngs[band_pickups],
+        )
+        driver_label, pickup_label = reach_components(distances <= max_km)
+        pickup_groups = _groups(pickup_label)
+        for label, local_drivers in _groups(driver_label).items():
+            local_pickups = pickup_groups.get(label)
+            if local_pickups is not None:
+                yield (
+                    band_drivers[local_drivers],
+                    band_pickups[local_pickups],
+                    distances[np.ix_(local_drivers, local_pickups)],
+                )
+
+
+def _groups(labels):
+    """``{label: indices}`` for an array of component labels."""
+    order = np.argsort(labels, kind="stable")
+    keys, starts = np.unique(labels[order], return_index=True)
+    return dict(zip(keys.tolist(), np.split(order, starts[1:])))
+
+
+def _match_block(pickup_ids, driver_ids, driver_idx, pickup_idx, distances, max_km):
+    """Solve one block exactly, with its shorter side as rows."""
+    transposed = len(driver_idx) > len(pickup_idx)
+    cost = distances
+    if transposed:
+        cost = cost.T
+    if max_km is not None:
+        cost = np.where(cost > max_km, UNREACHABLE_COST, cost)
+    cost = np.ascontiguousarray(cost)
+
+    optimal = solve_assignment(cost)
+    started = time.perf_counter()
+    greedy = greedy_assignment(cost)
+    greedy_seconds = time.perf_counter() - started
+
+    rows = np.arange(len(optimal))
+    optimal_km = cost[rows, optimal]
+    greedy_km = cost[rows, greedy]
+    optimal_ok = optimal_km < UNREACHABLE_COST
+    greedy_ok = greedy_km < UNREACHABLE_COST
+
+    stats = {
+        "assigned": int(optimal_ok.sum()),
+        "total_km": float(optimal_km[optimal_ok].sum()),
+        "greedy_assigned": int(greedy_ok.sum()),
+        "greedy_total_km": float(greedy_km[greedy_ok].sum()),
+        "greedy_seconds": greedy_seconds,
+    }
+
+    if transposed:
+        pickups_at, drivers_at = pickup_idx[rows[optimal_ok]], driver_idx[optimal[optimal_ok]]
+    else:
+        drivers_at, pickups_at = driver_idx[rows[optimal_ok]], pickup_idx[optimal[optimal_ok]]
+
+    pairs = [
+        (int(pickup_ids[p]), int(driver_ids[d]), float(km))
+        for p, d, km in zip(pickups_at, drivers_at, optimal_km[optimal_ok])
+    ]
+    return pairs, stats
+
+
+def apply_dispatch(pairs):
+    """
+    Write the assignment back in one batched statement.
+
+    The guarded claim UPDATE is sent once with every (driver, pickup)
+    pair as parameters. Each row only changes if the pickup is still
+    pending and unassigned, so anything claimed through ``accept`` since
+    planning is left alone. Returns the number of pickups assigned.
+    """
+    if not pairs:
+        return 0
+
+    meta = TrashPickup._meta
+    table = connection.ops.quote_name(meta.db_table)
+    driver_column = connection.ops.quote_name(meta.get_field("driver").column)
+    sql = (
+        f"UPDATE {table} SET {driver_column} = %s, status = 'accepted' "
+        f"WHERE id = %s AND status = 'pending' AND {driver_column} IS NULL"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, [(driver_id, pickup_id) for pickup_id, driver_id, _ in pairs])
+        transaction.on_commit(lambda: publish_status([pickup_id for pickup_id, _, _ in pairs]))
+        geofence.forget_on_commit({driver_id for _, driver_id, _ in pairs})
+        return cursor.rowcount
@@ -0,0 +1,55 @@
+# trash_pickups/events.py
+"""
+Push notifications for pickup changes, delivered by ``trash_pickups.streams``.
+
+Topics:
+    ``owner:<user id>``   status changes of the owner's pickups
+    ``driver:<id>``       live positions of a driver (see ``drivers.live``)
+    ``cell:<geohash>``    pickups entering or leaving the available pool,
+                          published under every prefix of the pickup's
+                          geohash so subscribers can pick any cell size.
+
+Call these after the change is committed (``transaction.on_commit``).
+"""
+from restaurant_waste_backend import push
+
+from .models import TrashPickup
+
+# Statuses during which the owner follows the driver's position.
+TRACKED_STATUSES = ("accepted", "in_progress")
+
+
+def cell_topics(geohash):
+    return [f"cell:{geohash[:length]}" for length in range(1, len(geohash) + 1)]
+
+
+def publish_available(pickup):
+    """Announce a new pending pickup to drivers subscribed near it."""
+    if not pickup.geohash:
+        return
+    data = {
+        "id": pickup.pk,
+        "restaurant_name": pickup.restaurant_name,
+        "waste_type": pickup.waste_type,
+        "weight_kg": pickup.weight_kg,
+        "latitude": pickup.latitude,
+        "longitude": pickup.longitude,
+        "scheduled_date": pickup.scheduled_date,
+    }
+    for topic in cell_topics(pickup.geohash):
+        push.publish(topic, "pickup.available", data)
+
+
+def publish_status(pickup_ids):
+    """
+    Tell owners about the current status of these pickups, and nearby
+    drivers about the ones that left the available pool.
+    """
+    rows = TrashPickup.objects.filter(pk__in=pickup_ids).values_list(
+        "pk", "user_id", "driver_id", "status", "geohash"
+    )
+    for pk, user_id, driver_id, status, geohash in rows:
+        push.publish(f"owner:{user_id}", "pickup.status", {"id": pk, "status": status, "driver": driver_id})
+        if geohash and (status != "pending" or driver_id is not None):
+            for topic in cell_topics(geohash):
+                push.publish(topic, "pickup.taken", {"id": pk})
@@ -0,0 +1,189 @@
+# trash_pickups/geo.py
+"""
+Small geo helpers shared by the pickup and driver apps.
+
+Positions are indexed with a geohash: a string whose prefixes name ever
+larger rectangular cells. Storing it in an indexed column lets "what is
+near (lat, lng)?" become a handful of index range scans over the cells
+covering the search circle, instead of a scan of every row.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~4.8m x 4.8m cells, plenty for pickups and drivers
+
+# Most cells (index range scans) one radius search may use. A 4x4 block
+# keeps the searched area within a small multiple of the circle's.
+MAX_COVERING_CELLS = 16
+
+# First character after "z" in ASCII, so [cell, cell + "{") is the range
+# of every geohash that starts with ``cell``.
+_PREFIX_END = "{"
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """Return the geohash of a point, or None if either coordinate is missing."""
+    if lat is None or lng is None:
+        return None
+
+    lat, lng = float(lat), float(lng)
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """(height, width) of a geohash cell in degrees at the given precision."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def check_point(lat, lng, radius_km=0.0):
+    """
+    Raise ValueError unless the point lies on the globe and the radius is
+    finite; NaN or infinity would never let the cell walk finish.
+    """
+    lat, lng, radius_km = float(lat), float(lng), float(radius_km)
+    if not all(map(math.isfinite, (lat, lng, radius_km))):
+        raise ValueError("lat, lng and radius_km must be finite.")
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        raise ValueError("lat must be within -90..90 and lng within -180..180.")
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, min_lng, max_lat, max_lng) of the circle around a point."""
+    check_point(lat, lng, radius_km)
+    lat, lng = float(lat), float(lng)
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return (
+        max(lat - dlat, -90.0),
+        max(lng - dlng, -180.0),
+        min(lat + dlat, 90.0),
+        min(lng + dlng, 180.0),
+    )
+
+
+def _cells_across(low, high, offset, size):
+    """How many cells of ``size`` degrees the span ``[low, high]`` touches."""
+    return int((high + offset) // size) - int((low + offset) // size) + 1
+
+
+def covering_cells(lat, lng, radius_km):
+    """
+    Geohash cells that together cover the circle of ``radius_km`` around
+    a point. The precision is the finest one that needs at most
+    ``MAX_COVERING_CELLS`` cells, so the cover stays a few cells wide
+    around the circle instead of one cell much larger than it.
+    """
+    min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius_km)
+
+    precision = 1
+    for p in range(GEOHASH_PRECISION, 0, -1):
+        cell_h, cell_w = cell_size(p)
+        count = (
+            _cells_across(min_lat, max_lat, 90.0, cell_h)
+            * _cells_across(min_lng, max_lng, 180.0, cell_w)
+        )
+        if count <= MAX_COVERING_CELLS:
+            precision = p
+            break
+
+    cell_h, cell_w = cell_size(precision)
+    cells = set()
+    y = min_lat
+    while True:
+        x = min_lng
+        while True:
+            cells.add(encode_geohash(min(y, max_lat), min(x, max_lng), precision))
+            if x >= max_lng:
+                break
+            x += cell_w
+        if y >= max_lat:
+            break
+        y += cell_h
+    return sorted(cells)
+
+
+def geohash_filter(cells, field="geohash"):
+    """
+    Build a Q object matching rows whose geohash falls in any of ``cells``.
+
+    Prefix matches are written as closed/open ranges rather than
+    ``startswith`` so that SQLite can answer them from the index.
+    """
+    from django.db.models import Q
+
+    query = Q()
+    for cell in cells:
+        query |= Q(**{f"{field}__gte": cell, f"{field}__lt": cell + _PREFIX_END})
+    return query
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_matrix(lat1, lng1, lat2, lng2):
+    """
+    Pairwise great-circle distances in kilometres.
+
+    Takes two sets of points as 1-D arrays (degrees) and returns a
+    ``len(lat1) x len(lat2)`` matrix. The half-angle differences are
+    expanded with sin(a - b) = sin a cos b - cos a sin b, so trigonometry
+    runs once per point and the matrix itself only needs products.
+    """
+    phi1 = np.radians(np.asarray(lat1, dtype=np.float64)) / 2
+    lam1 = np.radians(np.asarray(lng1, dtype=np.float64)) / 2
+    phi2 = np.radians(np.asarray(lat2, dtype=np.float64)) / 2
+    lam2 = np.radians(np.asarray(lng2, dtype=np.float64)) / 2
+
+    sin_dphi = np.outer(np.cos(phi1), np.sin(phi2))
+    sin_dphi -= np.outer(np.sin(phi1), np.cos(phi2))
+    sin_dlam = np.outer(np.cos(lam1), np.sin(lam2))
+    sin_dlam -= np.outer(np.sin(lam1), np.cos(lam2))
+
+    a = sin_dphi * sin_dphi
+    sin_dlam *= sin_dlam
+    sin_dlam *= np.outer(np.cos(2 * phi1), np.cos(2 * phi2))
+    a += sin_dlam
+    np.clip(a, 0.0, 1.0, out=a)
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= 2 * EARTH_RADIUS_KM
+    return a
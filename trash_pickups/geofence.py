@@ -0,0 +1,103 @@
+# trash_pickups/geofence.py
+"""
+Automatic ``accepted`` -> ``in_progress`` transition on arrival.
+
+Every location update of a driver is checked against a circle of
+``GEOFENCE_RADIUS_M`` around each of their accepted pickups. The fences
+are cached per driver with the circle already turned into a lat/lng box,
+so an update costs one cache read and a few comparisons; the database is
+only touched on arrival, or to refill the cache. Drivers without
+accepted pickups are cached too, as an empty list.
+
+The cache is dropped whenever a pickup is assigned to the driver or moved
+(``forget``). Pickups that left ``accepted`` some other way are caught by
+the guarded UPDATE on arrival, which also drops the stale entry.
+
+Dropping an entry only reaches other workers through a shared default
+cache; ``check --deploy`` fails on a process-local one
+(``trash_pickups.checks``).
+"""
+import math
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .events import publish_status
+from .geo import EARTH_RADIUS_KM, haversine_km
+from .models import TrashPickup
+
+GEOFENCE_RADIUS_M = 75
+FENCE_CACHE_TIMEOUT = 15 * 60
+
+
+def _cache_key(driver_id):
+    return f"geofence:{driver_id}"
+
+
+def _fence(pk, lat, lng, radius_km):
+    lat, lng = float(lat), float(lng)
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    # Near the poles the box simply spans every longitude.
+    cos_lat = math.cos(math.radians(lat))
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)) if cos_lat > 1e-9 else 360.0
+    return (pk, lat, lng, lat - dlat, lat + dlat, lng - dlng, lng + dlng)
+
+
+def fences(driver_id):
+    """``(pk, lat, lng, lat_min, lat_max, lng_min, lng_max)`` per accepted pickup."""
+    key = _cache_key(driver_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    radius_km = GEOFENCE_RADIUS_M / 1000
+    rows = TrashPickup.objects.filter(
+        driver_id=driver_id, status="accepted", latitude__isnull=False, longitude__isnull=False
+    ).values_list("pk", "latitude", "longitude")
+    cached = [_fence(pk, lat, lng, radius_km) for pk, lat, lng in rows]
+    cache.set(key, cached, FENCE_CACHE_TIMEOUT)
+    return cached
+
+
+def forget(driver_ids):
+    cache.delete_many([_cache_key(pk) for pk in driver_ids if pk is not None])
+
+
+def forget_on_commit(driver_ids):
+    driver_ids = list(driver_ids)
+    transaction.on_commit(lambda: forget(driver_ids))
+
+
+def arrived(driver_id, lat, lng):
+    """Ids of the driver's accepted pickups whose fence contains the point."""
+    radius_km = GEOFENCE_RADIUS_M / 1000
+    return [
+        pk
+        for pk, plat, plng, lat_min, lat_max, lng_min, lng_max in fences(driver_id)
+        if lat_min <= lat <= lat_max
+        and lng_min <= lng <= lng_max
+        and haversine_km(lat, lng, plat, plng) <= radius_km
+    ]
+
+
+def check_arrival(driver_id, lat, lng):
+    """
+    Start every accepted pickup of the driver whose fence contains
+    (``lat``, ``lng``). Returns the ids of the pickups started.
+    """
+    candidates = arrived(driver_id, lat, lng)
+    if not candidates:
+        return []
+
+    started = []
+    with transaction.atomic():
+        for pk in candidates:
+            # Guarded like ``claim``: a pickup started, completed or
+            # reassigned meanwhile is left alone.
+            if TrashPickup.objects.filter(pk=pk, driver_id=driver_id, status="accepted").update(
+                status="in_progress"
+            ):
+                started.append(pk)
+        forget_on_commit([driver_id])
+        if started:
+            transaction.on_commit(lambda: publish_status(started))
+    return started
@@ -0,0 +1,110 @@
+# trash_pickups/management/commands/bench_accept.py
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+
+from drivers.models import Driver
+from trash_pickups.models import TrashPickup
+
+
+class Command(BaseCommand):
+    help = (
+        "Race N driver threads for the same pickup, round after round, and "
+        "check that every round has exactly one winner. Reports accept "
+        "throughput. Creates its own rows and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--rounds", type=int, default=50)
+
+    def handle(self, *args, **options):
+        n_threads = options["threads"]
+        rounds = options["rounds"]
+        if n_threads < 2 or rounds < 1:
+            raise CommandError("Need at least 2 threads and 1 round.")
+
+        owner = User.objects.create_user(username=f"bench_accept_owner_{time.time_ns()}")
+        drivers = [
+            Driver.objects.create(
+                user=User.objects.create_user(username=f"bench_accept_{time.time_ns()}_{i}"),
+                full_name=f"Bench Driver {i}",
+                phone_number="0",
+                license_number=f"BENCH-{i}",
+            )
+            for i in range(n_threads)
+        ]
+
+        try:
+            winners_per_round, attempts, elapsed = self._race(owner, drivers, rounds)
+        finally:
+            TrashPickup.objects.filter(user=owner).delete()
+            User.objects.filter(pk__in=[d.user_id for d in drivers] + [owner.pk]).delete()
+
+        bad_rounds = [i for i, winners in enumerate(winners_per_round) if winners != 1]
+        self.stdout.write(
+            f"{rounds} rounds x {n_threads} threads: {attempts} accept attempts "
+            f"in {elapsed:.3f}s ({attempts / elapsed:.0f} attempts/s, "
+            f"{rounds / elapsed:.0f} pickups claimed/s)"
+        )
+        if bad_rounds:
+            raise CommandError(
+                f"{len(bad_rounds)} round(s) did not have exactly one winner: "
+                f"{[winners_per_round[i] for i in bad_rounds]}"
+            )
+        self.stdout.write(self.style.SUCCESS("Every round had exactly one winner."))
+
+    def _race(self, owner, drivers, rounds):
+        winners_per_round = []
+        attempts = 0
+        elapsed = 0.0
+        barrier = threading.Barrier(len(drivers))
+
+        for _ in range(rounds):
+            pickup = TrashPickup.objects.create(
+                user=owner,
+                restaurant_name="Bench",
+                pickup_address="Bench",
+                waste_type="Food",
+                weight_kg=Decimal("1.00"),
+            )
+            results = []
+            lock = threading.Lock()
+
+            def worker(driver):
+                close_old_connections()
+                try:
+                    barrier.wait()
+                    won = _claim_with_retry(pickup.pk, driver)
+                    with lock:
+                        results.append(won)
+                finally:
+                    connections.close_all()
+
+            threads = [threading.Thread(target=worker, args=(d,)) for d in drivers]
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed += time.perf_counter() - started
+
+            attempts += len(results)
+            winners_per_round.append(sum(results))
+
+        return winners_per_round, attempts, elapsed
+
+
+def _claim_with_retry(pk, driver, retries=20):
+    # SQLite serialises writers and may report "database is locked" when
+    # the busy timeout runs out; that is a lost race, not a second winner.
+    for attempt in range(retries):
+        try:
+            return TrashPickup.claim(pk, driver)
+        except OperationalError:
+            time.sleep(0.001 * (attempt + 1))
+    return False
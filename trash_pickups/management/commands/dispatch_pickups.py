@@ -0,0 +1,63 @@
+# trash_pickups/management/commands/dispatch_pickups.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from trash_pickups.dispatch import apply_dispatch, plan_dispatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Assign pending unassigned pickups to idle available drivers so the "
+        "total driving distance is minimal. Safe to run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-km",
+            type=float,
+            default=15.0,
+            help="Never pair a driver with a pickup further away than this (km).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Compute and report the assignment without writing it.",
+        )
+
+    def handle(self, *args, **options):
+        pairs, stats = plan_dispatch(max_km=options["max_km"])
+
+        self.stdout.write(
+            f"{stats['pickups']} pending pickups, {stats['drivers']} available drivers "
+            f"in {stats['components']} areas, largest {stats['largest_component']} "
+            f"(load {stats['load_seconds']:.3f}s, solve {stats['solve_seconds']:.3f}s)"
+        )
+        if not pairs:
+            self.stdout.write("Nothing to dispatch.")
+            return
+
+        optimal_avg = stats["total_km"] / stats["assigned"]
+        self.stdout.write(
+            f"Optimal: {stats['assigned']} assignments, {stats['total_km']:.2f} km total, "
+            f"{optimal_avg:.2f} km average"
+        )
+        if stats["greedy_assigned"]:
+            greedy_avg = stats["greedy_total_km"] / stats["greedy_assigned"]
+            longer = (greedy_avg / optimal_avg - 1) * 100 if optimal_avg else 0.0
+            self.stdout.write(
+                f"Greedy nearest-first baseline: {stats['greedy_assigned']} assignments, "
+                f"{stats['greedy_total_km']:.2f} km total, {greedy_avg:.2f} km average "
+                f"(greedy trips would be {longer:.1f}% longer)"
+            )
+
+        if options["dry_run"]:
+            self.stdout.write("Dry run: nothing written.")
+            return
+
+        started = time.perf_counter()
+        assigned = apply_dispatch(pairs)
+        self.stdout.write(self.style.SUCCESS(
+            f"Assigned {assigned} pickups in {time.perf_counter() - started:.3f}s"
+            + (f" ({len(pairs) - assigned} were claimed meanwhile)" if assigned < len(pairs) else "")
+        ))
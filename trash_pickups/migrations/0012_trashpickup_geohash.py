@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+from trash_pickups.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    TrashPickup = apps.get_model('trash_pickups', 'TrashPickup')
+    pickups = TrashPickup.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).only('id', 'latitude', 'longitude')
+
+    batch = []
+    for pickup in pickups.iterator(chunk_size=2000):
+        pickup.geohash = encode_geohash(pickup.latitude, pickup.longitude)
+        batch.append(pickup)
+        if len(batch) >= 2000:
+            TrashPickup.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        TrashPickup.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trash_pickups', '0011_alter_trashpickup_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trashpickup',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
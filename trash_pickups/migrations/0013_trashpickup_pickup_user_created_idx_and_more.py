@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0003_donationdrive_end_date_donationdrive_start_date_and_more'),
+        ('drivers', '0003_driver_latitude_driver_longitude'),
+        ('trash_pickups', '0012_trashpickup_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trashpickup',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='pickup_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trashpickup',
+            index=models.Index(fields=['driver', '-created_at', '-id'], name='pickup_driver_created_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0003_donationdrive_end_date_donationdrive_start_date_and_more'),
+        ('drivers', '0004_driverlocation_driverloc_current_idx'),
+        ('trash_pickups', '0013_trashpickup_pickup_user_created_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trashpickup',
+            index=models.Index(condition=models.Q(('driver__isnull', True), ('status', 'pending')), fields=['geohash'], name='pickup_open_geohash_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from donations.models import DonationDrive
+from .geo import encode_geohash
 
 
 class TrashPickup(models.Model):
@@ -58,11 +59,53 @@ class TrashPickup(models.Model):
         blank=True
     )
 
+    # Derived from latitude/longitude on save; indexed for nearby lookups.
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+    )
+
     def __str__(self):
         return f"Pickup #{self.id} - {self.restaurant_name} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and (
+            "latitude" in update_fields or "longitude" in update_fields
+        ):
+            kwargs["update_fields"] = set(update_fields) | {"geohash"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def claim(cls, pk, driver) -> bool:
+        """
+        Assign a pending, unassigned pickup to ``driver``.
+
+        This is a single conditional UPDATE, so when several drivers race
+        for the same pickup the database picks exactly one winner: the
+        caller whose statement changed a row.
+        """
+        claimed = cls.objects.filter(
+            pk=pk, driver__isnull=True, status="pending"
+        ).update(driver=driver, status="accepted")
+        return claimed == 1
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="pickup_user_created_idx"),
+            models.Index(fields=["driver", "-created_at", "-id"], name="pickup_driver_created_idx"),
+            # Open pickups only: what ``available`` and the dispatcher read.
+            models.Index(
+                fields=["geohash"],
+                condition=models.Q(status="pending", driver__isnull=True),
+                name="pickup_open_geohash_idx",
+            ),
+        ]
 
 class Voucher(models.Model):
     """
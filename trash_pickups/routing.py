@@ -0,0 +1,152 @@
+# trash_pickups/routing.py
+"""
+Stop ordering for a driver's accepted pickups.
+
+The route is an open tour that starts at the driver's position and
+visits every stop once. It is built nearest-neighbour first and then
+improved with 2-opt (reverse a segment whenever that shortens the
+tour) over a precomputed distance matrix. Results are cached per driver
+until the set of stops changes or the driver has moved noticeably.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from drivers import live
+from .geo import haversine_km, haversine_matrix
+from .models import TrashPickup
+
+ROUTE_STATUSES = ["accepted", "in_progress"]
+ROUTE_CACHE_TIMEOUT = 15 * 60
+# A cached route is reused until the driver is this far from where it
+# was planned.
+ROUTE_REPLAN_DISTANCE_KM = 0.5
+
+
+def nearest_neighbour_tour(dist):
+    """Open tour over all nodes starting at node 0, always going to the closest unvisited node."""
+    n = dist.shape[0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    tour = [0]
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[tour[-1]])
+        nxt = int(np.argmin(row))
+        visited[nxt] = True
+        tour.append(nxt)
+    return tour
+
+
+def two_opt(dist, tour, max_rounds=50):
+    """
+    Improve an open tour with fixed start by 2-opt moves.
+
+    For each cut point the gain of every possible segment reversal is
+    computed at once; the best improving one is applied and the scan
+    repeats until a full round finds nothing (or ``max_rounds``).
+    """
+    tour = np.asarray(tour, dtype=np.int64)
+    n = len(tour)
+    if n < 4:
+        return tour.tolist()
+
+    for _ in range(max_rounds):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = tour[i - 1], tour[i]
+            js = np.arange(i + 1, n)
+            c = tour[js]
+            # The successor of the last node does not exist (open tour).
+            has_next = js + 1 < n
+            d = tour[np.minimum(js + 1, n - 1)]
+
+            old = dist[a, b] + np.where(has_next, dist[c, d], 0.0)
+            new = dist[a, c] + np.where(has_next, dist[b, d], 0.0)
+            gain = old - new
+
+            k = int(np.argmax(gain))
+            if gain[k] > 1e-9:
+                j = js[k]
+                tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return tour.tolist()
+
+
+def tour_length(dist, tour):
+    return float(sum(dist[tour[k], tour[k + 1]] for k in range(len(tour) - 1)))
+
+
+def driver_position(driver):
+    """(lat, lng) of the driver's live position, else the Driver row."""
+    current = live.current_location(driver.pk)
+    if current is not None:
+        return current["lat"], current["lng"]
+    if driver.latitude is not None and driver.longitude is not None:
+        return float(driver.latitude), float(driver.longitude)
+    return None
+
+
+def _cache_key(driver_id):
+    return f"pickup-route:{driver_id}"
+
+
+def plan_route(driver):
+    """
+    Order ``driver``'s accepted and in-progress pickups into a short tour.
+
+    Returns a dict with the start position, the ordered pickup ids, the
+    length of each leg, the total distance and whether it came from the
+    cache. Pickups without coordinates are appended after the tour.
+    """
+    stops = list(
+        TrashPickup.objects.filter(driver=driver, status__in=ROUTE_STATUSES)
+        .order_by("created_at")
+        .values_list("id", "latitude", "longitude")
+    )
+    start = driver_position(driver)
+    routable = [s for s in stops if s[1] is not None and s[2] is not None]
+    unroutable = [s[0] for s in stops if s[1] is None or s[2] is None]
+    stop_ids = sorted(s[0] for s in stops)
+
+    cached = cache.get(_cache_key(driver.pk))
+    if (
+        cached is not None
+        and cached["stop_ids"] == stop_ids
+        and _same_start(cached["start"], start)
+    ):
+        return {**cached["route"], "cached": True}
+
+    if start is None or not routable:
+        route = {
+            "start": start,
+            "order": [s[0] for s in routable] + unroutable,
+            "legs_km": [None] * len(stops),
+            "total_km": None,
+        }
+    else:
+        lats = np.array([start[0]] + [float(s[1]) for s in routable])
+        lngs = np.array([start[1]] + [float(s[2]) for s in routable])
+        dist = haversine_matrix(lats, lngs, lats, lngs)
+
+        tour = two_opt(dist, nearest_neighbour_tour(dist))
+        legs = [round(float(dist[tour[k], tour[k + 1]]), 3) for k in range(len(tour) - 1)]
+        route = {
+            "start": start,
+            "order": [routable[node - 1][0] for node in tour[1:]] + unroutable,
+            "legs_km": legs + [None] * len(unroutable),
+            "total_km": round(tour_length(dist, tour), 3),
+        }
+
+    cache.set(
+        _cache_key(driver.pk),
+        {"stop_ids": stop_ids, "start": start, "route": route},
+        ROUTE_CACHE_TIMEOUT,
+    )
+    return {**route, "cached": False}
+
+
+def _same_start(cached_start, start):
+    if cached_start is None or start is None:
+        return cached_start == start
+    return haversine_km(*cached_start, *start) < ROUTE_REPLAN_DISTANCE_KM
@@ -0,0 +1,188 @@
+# trash_pickups/streams.py
+"""
+Server-sent event stream: ``GET /api/trash_pickups/events/``.
+
+Restaurant owners receive ``pickup.status`` for their pickups and
+``driver.position`` for the drivers currently handling them. Drivers
+receive ``pickup.available`` / ``pickup.taken`` for the area around
+them (``lat``, ``lng`` and ``radius_km`` params, or their live position,
+which the stream then follows).
+
+Authenticate with the usual ``Authorization: Bearer`` header or, since
+``EventSource`` cannot set headers, a ``token`` query param. The stream
+needs an ASGI server (e.g. ``uvicorn restaurant_waste_backend.asgi:application``):
+an idle connection is a coroutine and a small queue, not a thread.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from drivers import live
+from restaurant_waste_backend import push
+from .events import TRACKED_STATUSES
+from .geo import check_point, covering_cells, haversine_km
+from .models import TrashPickup
+
+DEFAULT_RADIUS_KM = 5.0
+MAX_RADIUS_KM = 50.0
+RETRY_MS = 5000
+
+
+def _authenticate(request):
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else request.GET.get("token", "").encode() or None
+    if not raw:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+@sync_to_async
+def _prepare(request, center, radius_km):
+    """
+    Authenticate and build the stream handler (``None`` if the request is
+    not authenticated). Every query a stream needs runs here, after which
+    the database connection is closed: under ASGI each request gets its
+    own connection, and an idle stream must not hold one for hours.
+    """
+    try:
+        user = _authenticate(request)
+        if user is None:
+            return None
+        driver = getattr(user, "driver_profile", None)
+        if driver is None:
+            pickups = dict(
+                TrashPickup.objects.filter(
+                    user_id=user.pk, status__in=TRACKED_STATUSES, driver__isnull=False
+                ).values_list("pk", "driver_id")
+            )
+            return OwnerStream(user, pickups)
+        follow = center is None
+        if follow:
+            position = live.current_location(driver.pk)
+            if position is not None:
+                center = (position["lat"], position["lng"])
+            elif driver.latitude is not None:
+                center = (float(driver.latitude), float(driver.longitude))
+        return DriverStream(driver, center, radius_km, follow)
+    finally:
+        # Leave the test case's transaction alone.
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+class OwnerStream:
+    def __init__(self, user, pickups):
+        self.user = user
+        # Pickup id -> driver, for pickups whose driver is being followed.
+        self.pickups = pickups
+
+    def start(self, subscription):
+        subscription.add(f"owner:{self.user.pk}", *[f"driver:{pk}" for pk in set(self.pickups.values())])
+
+    def handle(self, subscription, message):
+        if message.event == "pickup.status":
+            # Follow drivers as pickups get accepted and let go once done;
+            # the status event carries everything needed, no query.
+            before = set(self.pickups.values())
+            data = message.data
+            if data["status"] in TRACKED_STATUSES and data["driver"] is not None:
+                self.pickups[data["id"]] = data["driver"]
+            else:
+                self.pickups.pop(data["id"], None)
+            after = set(self.pickups.values())
+            subscription.remove(*[f"driver:{pk}" for pk in before - after])
+            subscription.add(*[f"driver:{pk}" for pk in after - before])
+        return message.frame
+
+
+class DriverStream:
+    def __init__(self, driver, center, radius_km, follow):
+        self.driver = driver
+        self.center = center
+        self.radius_km = radius_km
+        # Without an explicit lat/lng the area moves with the driver.
+        self.follow = follow
+        self.cells = set()
+
+    def start(self, subscription):
+        if self.follow:
+            subscription.add(f"driver:{self.driver.pk}")
+        if self.center is not None:
+            self.move(subscription, *self.center)
+
+    def move(self, subscription, lat, lng):
+        self.center = (lat, lng)
+        cells = {f"cell:{cell}" for cell in covering_cells(lat, lng, self.radius_km)}
+        subscription.remove(*(self.cells - cells))
+        subscription.add(*(cells - self.cells))
+        self.cells = cells
+
+    def handle(self, subscription, message):
+        if message.event == "driver.position":
+            # Our own position: keep the watched area around the driver.
+            self.move(subscription, message.data["lat"], message.data["lng"])
+            return None
+        if message.event == "pickup.available":
+            distance = haversine_km(*self.center, message.data["latitude"], message.data["longitude"])
+            if distance > self.radius_km:
+                return None
+        return message.frame
+
+
+async def _event_stream(subscription, handler, keepalive):
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        while True:
+            try:
+                message = await subscription.get(timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            frame = handler.handle(subscription, message)
+            if frame:
+                yield frame
+    finally:
+        subscription.close()
+
+
+def _error(detail, status):
+    return JsonResponse({"detail": detail}, status=status)
+
+
+async def events(request):
+    if request.method != "GET":
+        return _error(f'Method "{request.method}" not allowed.', 405)
+    try:
+        lat = request.GET.get("lat")
+        lng = request.GET.get("lng")
+        center = (float(lat), float(lng)) if lat is not None and lng is not None else None
+        radius_km = float(request.GET.get("radius_km", DEFAULT_RADIUS_KM))
+        # Checked here: the cell walk runs on the event loop and would
+        # never finish for NaN or infinity, stalling every stream.
+        check_point(*(center or (0.0, 0.0)), radius_km)
+    except ValueError:
+        return _error("Invalid lat, lng or radius_km.", 400)
+
+    handler = await _prepare(request, center, min(max(radius_km, 0.0), MAX_RADIUS_KM))
+    if handler is None:
+        return _error("Authentication credentials were not provided.", 401)
+
+    subscription = push.get_broker().subscribe()
+    handler.start(subscription)
+    response = StreamingHttpResponse(
+        _event_stream(subscription, handler, push.config()["KEEPALIVE_SECONDS"]),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop reverse proxies from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
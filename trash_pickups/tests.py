@@ -1,3 +1,548 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from drivers import live
+from drivers.models import Driver
+from restaurant_waste_backend import push
+from subscriptions.models import SubscriptionPlan, UserSubscription
+from . import geofence
+from .checks import check_shared_fence_cache
+from .dispatch import apply_dispatch, plan_dispatch, solve_assignment
+from .events import publish_available, publish_status
+from .geo import (
+    MAX_COVERING_CELLS, covering_cells, encode_geohash, geohash_filter, haversine_km, haversine_matrix,
+)
+from .routing import nearest_neighbour_tour, tour_length, two_opt
+from .models import TrashPickup
+
+
+def make_pickup(user, lat, lng, **kwargs):
+    defaults = {
+        "restaurant_name": "Resto",
+        "pickup_address": "Somewhere",
+        "waste_type": "Food",
+        "weight_kg": Decimal("5.00"),
+    }
+    defaults.update(kwargs)
+    return TrashPickup.objects.create(
+        user=user, latitude=Decimal(str(lat)), longitude=Decimal(str(lng)), **defaults
+    )
+
+
+def make_driver(username, **kwargs):
+    return Driver.objects.create(
+        user=User.objects.create_user(username=username),
+        full_name=username.title(),
+        phone_number="123",
+        license_number=f"L-{username}",
+        **kwargs,
+    )
+
+
+class GeoTests(TestCase):
+    def test_encode_geohash_known_value(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def test_covering_cells_contain_points_inside_radius(self):
+        lat, lng = 7.0731, 125.6128
+        cells = covering_cells(lat, lng, 2.0)
+        for dlat, dlng in [(0.017, 0), (-0.017, 0), (0, 0.017), (0, -0.017), (0.012, 0.012)]:
+            point = encode_geohash(lat + dlat, lng + dlng)
+            self.assertLessEqual(haversine_km(lat, lng, lat + dlat, lng + dlng), 2.0)
+            self.assertTrue(any(point.startswith(cell) for cell in cells))
+
+
+    def test_covering_cells_bound_the_candidate_rows(self):
+        # A pickup every ~0.55 km across a ~45 km square.
+        owner = User.objects.create_user(username="grid")
+        lat, lng = 7.0731, 125.6128
+        grid = np.arange(-0.2, 0.2001, 0.005)
+        points = [(round(lat + dlat, 6), round(lng + dlng, 6)) for dlat in grid for dlng in grid]
+        TrashPickup.objects.bulk_create([
+            TrashPickup(
+                user=owner, restaurant_name="Resto", pickup_address="Somewhere", waste_type="Food",
+                weight_kg=Decimal("5.00"), latitude=Decimal(str(p_lat)), longitude=Decimal(str(p_lng)),
+                geohash=encode_geohash(p_lat, p_lng),
+            )
+            for p_lat, p_lng in points
+        ], batch_size=1000)
+        lats, lngs = np.array(points).T
+        distances = haversine_matrix([lat], [lng], lats, lngs)[0]
+
+        for radius_km in (1.0, 2.0, 3.0, 5.0):
+            with self.subTest(radius_km=radius_km):
+                cells = covering_cells(lat, lng, radius_km)
+                candidates = TrashPickup.objects.filter(geohash_filter(cells)).count()
+                inside = int((distances <= radius_km).sum())
+                self.assertLessEqual(len(cells), MAX_COVERING_CELLS)
+                self.assertGreaterEqual(candidates, inside)
+                # One cell covering the whole circle read ~25x as many.
+                self.assertLessEqual(candidates, 8 * inside)
+
+
+class AvailablePickupsTests(TestCase):
+    def setUp(self):
+        live.reset()
+        self.owner = User.objects.create_user(username="owner")
+        self.driver_user = User.objects.create_user(username="driver")
+        self.driver = Driver.objects.create(
+            user=self.driver_user,
+            full_name="Driver One",
+            phone_number="123",
+            license_number="L-1",
+            latitude=Decimal("7.073100"),
+            longitude=Decimal("125.612800"),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver_user)
+
+    def test_geohash_follows_coordinates(self):
+        pickup = make_pickup(self.owner, 7.0731, 125.6128)
+        self.assertEqual(pickup.geohash, encode_geohash(7.0731, 125.6128))
+
+        pickup.latitude = Decimal("7.2000000")
+        pickup.save(update_fields=["latitude"])
+        pickup.refresh_from_db()
+        self.assertEqual(pickup.geohash, encode_geohash(7.2, 125.6128))
+
+    def test_returns_nearby_pickups_sorted_by_distance(self):
+        far = make_pickup(self.owner, 7.0731, 125.7000)   # ~9.6 km east
+        near = make_pickup(self.owner, 7.0741, 125.6128)  # ~110 m north
+        mid = make_pickup(self.owner, 7.0831, 125.6128)   # ~1.1 km north
+        make_pickup(self.owner, 7.0732, 125.6129, status="accepted")
+
+        response = self.client.get("/api/trash_pickups/available/", {"radius_km": 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.data], [near.id, mid.id])
+        self.assertNotIn(far.id, [row["id"] for row in response.data])
+        self.assertLess(response.data[0]["distance_km"], response.data[1]["distance_km"])
+
+    def test_explicit_position_and_limit(self):
+        first = make_pickup(self.owner, 14.5995, 120.9842)
+        make_pickup(self.owner, 14.6095, 120.9842)
+
+        response = self.client.get(
+            "/api/trash_pickups/available/",
+            {"lat": 14.5995, "lng": 120.9842, "radius_km": 3, "limit": 1},
+        )
+
+        self.assertEqual([row["id"] for row in response.data], [first.id])
+
+    def test_rejects_non_finite_or_off_globe_positions(self):
+        for params in [{"lat": "nan", "lng": 120.0}, {"lat": 14.0, "lng": "inf"},
+                       {"radius_km": "nan"}, {"lat": 91, "lng": 120.0}, {"lat": 14.0, "lng": -181}]:
+            with self.subTest(params=params):
+                response = self.client.get("/api/trash_pickups/available/", params)
+                self.assertEqual(response.status_code, 400)
+        with self.assertRaises(ValueError):
+            covering_cells(float("nan"), 0.0, 5.0)
+
+
+class AcceptPickupTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.first = make_driver("first")
+        self.second = make_driver("second")
+        self.pickup = make_pickup(self.owner, 7.0731, 125.6128)
+        self.client = APIClient()
+
+    def accept_as(self, driver, pk=None):
+        self.client.force_authenticate(driver.user)
+        return self.client.patch(f"/api/trash_pickups/{pk or self.pickup.pk}/accept/")
+
+    def test_first_driver_wins_second_is_rejected(self):
+        self.assertEqual(self.accept_as(self.first).status_code, 200)
+        self.assertEqual(self.accept_as(self.second).status_code, 400)
+
+        self.pickup.refresh_from_db()
+        self.assertEqual(self.pickup.driver, self.first)
+        self.assertEqual(self.pickup.status, "accepted")
+
+    def test_missing_pickup(self):
+        self.assertEqual(self.accept_as(self.first, pk=999999).status_code, 404)
+
+    def test_only_pending_pickups_can_be_claimed(self):
+        TrashPickup.objects.filter(pk=self.pickup.pk).update(status="cancelled")
+        self.assertFalse(TrashPickup.claim(self.pickup.pk, self.first))
+
+
+class ConcurrentAcceptTests(TransactionTestCase):
+    def test_exactly_one_of_many_threads_wins(self):
+        owner = User.objects.create_user(username="owner")
+        drivers = [make_driver(f"driver{i}") for i in range(8)]
+        pickup = make_pickup(owner, 7.0731, 125.6128)
+        barrier = threading.Barrier(len(drivers))
+        results = []
+
+        def worker(driver):
+            try:
+                barrier.wait()
+                results.append(TrashPickup.claim(pickup.pk, driver))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(d,)) for d in drivers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sum(results), 1)
+        pickup.refresh_from_db()
+        self.assertIn(pickup.driver, drivers)
+
+
+class AssignmentSolverTests(TestCase):
+    def test_matches_brute_force_on_small_matrices(self):
+        rng = np.random.default_rng(7)
+        for _ in range(25):
+            n_rows, n_cols = int(rng.integers(1, 5)), int(rng.integers(5, 7))
+            cost = rng.random((n_rows, n_cols))
+
+            cols = solve_assignment(cost)
+
+            self.assertEqual(len(set(cols.tolist())), n_rows)
+            best = min(
+                sum(cost[r, p[r]] for r in range(n_rows))
+                for p in itertools.permutations(range(n_cols), n_rows)
+            )
+            self.assertAlmostEqual(cost[np.arange(n_rows), cols].sum(), best)
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+
+    def test_minimises_total_distance_and_skips_busy_drivers(self):
+        # Nearest-first would send A to P1 (0.5 km) and leave B with P2
+        # (~4.4 km); the optimum is A -> P2, B -> P1.
+        p1 = make_pickup(self.owner, 7.0000, 125.0000)
+        p2 = make_pickup(self.owner, 7.0000, 124.9800)
+        a = make_driver("a", latitude=Decimal("7.0000"), longitude=Decimal("124.9955"))
+        b = make_driver("b", latitude=Decimal("7.0000"), longitude=Decimal("125.0200"))
+        busy = make_driver("busy", latitude=Decimal("7.0000"), longitude=Decimal("125.0001"))
+        make_pickup(self.owner, 8.0, 125.0, driver=busy, status="accepted")
+
+        pairs, stats = plan_dispatch(max_km=15)
+
+        self.assertEqual(stats["drivers"], 2)
+        self.assertEqual({(p, d) for p, d, _ in pairs}, {(p1.id, b.id), (p2.id, a.id)})
+        self.assertLess(stats["total_km"], stats["greedy_total_km"])
+
+        self.assertEqual(apply_dispatch(pairs), 2)
+        p1.refresh_from_db()
+        self.assertEqual((p1.driver_id, p1.status), (b.id, "accepted"))
+
+    def test_does_not_overwrite_pickups_claimed_meanwhile(self):
+        pickup = make_pickup(self.owner, 7.0, 125.0)
+        a = make_driver("a", latitude=Decimal("7.0"), longitude=Decimal("125.001"))
+        other = make_driver("other")
+        pairs, _ = plan_dispatch()
+
+        TrashPickup.claim(pickup.pk, other)
+
+        self.assertEqual(apply_dispatch(pairs), 0)
+        pickup.refresh_from_db()
+        self.assertEqual(pickup.driver, other)
+        self.assertNotEqual(pickup.driver, a)
+
+    def test_separate_areas_are_solved_on_their_own(self):
+        near = make_pickup(self.owner, 7.0, 125.0)
+        far = make_pickup(self.owner, 10.3, 123.9)
+        a = make_driver("a", latitude=Decimal("7.0"), longitude=Decimal("125.001"))
+        b = make_driver("b", latitude=Decimal("10.3"), longitude=Decimal("123.901"))
+        make_driver("idle", latitude=Decimal("14.6"), longitude=Decimal("121.0"))
+
+        pairs, stats = plan_dispatch(max_km=15)
+
+        self.assertEqual(sorted((p, d) for p, d, _ in pairs), sorted([(near.id, a.id), (far.id, b.id)]))
+        self.assertEqual((stats["components"], stats["largest_component"]), (2, 1))
+
+    def test_respects_max_distance(self):
+        make_pickup(self.owner, 7.0, 125.0)
+        make_driver("far", latitude=Decimal("7.5"), longitude=Decimal("125.0"))
+
+        pairs, stats = plan_dispatch(max_km=10)
+
+        self.assertEqual(pairs, [])
+        self.assertEqual(stats["assigned"], 0)
+
+
+class RouteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        live.reset()
+        self.owner = User.objects.create_user(username="owner")
+        self.driver = make_driver("driver", latitude=Decimal("7.0"), longitude=Decimal("125.0"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver.user)
+
+    def test_two_opt_never_lengthens_the_tour(self):
+        rng = np.random.default_rng(3)
+        lats, lngs = 7 + rng.random(30) * 0.1, 125 + rng.random(30) * 0.1
+        dist = haversine_matrix(lats, lngs, lats, lngs)
+
+        greedy = nearest_neighbour_tour(dist)
+        improved = two_opt(dist, greedy)
+
+        self.assertEqual(improved[0], 0)
+        self.assertEqual(sorted(improved), list(range(30)))
+        self.assertLessEqual(tour_length(dist, improved), tour_length(dist, greedy))
+
+    def test_orders_stops_from_the_driver_position_and_caches(self):
+        far = make_pickup(self.owner, 7.0, 125.03, driver=self.driver, status="accepted")
+        near = make_pickup(self.owner, 7.0, 125.01, driver=self.driver, status="in_progress")
+        mid = make_pickup(self.owner, 7.0, 125.02, driver=self.driver, status="accepted")
+        make_pickup(self.owner, 7.0, 125.005, driver=self.driver, status="completed")
+
+        response = self.client.get("/api/trash_pickups/route/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s["id"] for s in response.data["stops"]], [near.id, mid.id, far.id])
+        self.assertFalse(response.data["cached"])
+        self.assertTrue(self.client.get("/api/trash_pickups/route/").data["cached"])
+
+        # A new stop invalidates the cached route.
+        make_pickup(self.owner, 7.0, 125.04, driver=self.driver, status="accepted")
+        self.assertFalse(self.client.get("/api/trash_pickups/route/").data["cached"])
+
+
+class PickupTrajectoryTests(TestCase):
+    def setUp(self):
+        live.reset()
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner")
+        premium = SubscriptionPlan.objects.create(name="premium", price=Decimal("499.00"), duration_days=30)
+        UserSubscription.create_new_subscription(self.owner, premium)
+        self.driver = make_driver("driver")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_owner_follows_the_driver_while_the_pickup_is_under_way(self):
+        pickup = make_pickup(self.owner, 7.0, 125.0, driver=self.driver, status="accepted")
+        live.ingest(self.driver, [{"latitude": 7.01, "longitude": 125.01,
+                                   "timestamp": timezone.now().isoformat()}])
+
+        response = self.client.get(f"/api/trash_pickups/{pickup.pk}/trajectory/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["driver"], response.data["count"]), (self.driver.pk, 1))
+
+        TrashPickup.objects.filter(pk=pickup.pk).update(status="completed")
+        self.assertEqual(self.client.get(f"/api/trash_pickups/{pickup.pk}/trajectory/").status_code, 400)
+
+    def test_unassigned_pickup_has_no_track(self):
+        pickup = make_pickup(self.owner, 7.0, 125.0)
+        self.assertEqual(self.client.get(f"/api/trash_pickups/{pickup.pk}/trajectory/").status_code, 404)
+
+    def test_tracking_needs_a_plan_with_live_tracking(self):
+        owner = User.objects.create_user(username="basic-owner")
+        basic = SubscriptionPlan.objects.create(name="basic", price=Decimal("199.00"), duration_days=30)
+        UserSubscription.create_new_subscription(owner, basic)
+        pickup = make_pickup(owner, 7.0, 125.0, driver=self.driver, status="accepted")
+        self.client.force_authenticate(owner)
+
+        self.assertEqual(self.client.get(f"/api/trash_pickups/{pickup.pk}/trajectory/").status_code, 403)
+
+
+class GeofenceTests(TestCase):
+    def setUp(self):
+        live.reset()
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner")
+        self.driver = make_driver("driver")
+        self.pickup = make_pickup(self.owner, 7.0, 125.0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver.user)
+
+    def report(self, lat, lng, seconds_ago=0):
+        when = timezone.now() - timedelta(seconds=seconds_ago)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/drivers/me/locations/", {"fixes": [
+                {"latitude": lat, "longitude": lng, "timestamp": when.isoformat()},
+            ]}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def status(self):
+        self.pickup.refresh_from_db()
+        return self.pickup.status
+
+    def test_arrival_starts_the_accepted_pickup(self):
+        # Cached before the pickup is accepted; accepting drops the entry.
+        self.report(7.01, 125.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/trash_pickups/{self.pickup.pk}/accept/")
+
+        self.report(7.001, 125.0)  # ~110 m away
+        self.assertEqual(self.status(), "accepted")
+        self.report(7.0004, 125.0)  # ~45 m away
+        self.assertEqual(self.status(), "in_progress")
+        self.assertEqual(geofence.fences(self.driver.pk), [])
+
+    def test_late_fix_and_unassigned_pickups_are_ignored(self):
+        other = make_pickup(self.owner, 7.0, 125.0)
+        TrashPickup.claim(self.pickup.pk, self.driver)
+        self.report(7.01, 125.0)
+        self.report(7.0, 125.0, seconds_ago=60)
+        self.assertEqual(self.status(), "accepted")
+        self.report(7.0, 125.0)
+        self.assertEqual(self.status(), "in_progress")
+        other.refresh_from_db()
+        self.assertEqual(other.status, "pending")
+
+    def test_check_is_served_from_the_cache(self):
+        TrashPickup.claim(self.pickup.pk, self.driver)
+        geofence.fences(self.driver.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(geofence.check_arrival(self.driver.pk, 7.01, 125.0), [])
+
+        # Started by hand meanwhile: the stale entry is dropped on arrival.
+        TrashPickup.objects.filter(pk=self.pickup.pk).update(status="in_progress")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(geofence.check_arrival(self.driver.pk, 7.0, 125.0), [])
+        self.assertIsNone(cache.get(geofence._cache_key(self.driver.pk)))
+
+    def test_deploy_check_requires_a_shared_fence_cache(self):
+        self.assertEqual([e.id for e in check_shared_fence_cache(None)], ["trash_pickups.E001"])
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache"}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(check_shared_fence_cache(None), [])
+
+
+class RecordingBroker:
+    """Stand-in broker that keeps what was published."""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, event, data):
+        self.published.append((topic, event, data))
+        return 0
+
+
+class PushPublishTests(TestCase):
+    def setUp(self):
+        self.broker = RecordingBroker()
+        self.previous = push.set_broker(self.broker)
+        self.addCleanup(push.set_broker, self.previous)
+        self.owner = User.objects.create_user(username="owner")
+        self.driver = make_driver("driver")
+        self.client = APIClient()
+
+    def test_views_publish_after_commit(self):
+        self.client.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/trash_pickups/", {
+                "restaurant_name": "Resto", "pickup_address": "Somewhere", "waste_type": "Food",
+                "weight_kg": "5.00", "latitude": "7.000000", "longitude": "125.000000",
+            }, format="json")
+        self.assertEqual(response.status_code, 201)
+        pickup = TrashPickup.objects.get()
+        self.assertIn((f"cell:{pickup.geohash[:5]}", "pickup.available"),
+                      [(topic, event) for topic, event, _ in self.broker.published])
+
+        self.broker.published.clear()
+        self.client.force_authenticate(self.driver.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/trash_pickups/{pickup.pk}/accept/")
+        self.assertEqual(
+            self.broker.published[0],
+            (f"owner:{self.owner.pk}", "pickup.status",
+             {"id": pickup.pk, "status": "accepted", "driver": self.driver.pk}),
+        )
+        self.assertEqual({event for _, event, _ in self.broker.published[1:]}, {"pickup.taken"})
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        live.reset()
+        self.owner = User.objects.create_user(username="owner")
+        self.driver = make_driver("driver", latitude=Decimal("7.0"), longitude=Decimal("125.0"))
+
+    async def open_stream(self, user, **params):
+        response = await AsyncClient().get(
+            "/api/trash_pickups/events/", {"token": str(AccessToken.for_user(user)), **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        return stream
+
+    async def disconnect(self, stream):
+        # What the ASGI handler does when the client goes away.
+        reading = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        reading.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reading
+
+    async def next_event(self, stream):
+        frame = (await asyncio.wait_for(anext(stream), 2)).decode()
+        event, data = frame.strip().split("\n")
+        return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def test_owner_gets_status_changes_and_the_drivers_position(self):
+        pickup = await sync_to_async(make_pickup)(
+            self.owner, 7.0, 125.0, driver=self.driver, status="accepted"
+        )
+        stream = await self.open_stream(self.owner)
+
+        await sync_to_async(live.ingest)(
+            self.driver, [{"latitude": 7.01, "longitude": 125.01, "timestamp": timezone.now().isoformat()}]
+        )
+        event, data = await self.next_event(stream)
+        self.assertEqual((event, data["driver"], data["lat"]), ("driver.position", self.driver.pk, 7.01))
+
+        await TrashPickup.objects.filter(pk=pickup.pk).aupdate(status="completed")
+        await sync_to_async(publish_status)([pickup.pk])
+        event, data = await self.next_event(stream)
+        self.assertEqual((event, data["status"]), ("pickup.status", "completed"))
+        # Done: the stream stopped following the driver.
+        self.assertEqual(push.publish(f"driver:{self.driver.pk}", "driver.position", {}), 0)
+
+        await self.disconnect(stream)
+        self.assertEqual(push.publish(f"owner:{self.owner.pk}", "pickup.status", {}), 0)
+
+    async def test_driver_gets_new_pickups_nearby_only(self):
+        stream = await self.open_stream(self.driver.user, lat=7.0, lng=125.0, radius_km=3)
+
+        near = await sync_to_async(make_pickup)(self.owner, 7.01, 125.0)
+        far = await sync_to_async(make_pickup)(self.owner, 7.0, 125.2)
+        also_near = await sync_to_async(make_pickup)(self.owner, 6.99, 125.01)
+        for pickup in (near, far, also_near):
+            publish_available(pickup)
+
+        event, data = await self.next_event(stream)
+        self.assertEqual((event, data["id"], float(data["latitude"])), ("pickup.available", near.pk, 7.01))
+        self.assertEqual((await self.next_event(stream))[1]["id"], also_near.pk)
+        await self.disconnect(stream)
+
+    async def test_requires_a_valid_token(self):
+        response = await AsyncClient().get("/api/trash_pickups/events/", {"token": "nope"})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_rejects_non_finite_positions(self):
+        token = str(AccessToken.for_user(self.driver.user))
+        for params in [{"lat": "nan", "lng": 125.0}, {"lat": 7.0, "lng": 125.0, "radius_km": "inf"},
+                       {"lat": 7.0, "lng": 200.0}]:
+            with self.subTest(params=params):
+                response = await asyncio.wait_for(
+                    AsyncClient().get("/api/trash_pickups/events/", {"token": token, **params}), 2
+                )
+                self.assertEqual(response.status_code, 400)
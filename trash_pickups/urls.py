@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import streams
 from .views import TrashPickupViewSet
 
 router = DefaultRouter()
 router.register(r'trash_pickups', TrashPickupViewSet, basename='trashpickup')
 
 urlpatterns = [
+    # Before the router, whose detail route would take "events" for a pk.
+    path('trash_pickups/events/', streams.events, name='trashpickup-events'),
     path('', include(router.urls)),
 ]
@@ -2,15 +2,33 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.db import transaction
 from django.utils import timezone
+from . import geofence
+from .events import publish_available, publish_status
 from .models import TrashPickup
 from .serializers import TrashPickupSerializer
+from .geo import check_point, covering_cells, geohash_filter, haversine_km
+from .routing import driver_position, plan_route
 from drivers.models import Driver
+from drivers.trajectory import parse_window, trajectory
 from donations.models import DonationDrive
+from outbox.jobs import enqueue
+from restaurant_waste_backend.pagination import KeysetPagination
+from subscriptions.entitlements import HasPlanFeature
+
+AVAILABLE_DEFAULT_RADIUS_KM = 5.0
+AVAILABLE_MAX_RADIUS_KM = 50.0
+AVAILABLE_DEFAULT_LIMIT = 50
+AVAILABLE_MAX_LIMIT = 200
+
 
 class TrashPickupViewSet(viewsets.ModelViewSet):
     serializer_class = TrashPickupSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    # Checked by HasPlanFeature on the actions that use it (trajectory).
+    required_feature = "live_tracking"
 
     def get_queryset(self):
         user = self.request.user
@@ -31,19 +49,130 @@ class TrashPickupViewSet(viewsets.ModelViewSet):
             waste_type=serializer.validated_data["waste_type"]
         ).first()
 
-        serializer.save(
+        pickup = serializer.save(
             user=user,
             donation_drive=donation
         )
+        transaction.on_commit(lambda: publish_available(pickup))
+
+    def perform_update(self, serializer):
+        pickup = serializer.save()
+        # The driver's geofence follows the pickup's coordinates.
+        geofence.forget_on_commit([pickup.driver_id])
 
     @action(detail=False, methods=["get"], url_path="available")
     def available(self, request):
+        """
+        Unassigned pending pickups near the caller, nearest first.
+
+        Query params: ``lat``/``lng`` (default: the driver's last known
+        position), ``radius_km`` and ``limit``. Candidates are read from
+        the geohash cells covering the search circle only.
+        """
+        try:
+            radius_km = float(request.query_params.get("radius_km", AVAILABLE_DEFAULT_RADIUS_KM))
+            limit = int(request.query_params.get("limit", AVAILABLE_DEFAULT_LIMIT))
+            lat = request.query_params.get("lat")
+            lng = request.query_params.get("lng")
+            lat = float(lat) if lat is not None else None
+            lng = float(lng) if lng is not None else None
+            check_point(lat or 0.0, lng or 0.0, radius_km)
+        except ValueError:
+            return Response({"detail": "Invalid lat, lng, radius_km or limit."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        radius_km = min(max(radius_km, 0.0), AVAILABLE_MAX_RADIUS_KM)
+        limit = min(max(limit, 1), AVAILABLE_MAX_LIMIT)
+
+        if lat is None or lng is None:
+            driver = getattr(request.user, "driver_profile", None)
+            position = driver_position(driver) if driver is not None else None
+            if position is not None:
+                lat, lng = position
+
         # Only show pickups without assigned driver
         pickups = TrashPickup.objects.filter(
             status="pending",
             driver__isnull=True
         )
-        return Response(TrashPickupSerializer(pickups, many=True).data)
+
+        if lat is None or lng is None:
+            # No position to search around: keep the old behaviour, bounded.
+            return Response(TrashPickupSerializer(pickups[:limit], many=True).data)
+
+        candidates = pickups.filter(
+            geohash_filter(covering_cells(lat, lng, radius_km))
+        ).select_related("donation_drive")
+
+        nearby = []
+        for pickup in candidates:
+            distance = haversine_km(lat, lng, pickup.latitude, pickup.longitude)
+            if distance <= radius_km:
+                nearby.append((distance, pickup))
+        nearby.sort(key=lambda item: item[0])
+        nearby = nearby[:limit]
+
+        data = TrashPickupSerializer([pickup for _, pickup in nearby], many=True).data
+        for row, (distance, _) in zip(data, nearby):
+            row["distance_km"] = round(distance, 3)
+        return Response(data)
+
+    @action(detail=False, methods=["get"], url_path="route")
+    def route(self, request):
+        """
+        The driver's accepted and in-progress pickups in driving order,
+        starting from their current location. Staff may pass ``?driver=<id>``.
+        """
+        driver_id = request.query_params.get("driver")
+        if driver_id is not None and request.user.is_staff:
+            driver = Driver.objects.filter(pk=driver_id).first()
+        else:
+            driver = getattr(request.user, "driver_profile", None)
+
+        if driver is None:
+            return Response({"detail": "Driver not found."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        route = plan_route(driver)
+        pickups = TrashPickup.objects.filter(pk__in=route["order"]).select_related(
+            "driver", "donation_drive"
+        )
+        by_id = {pickup.pk: pickup for pickup in pickups}
+        ordered = [by_id[pk] for pk in route["order"] if pk in by_id]
+
+        stops = TrashPickupSerializer(ordered, many=True).data
+        for stop, leg in zip(stops, route["legs_km"]):
+            stop["leg_km"] = leg
+
+        start = route["start"]
+        return Response({
+            "start": {"lat": start[0], "lng": start[1]} if start else None,
+            "total_km": route["total_km"],
+            "cached": route["cached"],
+            "stops": stops,
+        })
+
+    @action(detail=True, methods=["get"], url_path="trajectory",
+            permission_classes=[permissions.IsAuthenticated, HasPlanFeature])
+    def trajectory(self, request, pk=None):
+        """
+        Track of the driver handling this pickup, while it is under way,
+        as an encoded polyline. Query params: ``since`` and ``until``.
+        Needs a plan with live tracking.
+        """
+        pickup = self.get_object()
+        if pickup.driver_id is None:
+            return Response({"detail": "No driver assigned yet."},
+                            status=status.HTTP_404_NOT_FOUND)
+        if pickup.status not in ("accepted", "in_progress"):
+            return Response({"detail": "Tracking is only available while the pickup is under way."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since, until = parse_window(request.query_params)
+        except ValueError as exc:
+            return Response({"detail": f"Invalid {exc} timestamp."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(trajectory(pickup.driver_id, since, until))
 
     @action(detail=True, methods=["patch"], url_path="accept")
     def accept(self, request, pk=None):
@@ -53,20 +182,15 @@ class TrashPickupViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Only drivers can accept pickups."},
                             status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            pickup = TrashPickup.objects.get(pk=pk)
-        except TrashPickup.DoesNotExist:
-            return Response({"detail": "Pickup not found."},
-                            status=status.HTTP_404_NOT_FOUND)
-
-        if pickup.driver is not None:
+        if not TrashPickup.claim(pk, user.driver_profile):
+            if not TrashPickup.objects.filter(pk=pk).exists():
+                return Response({"detail": "Pickup not found."},
+                                status=status.HTTP_404_NOT_FOUND)
             return Response({"detail": "This pickup is already assigned."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        pickup.driver = user.driver_profile
-        pickup.status = "accepted"
-        pickup.save()
-
+        transaction.on_commit(lambda: publish_status([pk]))
+        geofence.forget_on_commit([user.driver_profile.pk])
         return Response({"detail": "Pickup accepted successfully."})
 
     @action(detail=True, methods=["patch"], url_path="start")
@@ -79,39 +203,27 @@ class TrashPickupViewSet(viewsets.ModelViewSet):
 
         pickup.status = "in_progress"
         pickup.save()
+        transaction.on_commit(lambda: publish_status([pickup.pk]))
 
         return Response({"detail": "Pickup marked as In Progress."})
 
     @action(detail=True, methods=["patch"], url_path="complete")
     def complete(self, request, pk=None):
-        try:
-            pickup = TrashPickup.objects.get(pk=pk)
-        except TrashPickup.DoesNotExist:
-            return Response({"detail": "Pickup not found."},
-                            status=status.HTTP_404_NOT_FOUND)
-
-        if pickup.status not in ["accepted", "in_progress"]:
+        # Reward points are awarded by the outbox worker; the job is
+        # committed together with the status change, so it is never lost.
+        with transaction.atomic():
+            completed = TrashPickup.objects.filter(
+                pk=pk, status__in=["accepted", "in_progress"]
+            ).update(status="completed")
+            if completed:
+                enqueue("rewards.award_pickup", {"pickup_id": int(pk)})
+                transaction.on_commit(lambda: publish_status([pk]))
+
+        if not completed:
+            if not TrashPickup.objects.filter(pk=pk).exists():
+                return Response({"detail": "Pickup not found."},
+                                status=status.HTTP_404_NOT_FOUND)
             return Response({"detail": "Cannot complete this pickup."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        pickup.status = "completed"
-        pickup.save()
-
-        try:
-            from rewards.models import RewardPoint, RewardTransaction
-
-            points = int(pickup.weight_kg)
-            reward, _ = RewardPoint.objects.get_or_create(user=pickup.user)
-            reward.add_points(points)
-            
-            RewardTransaction.objects.create(
-                user=pickup.user,
-                pickup=pickup,
-                points=points,
-                description=f"Completed {pickup.weight_kg}kg pickup"
-            )
-
-        except Exception as e:
-            print("Reward error:", e)
-
         return Response({"detail": "Pickup completed successfully."})
\ No newline at end of file